@@ -0,0 +1,69 @@
+"""Benchmark: per-file feature extraction time, per-note loop vs. vectorized.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_feature_extraction [notes_per_file ...]
+"""
+import sys
+import time
+import numpy as np
+import pretty_midi
+from src.core.config import settings
+from src.core.data_processor import DataProcessor
+
+N_FILES = 20
+
+def synthetic_corpus(n_files: int, n_notes: int, seed: int = 0) -> list:
+    """Random multi-instrument files with ``n_notes`` notes each."""
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for _ in range(n_files):
+        midi = pretty_midi.PrettyMIDI(initial_tempo=float(rng.integers(80, 160)))
+        for program, share in ((0, 0.5), (32, 0.25), (73, 0.25)):
+            instrument = pretty_midi.Instrument(program=program)
+            count = int(n_notes * share)
+            starts = np.sort(rng.uniform(0, n_notes / 4, count))
+            for pitch, velocity, start, duration in zip(
+                rng.integers(24, 96, count), rng.integers(40, 128, count), starts, rng.uniform(0.05, 2.0, count)
+            ):
+                instrument.notes.append(pretty_midi.Note(int(velocity), int(pitch), start, start + duration))
+            midi.instruments.append(instrument)
+        corpus.append(midi)
+    return corpus
+
+def per_note_features(midi: pretty_midi.PrettyMIDI) -> np.ndarray:
+    """Reference per-note loop, re-reading the tempo for every note as the old code did."""
+    notes = sorted((note for instrument in midi.instruments for note in instrument.notes),
+                   key=lambda note: (note.start, note.pitch))
+    features = np.zeros((len(notes), len(settings.NOTE_FEATURES)))
+    previous_start = notes[0].start if notes else 0.0
+    for i, note in enumerate(notes):
+        beats_per_second = midi.get_tempo_changes()[1][0] / 60.0
+        features[i] = [
+            note.pitch / 127.0,
+            note.velocity / settings.MAX_VELOCITY,
+            min((note.end - note.start) * beats_per_second / settings.MAX_DURATION, 1.0),
+            min((note.start - previous_start) * beats_per_second / settings.MAX_TIME_SINCE_LAST, 1.0)
+        ]
+        previous_start = note.start
+    return features
+
+def bench(label: str, fn, corpus: list, n_notes: int) -> float:
+    start = time.perf_counter()
+    for midi in corpus:
+        fn(midi)
+    per_file = (time.perf_counter() - start) / len(corpus)
+    print(f"{label:<24} {n_notes:>7} notes/file  {per_file * 1e3:9.2f} ms/file")
+    return per_file
+
+def main():
+    processor = DataProcessor()
+    for n_notes in [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 10_000]:
+        corpus = synthetic_corpus(N_FILES, n_notes)
+        np.testing.assert_allclose(per_note_features(corpus[0]), processor.extract_note_features(corpus[0]))
+        before = bench("per-note loop", per_note_features, corpus, n_notes)
+        after = bench("vectorized", processor.extract_note_features, corpus, n_notes)
+        print(f"{'speedup':<24} {before / after:>7.1f}x\n")
+
+if __name__ == '__main__':
+    main()
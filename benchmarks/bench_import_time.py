@@ -0,0 +1,53 @@
+"""Benchmark: cold import time of the entry points, with regression thresholds.
+
+Each module is imported in a fresh interpreter under ``python -X importtime``
+and its cumulative import time is compared to ``THRESHOLDS_MS``. Importing
+any of them must not load TensorFlow. Exits non-zero on a regression.
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time [repeat]
+"""
+import json
+import subprocess
+import sys
+
+# Cumulative import time budgets, in milliseconds
+THRESHOLDS_MS = {
+    'src.core.config': 1000,
+    'src.api.app': 2500,
+    'src.frontend.app': 4000,
+}
+FORBIDDEN_MODULES = ('tensorflow', 'keras')
+
+def import_time(module: str) -> tuple:
+    """Cumulative import time in ms and the forbidden modules loaded, or None if unavailable."""
+    check = f"import json, sys; print(json.dumps([m for m in {FORBIDDEN_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}; {check}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            cumulative_us = int(line.split("|")[1])
+            return cumulative_us / 1e3, json.loads(result.stdout.strip().splitlines()[-1])
+    raise RuntimeError(f"No import time reported for {module}")
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    failed = False
+    for module, threshold in THRESHOLDS_MS.items():
+        runs = [import_time(module) for _ in range(repeat)]
+        best, loaded = min(runs, key=lambda run: run[0] if run[0] is not None else float('inf'))
+        if best is None:
+            print(f"{module:<20} skipped ({loaded})")
+            continue
+        ok = best <= threshold and not loaded
+        failed |= not ok
+        note = f"  loads {', '.join(loaded)}" if loaded else ""
+        print(f"{module:<20} {best:9.1f} ms  (budget {threshold} ms)  {'ok' if ok else 'REGRESSION'}{note}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Benchmark: autoregressive generation steps/sec, per-step predict vs. compiled batched.
+
+Requires TensorFlow. Run from the repository root:
+
+    python -m benchmarks.bench_inference [length] [batch ...]
+"""
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+from src.core.model import GenrePatternGenerator
+
+def predict_loop(generator: GenrePatternGenerator, genre: str, length: int) -> np.ndarray:
+    """The previous generate_pattern: model.predict and np.roll every step."""
+    genre_one_hot = tf.one_hot([generator.genres.index(genre)], depth=len(generator.genres))
+    current_sequence = np.zeros((1, generator.sequence_length, generator.n_features))
+    pattern = []
+    for _ in range(length):
+        next_step = generator.model.predict([current_sequence, genre_one_hot], verbose=0)
+        pattern.append(next_step[0])
+        current_sequence = np.roll(current_sequence, -1, axis=1)
+        current_sequence[0, -1] = next_step[0]
+    return np.array(pattern)
+
+def bench(label: str, fn, steps: int) -> float:
+    fn()  # Warm up (tracing, graph building)
+    start = time.perf_counter()
+    fn()
+    rate = steps / (time.perf_counter() - start)
+    print(f"{label:<32} {steps:>7} steps  {rate:12,.0f} steps/s")
+    return rate
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    batches = [int(arg) for arg in sys.argv[2:]] or [1, 16, 64]
+    generator = GenrePatternGenerator()
+    generator.build_model()
+    genre = generator.genres[0]
+    before = bench("predict per step", lambda: predict_loop(generator, genre, length), length)
+    for batch in batches:
+        genres = [generator.genres[i % len(generator.genres)] for i in range(batch)]
+        after = bench(f"compiled, batch of {batch}", lambda: generator.generate_patterns(genres, length),
+                      length * batch)
+        print(f"{'speedup':<32} {after / before:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark: PrettyMIDI.write vs. the direct SMF writer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_midi_writer [n_notes ...]
+"""
+import io
+import sys
+import time
+import numpy as np
+from src.core.note_store import NoteStore
+from src.core.midi_writer import encode_smf
+
+TEMPO = 120
+
+def make_store(n_notes: int, n_tracks: int = 4, seed: int = 0) -> NoteStore:
+    rng = np.random.default_rng(seed)
+    store = NoteStore()
+    per_track = n_notes // n_tracks
+    for i in range(n_tracks):
+        start = np.arange(per_track) * 0.25
+        store.new_track(program=i * 8, is_drum=(i == 0)).add_notes(
+            rng.integers(36, 96, per_track), rng.integers(60, 127, per_track), start, start + 0.2
+        )
+    return store
+
+def timed(fn) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def pretty_midi_write(store: NoteStore) -> bytes:
+    buffer = io.BytesIO()
+    store.to_pretty_midi(TEMPO).write(buffer)
+    return buffer.getvalue()
+
+def main(sizes):
+    print(f"{'notes':>9} {'pm.write':>12} {'encode_smf':>12} {'speedup':>9}  identical")
+    for n_notes in sizes:
+        store = make_store(n_notes)
+        before, expected = timed(lambda: pretty_midi_write(store))
+        after, data = timed(lambda: encode_smf(store, TEMPO))
+        print(f"{n_notes:>9} {before * 1e3:>10.1f}ms {after * 1e3:>10.1f}ms {before / after:>8.1f}x  {data == expected}")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,63 @@
+"""Benchmark: notes generated per second, per-note objects vs. columnar store.
+
+The columnar side runs ``MIDIGenerator.create_drum_pattern`` on a genre
+registered with a kick on every step of a long grid.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_note_engine
+"""
+import time
+import numpy as np
+import pretty_midi
+from src.core.midi_generator import MIDIGenerator, STEP_DURATION
+from src.core.patterns import CompiledGenre, compile_hits, get_pattern_registry
+
+BENCH_GENRE = "bench"
+
+def legacy_drum_notes(pattern: np.ndarray, pitch: int) -> pretty_midi.Instrument:
+    """The previous per-note implementation of drum note generation."""
+    program = pretty_midi.Instrument(program=0, is_drum=True)
+    for i, is_note in enumerate(pattern):
+        if is_note:
+            start_time = i * STEP_DURATION
+            program.notes.append(pretty_midi.Note(
+                velocity=np.random.randint(80, 120),
+                pitch=pitch,
+                start=start_time,
+                end=start_time + 0.2
+            ))
+    return program
+
+def register_long_genre(n_steps: int):
+    """Register a genre with a kick on each of ``n_steps`` grid steps."""
+    registry = get_pattern_registry()
+    hits = compile_hits(BENCH_GENRE, {"kick": [(step, 0.2) for step in range(n_steps)]}, grid_steps=n_steps)
+    registry.genres[BENCH_GENRE] = CompiledGenre(BENCH_GENRE, *hits[:3], registry.get(BENCH_GENRE).chord_pitches,
+                                                 drum_velocity=hits[3], drum_offset=hits[4])
+
+def columnar_drum_notes(generator: MIDIGenerator):
+    generator.notes.clear()
+    return generator.create_drum_pattern(BENCH_GENRE)
+
+def bench(label: str, fn, n_notes: int, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    rate = n_notes / best
+    print(f"{label:<28} {n_notes:>9} notes  {best * 1e3:9.2f} ms  {rate:14,.0f} notes/s")
+    return rate
+
+def main():
+    generator = MIDIGenerator()
+    for n_steps in (1_000, 10_000, 100_000):
+        pattern = np.ones(n_steps, dtype=bool)
+        register_long_genre(n_steps)
+        before = bench("per-note pretty_midi.Note", lambda: legacy_drum_notes(pattern, 36), n_steps)
+        after = bench("create_drum_pattern", lambda: columnar_drum_notes(generator), n_steps)
+        print(f"{'speedup':<28} {after / before:>9.1f}x\n")
+
+if __name__ == '__main__':
+    main()
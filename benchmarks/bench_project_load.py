@@ -0,0 +1,42 @@
+"""Benchmark: loading many projects from disk.
+
+Creates N project files in a temporary directory, then measures opening a
+ProjectManager, listing a page, and loading every project body.
+
+    python -m benchmarks.bench_project_load [n_projects]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from src.core.config import settings
+from src.core.project_manager import Project, ProjectManager
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1e3:10.1f} ms")
+    return result
+
+def main(n_projects: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.PROJECTS_DIR = os.path.join(tmp, "projects")
+        user_dir = os.path.join(settings.PROJECTS_DIR, settings.DEFAULT_USER)
+        os.makedirs(user_dir)
+        template = Project("template").to_dict()
+        for i in range(n_projects):
+            template["name"] = f"project{i:06d}"
+            with open(os.path.join(user_dir, f"{template['name']}.json"), "w") as f:
+                json.dump(template, f)
+
+        print(f"{n_projects} projects")
+        timed("first open (builds index)", ProjectManager)
+        manager = timed("open ProjectManager", ProjectManager)
+        timed("list first page (100)", lambda: manager.list_projects(limit=100))
+        projects = timed("load every project body", manager.list_projects)
+        assert len(projects) == n_projects
+        timed("construct Project objects", lambda: [Project(f"p{i}") for i in range(n_projects)])
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
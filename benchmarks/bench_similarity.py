@@ -0,0 +1,70 @@
+"""Benchmark: similarity search latency, multi-index lookup vs. brute-force scan.
+
+Each size is run on three datasets: variations of a thousand patterns,
+a thousand copies each of a few patterns ("duplicated"), and a few
+patterns with up to two bits flipped ("clustered"), as real exports are.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_similarity [n_patterns ...]
+"""
+import sys
+import tempfile
+import time
+import numpy as np
+from src.core.similarity import FINGERPRINT_BITS, Fingerprint, SimilarityIndex, hamming
+
+N_QUERIES = 200
+# (label, base patterns, most bits flipped per pattern)
+DATASETS = [
+    ("varied", 1_000, 8),
+    ("duplicated", 20, 0),
+    ("clustered", 20, 2),
+]
+
+def synthetic_fingerprints(n: int, n_bases: int, max_flips: int, seed: int = 0) -> list:
+    """Variations of ``n_bases`` base patterns, each with up to ``max_flips`` bits flipped."""
+    rng = np.random.default_rng(seed)
+    bases = rng.random((n_bases, 128)) < 0.25
+    bases[:, FINGERPRINT_BITS:] = False
+    base = rng.integers(0, n_bases, n)
+    bits = bases[base]
+    for n_flips in range(1, max_flips + 1):
+        rows = np.flatnonzero(rng.integers(0, max_flips + 1, n) >= n_flips)
+        bits[rows, rng.integers(0, FINGERPRINT_BITS, rows.size)] ^= True
+    codes = np.packbits(bits, axis=1, bitorder="little").view("<u8")
+    # Copies of a pattern play the same notes, so they share its histogram
+    histograms = rng.integers(0, 256, (n_bases, 12))[base]
+    return [Fingerprint(code, histogram) for code, histogram in zip(codes, histograms)]
+
+def bench(label: str, fn, queries: list) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    per_query = (time.perf_counter() - start) / len(queries)
+    print(f"{label:<28} {per_query * 1e6:10.1f} us/query")
+    return per_query
+
+def main():
+    for n in [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]:
+        for label, n_bases, max_flips in DATASETS:
+            fingerprints = synthetic_fingerprints(n, n_bases, max_flips)
+            with tempfile.TemporaryDirectory() as tmp:
+                index = SimilarityIndex(tmp, max_pending=n + 1)
+                start = time.perf_counter()
+                index.add_many((f"p{i}", fp) for i, fp in enumerate(fingerprints))
+                index.compact()
+                print(f"{n} {label} patterns indexed in {time.perf_counter() - start:.1f}s")
+                index = SimilarityIndex(tmp)  # Reopen memory-mapped
+                queries = [fingerprints[i] for i in np.random.default_rng(1).integers(0, n, N_QUERIES)]
+                codes = np.array([fp.code for fp in fingerprints])
+                for query in queries[:10]:
+                    expected = set(np.flatnonzero(hamming(codes, query.code) <= 2))
+                    assert {int(key[1:]) for key, _ in index.search(query, radius=2, k=n)} == expected
+                bench("dedup check (radius 2, k=1)", lambda q: index.search(q, radius=2, k=1, group=""), queries)
+                bench("similar (radius 6, k=10)", lambda q: index.search(q, radius=6, k=10), queries)
+                bench("brute-force scan", lambda q: np.flatnonzero(hamming(codes, q.code) <= 2), queries)
+            print()
+
+if __name__ == '__main__':
+    main()
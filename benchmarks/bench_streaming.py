@@ -0,0 +1,46 @@
+"""Benchmark: peak memory of materialized vs. streamed MIDI export.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_streaming [variations ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from src.core.midi_generator import MIDIGenerator
+
+def measure(fn) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [16, 256, 4096]
+    generator = MIDIGenerator(seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pattern.mid")
+        for variations in counts:
+            def materialized():
+                generator.create_pattern('edm', 'live_performance', variations, complexity=3)
+                generator.save_midi(path)
+
+            def streamed():
+                generator.save_midi_stream(
+                    path, generator.iter_pattern('edm', 'live_performance', variations, complexity=3)
+                )
+
+            for label, fn in (("create_pattern + save_midi", materialized), ("iter_pattern + stream", streamed)):
+                elapsed, peak = measure(fn)
+                print(f"{label:<28} {variations:>6} variations  {elapsed * 1e3:9.1f} ms  "
+                      f"peak {peak / 2**20:8.2f} MiB")
+            generator.notes.clear()
+            print()
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,103 @@
 from flask import Flask, request, jsonify, send_file
-from src.core.project_manager import ProjectManager
+from src.core.project_manager import PERSISTED_FIELDS, Project, ProjectManager
 from src.core.config import settings
-import os
-from typing import Dict, List
+from src.core.jobs import QueueFullError, SUCCEEDED, FAILED, get_job_queue
+from src.core.render_cache import get_render_cache, render_key
+from src.core.similarity import get_similarity_index
+from src.core.playback import PlaybackEngine
+from src.core.templates import get_template_library
+import io
+from typing import Dict, List, Optional
 import json
 
 app = Flask(__name__)
 project_manager = ProjectManager()
+# Active playback engines, keyed by (user, project name)
+players: Dict[tuple, PlaybackEngine] = {}
+# Fields a client may change; identity and timestamps are managed server-side
+EDITABLE_FIELDS = PERSISTED_FIELDS - {'name', 'user', 'created_at', 'updated_at'}
+
+def _render_job(project: Project, dedup: bool = False):
+    """Render a snapshot of the project so later edits don't affect the job."""
+    snapshot = Project.from_dict(project.to_dict())
+    key = snapshot.render_key()
+    
+    def run():
+        file_path = snapshot.generate_pattern(dedup=dedup)
+        _compact_similarity_index()
+        return {
+            'file_path': file_path,
+            # A deduplicated render is linked under the snapshot's own key
+            'etag': key,
+            'download_name': f"{snapshot.name}.mid"
+        }
+    return f"render:{key}:dedup" if dedup else f"render:{key}", run
+
+def _play_job(project: Project):
+    """Start playback of a snapshot; the job finishes once the engine is running."""
+    snapshot = Project.from_dict(project.to_dict())
+    
+    def run():
+        _stop_player(snapshot.user, snapshot.name)
+        engine = snapshot.play_realtime(blocking=False)
+        players[(snapshot.user, snapshot.name)] = engine
+        return {'length': engine.events.length, 'tempo': engine.tempo}
+    return f"play:{snapshot.user}/{snapshot.name}:{snapshot.render_key()}", run
+
+def _batch_job(user: str, projects: List[Project], workers: Optional[int]):
+    """Render snapshots of many projects on at most ``settings.BATCH_MAX_WORKERS`` processes."""
+    snapshots = [Project.from_dict(p.to_dict()) for p in projects]
+    max_workers = settings.BATCH_MAX_WORKERS
+    if workers is not None:
+        max_workers = min(max(workers, 1), max_workers)
+    key = render_key({'user': user, 'projects': [[p.name, p.render_key()] for p in snapshots]})
+    
+    def run():
+        results = project_manager.render_projects(snapshots, max_workers=max_workers)
+        _compact_similarity_index()
+        return {
+            'succeeded': sum(1 for r in results if r.ok),
+            'failed': sum(1 for r in results if not r.ok),
+            'results': [r.to_dict() for r in results]
+        }
+    return f"batch:{key}", run
+
+def _compact_similarity_index():
+    """Compact the similarity index in its own job once enough entries are pending."""
+    index = get_similarity_index()
+    if index.needs_compaction:
+        try:
+            get_job_queue().submit('similarity:compact', 'compact', index.compact)
+        except QueueFullError:
+            pass  # Retried after the next render
+
+def _stop_player(user: str, name: str):
+    engine = players.pop((user, name), None)
+    if engine is not None:
+        engine.stop()
+    return engine
+
+def _submit_job(kind: str, key: str, fn):
+    """Queue a job and return a 202 pointing at its status, or 429 if saturated."""
+    try:
+        job = get_job_queue().submit(key, kind, fn)
+    except QueueFullError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = f"/api/jobs/{job.id}"
+    return response, 202
 
 @app.route('/api/projects', methods=['GET'])
 def list_projects():
     user = request.args.get('user', settings.DEFAULT_USER)
-    projects = project_manager.list_projects(user)
-    return jsonify([p.to_dict() for p in projects])
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    projects = project_manager.list_projects(user, offset=offset, limit=limit)
+    response = jsonify([p.to_dict() for p in projects])
+    response.headers['X-Total-Count'] = str(project_manager.count_projects(user))
+    return response
 
 @app.route('/api/projects', methods=['POST'])
 def create_project():
@@ -29,6 +114,26 @@ def create_project():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/projects/generate', methods=['POST'])
+def generate_patterns():
+    data = request.get_json(silent=True) or {}
+    user = data.get('user', settings.DEFAULT_USER)
+    names = data.get('names')
+    workers = data.get('workers')
+    
+    if workers is not None and (not isinstance(workers, int) or isinstance(workers, bool)):
+        return jsonify({'error': 'workers must be an integer'}), 400
+    if names is not None and (not isinstance(names, list) or not all(isinstance(n, str) for n in names)):
+        return jsonify({'error': 'names must be a list of strings'}), 400
+        
+    projects = project_manager.list_projects(user)
+    if names is not None:
+        wanted = set(names)
+        projects = [p for p in projects if p.name in wanted]
+        
+    key, run = _batch_job(user, projects, workers)
+    return _submit_job('batch', key, run)
+    
 @app.route('/api/projects/<name>', methods=['GET'])
 def get_project(name):
     user = request.args.get('user', settings.DEFAULT_USER)
@@ -47,11 +152,15 @@ def update_project(name):
     if not project:
         return jsonify({'error': 'Project not found'}), 404
         
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    unknown = sorted(key for key in data if key not in EDITABLE_FIELDS)
+    if unknown:
+        return jsonify({'error': f"Fields cannot be updated: {', '.join(unknown)}"}), 400
+        
     for key, value in data.items():
-        if hasattr(project, key):
-            setattr(project, key, value)
-            
+        setattr(project, key, value)
     project_manager.update_project(project)
     return jsonify(project.to_dict())
 
@@ -71,18 +180,29 @@ def generate_pattern(name):
     user = request.args.get('user', settings.DEFAULT_USER)
     project = project_manager.get_project(name, user)
     
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+        
+    key, run = _render_job(project, dedup=request.args.get('dedup') == '1')
+    return _submit_job('render', key, run)
+
+@app.route('/api/projects/<name>/similar', methods=['GET'])
+def similar_patterns(name):
+    user = request.args.get('user', settings.DEFAULT_USER)
+    project = project_manager.get_project(name, user)
+    
     if not project:
         return jsonify({'error': 'Project not found'}), 404
         
     try:
-        output_path = project.generate_pattern()
-        return jsonify({
-            'status': 'success',
-            'message': 'Pattern generated successfully',
-            'file_path': output_path
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        matches = project.similar_patterns(
+            radius=request.args.get('radius', type=int),
+            k=request.args.get('k', 10, type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    _compact_similarity_index()
+    return jsonify({'key': project.render_key(), 'similar': matches})
 
 @app.route('/api/projects/<name>/play', methods=['POST'])
 def play_pattern(name):
@@ -92,11 +212,50 @@ def play_pattern(name):
     if not project:
         return jsonify({'error': 'Project not found'}), 404
         
-    try:
-        project.play_realtime()
-        return jsonify({'status': 'success', 'message': 'Playing pattern'})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    key, run = _play_job(project)
+    return _submit_job('play', key, run)
+
+@app.route('/api/projects/<name>/stop', methods=['POST'])
+def stop_pattern(name):
+    user = request.args.get('user', settings.DEFAULT_USER)
+    engine = _stop_player(user, name)
+    
+    if engine is None:
+        return jsonify({'error': 'Project is not playing'}), 404
+        
+    return jsonify({'position': engine.position, 'jitter': engine.jitter_histogram()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+        
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = get_job_queue().get(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == FAILED:
+        return jsonify(job.to_dict()), 500
+    if job.status != SUCCEEDED:
+        response = jsonify(job.to_dict())
+        response.headers['Retry-After'] = '1'
+        return response, 202
+    if job.kind != 'render':
+        return jsonify(job.to_dict())
+        
+    return send_file(
+        job.result['file_path'],
+        mimetype='audio/midi',
+        as_attachment=True,
+        download_name=job.result['download_name'],
+        etag=job.result['etag']
+    )
 
 @app.route('/api/scenarios', methods=['GET'])
 def list_scenarios():
@@ -104,7 +263,18 @@ def list_scenarios():
 
 @app.route('/api/genres', methods=['GET'])
 def list_genres():
-    return jsonify(list(settings.GENRE_PATTERNS.keys()))
+    genres = list(settings.GENRE_PATTERNS.keys())
+    return jsonify(genres + [g for g in get_template_library().genres() if g not in genres])
+
+@app.route('/api/templates', methods=['GET'])
+def list_templates():
+    library = get_template_library(refresh=request.args.get('refresh') == '1')
+    templates = library.find(
+        genre=request.args.get('genre'),
+        tag=request.args.get('tag'),
+        bpm=request.args.get('bpm', type=int)
+    )
+    return jsonify({'templates': [t.to_dict() for t in templates], 'errors': library.errors})
 
 @app.route('/api/export/<name>', methods=['GET'])
 def export_project(name):
@@ -114,16 +284,26 @@ def export_project(name):
     if not project:
         return jsonify({'error': 'Project not found'}), 404
         
-    try:
-        output_path = project.generate_pattern()
-        return send_file(
-            output_path,
-            mimetype='audio/midi',
-            as_attachment=True,
-            download_name=f"{name}.mid"
-        )
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Renders are content-addressed, so the cache key doubles as a strong ETag
+    etag = project.render_key()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+        
+    # Cached renders are served directly; anything else is rendered in the background
+    data = get_render_cache().get(etag)
+    if data is None:
+        key, run = _render_job(project)
+        return _submit_job('render', key, run)
+        
+    return send_file(
+        io.BytesIO(data),
+        mimetype='audio/midi',
+        as_attachment=True,
+        download_name=f"{name}.mid",
+        etag=etag
+    )
 
 if __name__ == '__main__':
     app.run(debug=settings.DEBUG, port=5000) 
\ No newline at end of file
@@ -0,0 +1,136 @@
+import argparse
+import sys
+import time
+from src.core.config import settings
+from src.core.data_processor import DataProcessor
+from src.core.grooves import import_grooves
+from src.core.project_manager import ProjectManager
+from src.core.render_cache import get_render_cache
+from src.core.similarity import get_similarity_index, index_exports, index_templates
+from src.core.templates import get_template_library
+
+def render(args) -> int:
+    """Render every project of a user on a process pool."""
+    manager = ProjectManager()
+    projects = manager.list_projects(args.user)
+    if args.names:
+        projects = [p for p in projects if p.name in set(args.names)]
+        
+    def progress(done: int, total: int):
+        print(f"\rRendered {done}/{total}", end="", file=sys.stderr, flush=True)
+        
+    results = manager.render_projects(
+        projects,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+        max_in_flight=args.max_in_flight,
+        progress=progress
+    )
+    if results:
+        print(file=sys.stderr)
+        
+    index = get_similarity_index()
+    if index.needs_compaction:
+        index.compact()
+        
+    failed = [r for r in results if not r.ok]
+    for result in results:
+        if result.ok:
+            print(f"{result.user}/{result.name}\t{result.output_path}")
+    for result in failed:
+        print(f"Error rendering {result.user}/{result.name}: {result.error}", file=sys.stderr)
+    return 1 if failed else 0
+
+def preprocess(args) -> int:
+    """Featurize a MIDI dataset into resumable shards."""
+    processor = DataProcessor()
+    
+    def progress(done: int, total: int):
+        print(f"\rProcessed {done}/{total}", end="", file=sys.stderr, flush=True)
+        
+    started = time.perf_counter()
+    manifest = processor.preprocess_dataset(
+        args.dataset,
+        output_dir=args.output,
+        max_workers=args.workers,
+        shard_size=args.shard_size,
+        max_in_flight=args.max_in_flight,
+        progress=progress
+    )
+    elapsed = time.perf_counter() - started
+    failed = sorted(file for file, record in manifest.items() if record.get("error"))
+    print(f"\n{len(manifest)} files in manifest, {len(failed)} unreadable ({elapsed:.1f}s)", file=sys.stderr)
+    for file in failed:
+        print(f"Error processing {file}: {manifest[file]['error']}", file=sys.stderr)
+    return 1 if failed else 0
+
+def import_grooves_command(args) -> int:
+    """Import MIDI drum loops as groove templates."""
+    def progress(done: int, total: int):
+        print(f"\rImported {done}/{total}", end="", file=sys.stderr, flush=True)
+        
+    report = import_grooves(
+        args.paths,
+        genre=args.genre,
+        output_dir=args.output,
+        tags=args.tags,
+        max_bars=args.max_bars,
+        max_workers=args.workers,
+        chunk_size=args.chunk_size,
+        progress=progress
+    )
+    print(f"\n{report['imported']} grooves imported, {len(report['failed'])} failed "
+          f"({report['seconds']:.1f}s, {report['files_per_sec']:.1f} files/sec)", file=sys.stderr)
+    for path, error in sorted(report["failed"].items()):
+        print(f"Error importing {path}: {error}", file=sys.stderr)
+    return 1 if report["failed"] else 0
+
+def similarity_index(args) -> int:
+    """Add templates and existing exports to the similarity index."""
+    index = get_similarity_index()
+    started = time.perf_counter()
+    templates = index_templates(index, get_template_library(refresh=True).templates)
+    exports = index_exports(index, get_render_cache().directory, ProjectManager().dedup_groups())
+    index.compact()
+    print(f"Indexed {templates} templates and {exports} exports, {len(index)} patterns in total "
+          f"({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="FL Studio AI Assistant command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    render_parser = subparsers.add_parser("render", help="Render all projects of a user")
+    render_parser.add_argument("--user", default=settings.DEFAULT_USER)
+    render_parser.add_argument("--names", nargs="*", help="Only render these projects")
+    render_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    render_parser.add_argument("--chunk-size", type=int, default=None, help="Projects per submitted task")
+    render_parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum pending tasks")
+    render_parser.set_defaults(func=render)
+    
+    preprocess_parser = subparsers.add_parser("preprocess", help="Featurize a MIDI dataset into shards")
+    preprocess_parser.add_argument("dataset", help="Directory containing metadata.json")
+    preprocess_parser.add_argument("--output", default=None, help="Shard directory (default: under PROCESSED_DATA_DIR)")
+    preprocess_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    preprocess_parser.add_argument("--shard-size", type=int, default=None, help="Files per shard")
+    preprocess_parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum pending shards")
+    preprocess_parser.set_defaults(func=preprocess)
+    
+    grooves_parser = subparsers.add_parser("import-grooves", help="Import MIDI drum loops as groove templates")
+    grooves_parser.add_argument("paths", nargs="+", help="MIDI files or directories to search")
+    grooves_parser.add_argument("--genre", default=None, help="Genre of every loop (default: each file's directory)")
+    grooves_parser.add_argument("--tags", nargs="*", default=None, help="Tags added to every template")
+    grooves_parser.add_argument("--output", default=None, help="Template directory (default: TEMPLATES_DIR/imported)")
+    grooves_parser.add_argument("--max-bars", type=int, default=4, help="Longest groove kept, in bars")
+    grooves_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    grooves_parser.add_argument("--chunk-size", type=int, default=None, help="Files per submitted task")
+    grooves_parser.set_defaults(func=import_grooves_command)
+    
+    index_parser = subparsers.add_parser("similarity-index", help="Index templates and exports for similarity search")
+    index_parser.set_defaults(func=similarity_index)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+from typing import Iterable, List
+
+class SectionSlot:
+    """A section placed on the song timeline."""
+
+    def __init__(self, name: str, offset: float, length: float, variation: int = 0):
+        self.name = name
+        self.offset = offset
+        self.length = length
+        self.variation = variation
+
+    @property
+    def end(self) -> float:
+        return self.offset + self.length
+
+    def __repr__(self) -> str:
+        return f"SectionSlot({self.name!r}, offset={self.offset}, length={self.length}, variation={self.variation})"
+
+class Arrangement:
+    """Sequential layout of sections: each slot starts where the previous one ends."""
+
+    def __init__(self):
+        self.slots: List[SectionSlot] = []
+
+    @property
+    def length(self) -> float:
+        return self.slots[-1].end if self.slots else 0.0
+
+    def append(self, name: str, length: float, variation: int = 0) -> SectionSlot:
+        """Add a section at the end of the timeline."""
+        slot = SectionSlot(name, self.length, length, variation)
+        self.slots.append(slot)
+        return slot
+
+    @classmethod
+    def from_sections(cls, sections: Iterable[str], section_length: float, variations: int = 1) -> 'Arrangement':
+        """Lay out a scenario's sections followed by ``variations - 1`` variation sections."""
+        arrangement = cls()
+        for section in sections:
+            arrangement.append(section, section_length)
+        for i in range(1, variations):
+            arrangement.append(f"variation_{i}", section_length, variation=i)
+        return arrangement
@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 import os
-from dataclasses import field
 
 class Settings(BaseSettings):
     # Model settings
@@ -15,7 +15,7 @@ class Settings(BaseSettings):
     NUM_LAYERS: int = 2
 
     # Genre patterns
-    GENRE_PATTERNS: Dict[str, Dict[str, List[Tuple[int, int]]]] = {
+    GENRE_PATTERNS: Dict[str, Dict[str, List[Tuple[int, float]]]] = {
         'house': {
             'kick': [(0, 1), (4, 1), (8, 1), (12, 1)],  # 4/4 kick pattern
             'snare': [(4, 1), (12, 1)],  # Backbeat snare
@@ -58,57 +58,137 @@ class Settings(BaseSettings):
     VALIDATION_SPLIT: float = 0.2
     MIN_DELTA: float = 0.001
 
+    # Application settings
+    APP_NAME: str = "FL Studio AI Assistant Pro"
+    VERSION: str = "1.0.0"
+    DEBUG: bool = True
+
+    # MIDI settings
+    MIDI_OUTPUT_PORT: Optional[str] = None
+    MIDI_PORT_TIMEOUT: float = 1.0  # Seconds non-blocking playback waits for a busy output
+    DEFAULT_TEMPO: int = 120
+    DEFAULT_TIME_SIGNATURE: str = "4/4"
+
+    # AI Model settings
+    MODEL_PATH: str = "models/weights"
+    MODEL_REGISTRY_MAX_MODELS: int = 2  # Loaded model versions kept resident
+
+    # Storage settings
+    PROJECTS_DIR: str = "projects"
+    TEMPLATES_DIR: str = "templates"
+    EXPORTS_DIR: str = "exports"
+
+    # Render cache settings
+    RENDER_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    RENDER_CACHE_MEMORY_ITEMS: int = 128
+
+    # Batch render settings
+    BATCH_MAX_WORKERS: int = os.cpu_count() or 1
+    BATCH_CHUNK_SIZE: int = 16
+    BATCH_MAX_IN_FLIGHT: int = 8
+
+    # Background job settings
+    JOB_WORKERS: int = 4
+    JOB_MAX_PENDING: int = 64
+    JOB_HISTORY: int = 1024
+
+    # Dataset preprocessing settings
+    PREPROCESS_MAX_WORKERS: int = os.cpu_count() or 1
+    PREPROCESS_SHARD_SIZE: int = 256  # MIDI files per feature shard
+    PREPROCESS_MAX_IN_FLIGHT: int = 8
+
+    # Groove import settings
+    GROOVE_IMPORT_MAX_WORKERS: int = os.cpu_count() or 1
+    GROOVE_IMPORT_CHUNK_SIZE: int = 32  # MIDI files per submitted task
+    GROOVE_IMPORT_MAX_IN_FLIGHT: int = 8
+
+    # Similarity index settings
+    SIMILARITY_RADIUS: int = 6  # Default search radius in fingerprint bits; at most 6
+    SIMILARITY_DEDUP_RADIUS: int = 2  # Patterns this close count as duplicates
+    SIMILARITY_MAX_PENDING: int = 4096  # Logged entries that trigger a background compaction
+
+    # User settings
+    DEFAULT_USER: str = "default"
+    MAX_PROJECTS_PER_USER: int = 100
+    PROJECT_FLUSH_DELAY: float = 0.0  # Seconds to coalesce project writes; 0 writes through
+
+    # Scenario templates
+    SCENARIOS: Dict[str, Dict[str, Any]] = {
+        "full_song": {
+            "sections": ["intro", "verse", "chorus", "bridge", "outro"],
+            "transitions": True,
+            "variations": True
+        },
+        "loop_based": {
+            "sections": ["main_loop", "variation_1", "variation_2"],
+            "transitions": False,
+            "variations": True
+        },
+        "live_performance": {
+            "sections": ["intro", "main", "breakdown", "build", "drop"],
+            "transitions": True,
+            "variations": True
+        }
+    }
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
-
-settings = Settings()
-
-# Create necessary directories
-for directory in [settings.DATA_DIR, settings.PROCESSED_DATA_DIR, settings.MODEL_DIR]:
-    os.makedirs(directory, exist_ok=True)
-
-# Application settings
-settings.APP_NAME = "FL Studio AI Assistant Pro"
-settings.VERSION = "1.0.0"
-settings.DEBUG = True
-
-# MIDI settings
-settings.MIDI_OUTPUT_PORT = None
-settings.DEFAULT_TEMPO = 120
-settings.DEFAULT_TIME_SIGNATURE = "4/4"
-
-# AI Model settings
-settings.MODEL_PATH = "models/weights"
-
-# Storage settings
-settings.PROJECTS_DIR = "projects"
-settings.TEMPLATES_DIR = "templates"
-settings.EXPORTS_DIR = "exports"
-
-# User settings
-settings.DEFAULT_USER = "default"
-settings.MAX_PROJECTS_PER_USER = 100
-
-# Scenario templates
-settings.SCENARIOS = {
-    "full_song": {
-        "sections": ["intro", "verse", "chorus", "bridge", "outro"],
-        "transitions": True,
-        "variations": True
-    },
-    "loop_based": {
-        "sections": ["main_loop", "variation_1", "variation_2"],
-        "transitions": False,
-        "variations": True
-    },
-    "live_performance": {
-        "sections": ["intro", "main", "breakdown", "build", "drop"],
-        "transitions": True,
-        "variations": True
-    }
-}
-
-# Create necessary directories
-for directory in [settings.PROJECTS_DIR, settings.TEMPLATES_DIR, settings.EXPORTS_DIR, settings.MODEL_PATH]:
-    os.makedirs(directory, exist_ok=True) 
\ No newline at end of file
+        extra = "allow"
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """The process-wide settings, read from the environment and ``.env`` on first use.
+    
+    Nothing is read or created when this module is imported; directories
+    named by the settings are created by the code that writes to them.
+    """
+    return Settings()
+
+class _SettingsProxy:
+    """Module-level ``settings`` that forwards to ``get_settings()``.
+    
+    Lets existing ``from src.core.config import settings`` imports keep
+    working without loading the settings at import time.
+    """
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+        
+    def __setattr__(self, name: str, value: Any):
+        setattr(get_settings(), name, value)
+        
+    def __delattr__(self, name: str):
+        delattr(get_settings(), name)
+
+settings = _SettingsProxy()
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+FLAT_NAMES = {'Db': 'C#', 'Eb': 'D#', 'Gb': 'F#', 'Ab': 'G#', 'Bb': 'A#'}
+
+class Lookups:
+    """Tables derived once from the settings, so hot paths do dict lookups.
+    
+    - ``note_pitches``: note name (``"C#4"``, ``"Bb-1"``) to MIDI pitch
+    - ``bpm_ranges`` / ``default_bpm``: genre to BPM range and its midpoint
+    """
+    
+    def __init__(self, settings: Settings):
+        self.note_pitches: Dict[str, int] = {}
+        for octave in range(-1, 10):
+            for index, name in enumerate(NOTE_NAMES):
+                pitch = (octave + 1) * 12 + index
+                if pitch <= 127:
+                    self.note_pitches[f"{name}{octave}"] = pitch
+        for flat, sharp in FLAT_NAMES.items():
+            for octave in range(-1, 10):
+                if f"{sharp}{octave}" in self.note_pitches:
+                    self.note_pitches[f"{flat}{octave}"] = self.note_pitches[f"{sharp}{octave}"]
+                    
+        self.bpm_ranges: Dict[str, Tuple[int, int]] = dict(settings.BPM_RANGES)
+        self.default_bpm: Dict[str, int] = {genre: (low + high) // 2 for genre, (low, high) in self.bpm_ranges.items()}
+
+@lru_cache(maxsize=None)
+def get_lookups() -> Lookups:
+    """Lookup tables for ``get_settings()``, built on first use."""
+    return Lookups(get_settings())
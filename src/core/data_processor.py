@@ -1,10 +1,95 @@
 import pretty_midi
 import numpy as np
-from typing import List, Dict, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, Union
+import hashlib
+import io
 import os
+import re
 from pathlib import Path
 import json
 from src.core.config import settings
+from src.core.project_store import atomic_write
+
+MANIFEST_FILENAME = "manifest.jsonl"
+SHARD_PATTERN = re.compile(r"^shard-(\d+)\.npy$")
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def shard_path(output_dir: str, shard_id: int) -> str:
+    return os.path.join(output_dir, f"shard-{shard_id:05d}.npy")
+
+def read_manifest(output_dir: str) -> Dict[str, Dict]:
+    """Latest manifest entry of every processed file, keyed by metadata path.
+    
+    The manifest is append-only JSON lines, one line per finished shard, so
+    later lines override earlier ones and a line torn by an interrupted run
+    is ignored.
+    """
+    manifest = {}
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return manifest
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records = json.loads(line)
+            except ValueError:
+                continue
+            for record in records:
+                manifest[record["file"]] = record
+    return manifest
+
+def _append_manifest(output_dir: str, records: List[Dict]):
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), 'a+b') as f:
+        # Start a fresh line after one torn by an interrupted run
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write(json.dumps(records, separators=(",", ":")).encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def _process_shard(shard_id: int, items: List[Dict], output_dir: str) -> List[Dict]:
+    """Featurize a group of files into one shard (runs inside worker processes).
+    
+    Returns a manifest record per file. Files whose content hash matches
+    their previous record keep pointing at their existing shard rows;
+    unreadable files get an ``error`` message instead of shard rows.
+    """
+    processor = DataProcessor()
+    features, records, offset = [], [], 0
+    for item in items:
+        previous = item.pop("previous", None)
+        record = dict(item, sha256=file_digest(item["path"]))
+        del record["path"]
+        if previous is not None and previous.get("sha256") == record["sha256"]:
+            records.append(dict(previous, **record))
+            continue
+        try:
+            midi = pretty_midi.PrettyMIDI(item["path"])
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        else:
+            note_features = processor.extract_note_features(midi).astype(np.float32)
+            record.update(shard=shard_id, offset=offset, length=len(note_features))
+            features.append(note_features)
+            offset += len(note_features)
+        records.append(record)
+    if features:
+        buffer = io.BytesIO()
+        np.save(buffer, np.concatenate(features))
+        atomic_write(shard_path(output_dir, shard_id), buffer.getvalue())
+    return records
 
 class DataProcessor:
     def __init__(self):
@@ -19,66 +104,268 @@ class DataProcessor:
             print(f"Error loading MIDI file {file_path}: {e}")
             return None
             
+    def note_arrays(self, midi: pretty_midi.PrettyMIDI) -> Dict[str, np.ndarray]:
+        """Collect every note into columnar arrays, sorted by start time then pitch."""
+        notes = [note for instrument in midi.instruments for note in instrument.notes]
+        columns = np.array(
+            [(note.start, note.end, note.pitch, note.velocity) for note in notes], dtype=np.float64
+        ).reshape(-1, 4)
+        order = np.lexsort((columns[:, 2], columns[:, 0]))
+        columns = columns[order]
+        return {
+            'start': columns[:, 0],
+            'end': columns[:, 1],
+            'pitch': columns[:, 2],
+            'velocity': columns[:, 3]
+        }
+        
+    def extract_note_features(self, midi: pretty_midi.PrettyMIDI) -> np.ndarray:
+        """Extract one row of normalized features per note, in start order.
+        
+        Columns follow ``settings.NOTE_FEATURES``; durations and gaps are
+        measured in beats at the file's initial tempo and clipped to 1.
+        """
+        notes = self.note_arrays(midi)
+        tempo_changes = midi.get_tempo_changes()[1]
+        beats_per_second = (tempo_changes[0] if len(tempo_changes) else 120.0) / 60.0
+        
+        columns = {
+            'pitch': notes['pitch'] / 127.0,
+            'velocity': notes['velocity'] / settings.MAX_VELOCITY,
+            'duration': (notes['end'] - notes['start']) * beats_per_second / settings.MAX_DURATION,
+            'time_since_last': np.diff(notes['start'], prepend=notes['start'][:1]) * beats_per_second
+            / settings.MAX_TIME_SINCE_LAST
+        }
+        features = np.column_stack([columns[name] for name in settings.NOTE_FEATURES])
+        return np.clip(features, 0.0, 1.0, out=features)
+        
     def extract_features(self, midi: pretty_midi.PrettyMIDI) -> np.ndarray:
-        """Extract features from a MIDI file."""
-        # Initialize feature matrix
+        """Extract a (sequence_length, n_features) matrix from a MIDI file.
+        
+        Holds the features of the first ``sequence_length`` notes, zero-padded
+        for shorter files.
+        """
+        note_features = self.extract_note_features(midi)[:self.sequence_length]
         features = np.zeros((self.sequence_length, self.n_features))
+        features[:len(note_features)] = note_features
+        return features
         
-        # Extract note features
-        for instrument in midi.instruments:
-            for note in instrument.notes:
-                # Convert time to sequence index
-                start_idx = int(note.start * midi.get_tempo_changes()[1][0] / 60)
-                if start_idx >= self.sequence_length:
-                    continue
-                    
-                # Add note features
-                features[start_idx, note.pitch] = note.velocity / 127.0
+    def _load_metadata(self, dataset_path: str) -> List[Dict]:
+        with open(os.path.join(dataset_path, 'metadata.json'), 'r') as f:
+            return json.load(f)
+            
+    def default_output_dir(self, dataset_path: str) -> str:
+        """Where a dataset's shards go: ``PROCESSED_DATA_DIR/<dataset name>``."""
+        return os.path.join(settings.PROCESSED_DATA_DIR, os.path.basename(os.path.normpath(dataset_path)))
+        
+    def preprocess_dataset(self, dataset_path: str, output_dir: Optional[str] = None,
+                           max_workers: Optional[int] = None, shard_size: Optional[int] = None,
+                           max_in_flight: Optional[int] = None,
+                           progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Dict]:
+        """Featurize a dataset into sharded ``.npy`` files on a process pool.
+        
+        Per-note features (see ``extract_note_features``) of ``shard_size``
+        files are concatenated into one float32 shard. Each finished shard is
+        recorded in an append-only manifest, so an interrupted run resumes
+        where it stopped. Files whose size and mtime match the manifest are
+        skipped without being read; files that were touched but hash the
+        same are not featurized again. ``progress(done, total)`` reports
+        files processed in this run. Files that cannot be read are recorded
+        with an ``error`` message and retried on the next run. Returns the
+        manifest.
+        """
+        max_workers = settings.PREPROCESS_MAX_WORKERS if max_workers is None else max_workers
+        shard_size = shard_size or settings.PREPROCESS_SHARD_SIZE
+        max_in_flight = max_in_flight or settings.PREPROCESS_MAX_IN_FLIGHT
+        output_dir = output_dir or self.default_output_dir(dataset_path)
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = read_manifest(output_dir)
+        
+        todo, missing = [], []
+        for file_info in self._load_metadata(dataset_path):
+            file_path = os.path.join(dataset_path, file_info['file'])
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                missing.append({"file": file_info['file'], "genre": file_info['genre'],
+                                "error": f"{type(e).__name__}: {e}"})
+                continue
+            item = {
+                "file": file_info['file'],
+                "genre": file_info['genre'],
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size
+            }
+            previous = manifest.get(item["file"])
+            if previous is not None and all(previous.get(k) == v for k, v in item.items()):
+                continue
+            todo.append(dict(item, path=file_path, previous=previous))
+            
+        # Never reuse a shard id, even one left behind by an interrupted run
+        existing = [int(m.group(1)) for m in map(SHARD_PATTERN.match, os.listdir(output_dir)) if m]
+        first_id = max(existing, default=-1) + 1
+        chunks = [todo[i:i + shard_size] for i in range(0, len(todo), shard_size)]
+        total, done = len(todo) + len(missing), 0
+        
+        def finish(records: List[Dict]):
+            nonlocal done
+            _append_manifest(output_dir, records)
+            for record in records:
+                manifest[record["file"]] = record
+            done += len(records)
+            if progress:
+                progress(done, total)
                 
-        return features
+        if missing:
+            finish(missing)
+        if max_workers <= 1:
+            for index, chunk in enumerate(chunks):
+                finish(_process_shard(first_id + index, chunk, output_dir))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                pending = set()
+                for index, chunk in enumerate(chunks):
+                    if len(pending) >= max_in_flight:
+                        completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in completed:
+                            finish(future.result())
+                    pending.add(executor.submit(_process_shard, first_id + index, chunk, output_dir))
+                for future in as_completed(pending):
+                    finish(future.result())
+                    
+        return manifest
+        
+    def process_dataset(self, dataset_path: str, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """Process a dataset of MIDI files with genre labels.
         
-    def process_dataset(self, dataset_path: str) -> Tuple[np.ndarray, np.ndarray]:
-        """Process a dataset of MIDI files with genre labels."""
+        Runs ``preprocess_dataset`` (keyword arguments are passed through),
+        then returns one ``extract_features`` matrix per readable file, in
+        metadata order, read from the shards.
+        """
+        output_dir = kwargs.get('output_dir') or self.default_output_dir(dataset_path)
+        manifest = self.preprocess_dataset(dataset_path, **kwargs)
         X = []
         y = []
+        shards: Dict[int, np.ndarray] = {}
         
-        # Load dataset metadata
-        metadata_path = os.path.join(dataset_path, 'metadata.json')
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
-            
-        # Process each file
-        for file_info in metadata:
-            file_path = os.path.join(dataset_path, file_info['file'])
-            genre = file_info['genre']
-            
-            midi = self.load_midi_file(file_path)
-            if midi is None:
+        for file_info in self._load_metadata(dataset_path):
+            record = manifest.get(file_info['file'])
+            if record is None or record.get("error"):
                 continue
-                
-            features = self.extract_features(midi)
+            if record["shard"] not in shards:
+                shards[record["shard"]] = np.load(shard_path(output_dir, record["shard"]), mmap_mode='r')
+            length = min(record["length"], self.sequence_length)
+            features = np.zeros((self.sequence_length, self.n_features))
+            features[:length] = shards[record["shard"]][record["offset"]:record["offset"] + length]
             X.append(features)
-            y.append(genre)
+            y.append(record["genre"])
             
         return np.array(X), np.array(y)
         
     def create_sequence_dataset(self, X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        """Create sequences for training."""
-        sequences = []
-        labels = []
+        """Create sequences for training.
         
-        for i in range(len(X) - self.sequence_length):
-            sequences.append(X[i:i + self.sequence_length])
-            labels.append(y[i + self.sequence_length])
-            
-        return np.array(sequences), np.array(labels)
+        Sequence ``i`` is ``X[i:i + sequence_length]`` labelled with
+        ``y[i + sequence_length]``. Both results are views of the inputs, so
+        no window is copied and memory-mapped inputs stay on disk.
+        """
+        if len(X) <= self.sequence_length:
+            return np.empty((0, self.sequence_length) + X.shape[1:], dtype=X.dtype), y[:0]
+        # The last window has no label; sliding_window_view puts the window
+        # axis last, so move it after the sequence index
+        windows = sliding_window_view(X[:-1], self.sequence_length, axis=0)
+        return np.moveaxis(windows, -1, 1), y[self.sequence_length:]
         
     def save_processed_data(self, X: np.ndarray, y: np.ndarray, output_path: str):
-        """Save processed data to disk."""
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        np.savez(output_path, X=X, y=y)
-        
-    def load_processed_data(self, input_path: str) -> Tuple[np.ndarray, np.ndarray]:
-        """Load processed data from disk."""
-        data = np.load(input_path)
-        return data['X'], data['y'] 
\ No newline at end of file
+        """Save processed data to disk as raw ``X.npy``/``y.npy`` arrays in ``output_path``.
+        
+        Unlike an ``.npz`` archive these can be memory-mapped on load.
+        """
+        os.makedirs(output_path, exist_ok=True)
+        for name, array in (('X', X), ('y', y)):
+            buffer = io.BytesIO()
+            np.save(buffer, np.asarray(array))
+            atomic_write(os.path.join(output_path, f"{name}.npy"), buffer.getvalue())
+        
+    def load_processed_data(self, input_path: str, mmap: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Load processed data from disk, memory-mapped unless ``mmap`` is False.
+        
+        ``.npz`` archives written by earlier versions are still read, fully
+        into memory.
+        """
+        if os.path.isfile(input_path):
+            data = np.load(input_path)
+            return data['X'], data['y']
+        mmap_mode = 'r' if mmap else None
+        return (np.load(os.path.join(input_path, 'X.npy'), mmap_mode=mmap_mode),
+                np.load(os.path.join(input_path, 'y.npy'), mmap_mode=mmap_mode))
+
+class WindowedDataset:
+    """Training windows over the memory-mapped feature shards of a dataset.
+    
+    Each sample is ``sequence_length`` consecutive notes of one file, the
+    file's genre and the note that follows as the target. Windows are
+    zero-copy ``sliding_window_view``s of the shards, so only the notes of
+    the current mini-batch are ever read into memory.
+    """
+    
+    def __init__(self, shards: Dict[int, np.ndarray], records: List[Dict], sequence_length: int,
+                 seed: Optional[int] = None):
+        self.sequence_length = sequence_length
+        self.rng = np.random.default_rng(seed)
+        self._features = shards
+        self._windows = {
+            shard: np.moveaxis(sliding_window_view(features, sequence_length, axis=0), -1, 1)
+            for shard, features in shards.items() if len(features) > sequence_length
+        }
+        records = [r for r in records if r["length"] > sequence_length]
+        self.genres = np.array([r["genre"] for r in records])
+        self._shard = np.array([r["shard"] for r in records], dtype=np.int64)
+        self._offset = np.array([r["offset"] for r in records], dtype=np.int64)
+        counts = np.array([r["length"] - sequence_length for r in records], dtype=np.int64)
+        self._first = np.concatenate([[0], np.cumsum(counts)])
+        
+    @classmethod
+    def from_shards(cls, output_dir: str, sequence_length: Optional[int] = None,
+                    seed: Optional[int] = None) -> 'WindowedDataset':
+        """Open the shards written by ``DataProcessor.preprocess_dataset``."""
+        records = [r for r in read_manifest(output_dir).values() if not r.get("error") and r["length"]]
+        shards = {
+            shard: np.load(shard_path(output_dir, shard), mmap_mode='r')
+            for shard in sorted({r["shard"] for r in records})
+        }
+        return cls(shards, records, sequence_length or settings.SEQUENCE_LENGTH, seed)
+        
+    def __len__(self) -> int:
+        return int(self._first[-1])
+        
+    def n_batches(self, batch_size: int) -> int:
+        return -(-len(self) // batch_size)
+        
+    def take(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Windows, genres and target notes of the given sample indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        files = np.searchsorted(self._first, indices, side='right') - 1
+        starts = self._offset[files] + indices - self._first[files]
+        shards = self._shard[files]
+        n_features = next(iter(self._features.values())).shape[1] if self._features else 0
+        windows = np.empty((len(indices), self.sequence_length, n_features), dtype=np.float32)
+        targets = np.empty((len(indices), n_features), dtype=np.float32)
+        for shard in np.unique(shards):
+            mask = shards == shard
+            windows[mask] = self._windows[shard][starts[mask]]
+            targets[mask] = self._features[shard][starts[mask] + self.sequence_length]
+        return windows, self.genres[files], targets
+        
+    def batches(self, batch_size: Optional[int] = None,
+                shuffle: bool = True) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield ``(windows, genres, targets)`` mini-batches covering every sample once.
+        
+        Each call draws a new shuffle. Indices within a batch are sorted so
+        reads from the memory-mapped shards stay as sequential as possible.
+        ``batch_size`` defaults to ``settings.BATCH_SIZE``.
+        """
+        batch_size = settings.BATCH_SIZE if batch_size is None else batch_size
+        order = self.rng.permutation(len(self)) if shuffle else np.arange(len(self))
+        for i in range(0, len(order), batch_size):
+            yield self.take(np.sort(order[i:i + batch_size]))
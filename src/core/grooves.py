@@ -0,0 +1,201 @@
+import os
+import time
+import numpy as np
+import pretty_midi
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Callable, Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.core.patterns import GRID_STEPS, STEPS_PER_BEAT
+from src.core.project_store import atomic_write, dumps
+from src.core.templates import TemplateError, compile_template, get_template_library
+
+MIDI_EXTENSIONS = (".mid", ".midi")
+# Shortest duration given to an imported hit, in beats
+MIN_HIT_BEATS = 1 / 16
+
+# General MIDI percussion notes folded onto the drums templates can play
+GM_DRUMS = {
+    35: 'kick', 36: 'kick',
+    37: 'snare', 38: 'snare', 39: 'snare', 40: 'snare',
+    42: 'hihat', 44: 'hihat', 46: 'hihat',
+    41: 'tom', 43: 'tom', 45: 'tom', 47: 'tom', 48: 'tom', 50: 'tom',
+    49: 'crash', 52: 'crash', 55: 'crash', 57: 'crash'
+}
+
+def quantize_drums(midi: pretty_midi.PrettyMIDI, max_bars: int = 4) -> Tuple[int, Dict[str, Dict[str, np.ndarray]]]:
+    """Quantize the drum tracks' onsets to the 16th-note grid.
+
+    Notes on every drum track are merged and mapped onto template drums
+    through ``GM_DRUMS``; other percussion is dropped. Onsets are measured
+    in ticks, so tempo changes are respected. Returns the grid length in
+    steps (whole bars, at most ``max_bars``) and, per drum, ``step``,
+    ``velocity``, ``offset`` (micro-timing in steps, within half a step)
+    and ``duration`` (in beats) arrays ordered by step. When several hits
+    of one drum land on the same step, the loudest is kept.
+    """
+    notes = [(note.start, note.end, note.pitch, note.velocity)
+             for instrument in midi.instruments if instrument.is_drum
+             for note in instrument.notes if note.pitch in GM_DRUMS]
+    if not notes:
+        raise TemplateError("no drum hits on a General MIDI drum track")
+    start, end, pitch, velocity = np.array(notes, dtype=np.float64).T
+    start_ticks = np.array([midi.time_to_tick(t) for t in start], dtype=np.float64)
+    end_ticks = np.array([midi.time_to_tick(t) for t in end], dtype=np.float64)
+    position = start_ticks * STEPS_PER_BEAT / midi.resolution
+    step = np.rint(position).astype(np.int64)
+    offset = position - step
+    duration = np.maximum((end_ticks - start_ticks) / midi.resolution, MIN_HIT_BEATS)
+
+    bars = int(min(max_bars, step.max() // GRID_STEPS + 1))
+    drum = np.array([GM_DRUMS[int(p)] for p in pitch])
+    keep = step < bars * GRID_STEPS
+    drums = {}
+    for name in dict.fromkeys(GM_DRUMS.values()):
+        selected = np.flatnonzero(keep & (drum == name))
+        if selected.size == 0:
+            continue
+        # Loudest first, then the first hit of each step wins
+        selected = selected[np.lexsort((-velocity[selected], step[selected]))]
+        _, first = np.unique(step[selected], return_index=True)
+        selected = selected[first]
+        drums[name] = {
+            'step': step[selected],
+            'velocity': velocity[selected].astype(np.int64),
+            'offset': offset[selected],
+            'duration': duration[selected]
+        }
+    return bars * GRID_STEPS, drums
+
+def groove_genre(path: str) -> str:
+    """Default genre of a loop: the name of its directory."""
+    return os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+def groove_name(path: str, genre: Optional[str] = None) -> str:
+    """Default template name of a loop: ``<genre>-<file stem>``."""
+    return f"{genre or groove_genre(path)}-{os.path.splitext(os.path.basename(path))[0]}"
+
+def groove_template(path: str, genre: Optional[str] = None, name: Optional[str] = None,
+                    tags: Optional[List[str]] = None, max_bars: int = 4) -> Dict:
+    """Read a MIDI drum loop as a template definition (see ``compile_template``).
+
+    ``genre`` defaults to the name of the file's directory and ``name`` to
+    ``<genre>-<file stem>``; the BPM is the file's initial tempo.
+    """
+    genre = genre or groove_genre(path)
+    name = name or groove_name(path, genre)
+    try:
+        midi = pretty_midi.PrettyMIDI(path)
+    except Exception as e:
+        raise TemplateError(f"unreadable MIDI file: {e}") from None
+    steps, drums = quantize_drums(midi, max_bars)
+    tempi = midi.get_tempo_changes()[1]
+    return {
+        "name": name,
+        "genre": genre,
+        "tags": list(tags or []) + ["imported"],
+        "bpm": int(round(tempi[0])) if len(tempi) else settings.DEFAULT_TEMPO,
+        "steps": steps,
+        "drums": {
+            drum: [[int(s), round(float(d), 4), int(v), round(float(o), 4)]
+                   for s, v, o, d in zip(hits['step'], hits['velocity'], hits['offset'], hits['duration'])]
+            for drum, hits in drums.items()
+        }
+    }
+
+def find_midi_files(paths: List[str]) -> List[str]:
+    """Expand files and directories (recursively) into a sorted list of MIDI files."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found += [os.path.join(root, f) for f in files if f.lower().endswith(MIDI_EXTENSIONS)]
+        else:
+            found.append(path)
+    return sorted(found)
+
+def _import_chunk(paths: List[str], output_dir: str, genre: Optional[str], tags: Optional[List[str]],
+                  max_bars: int) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """Worker: convert MIDI files into template files; returns (path, name, error) per file."""
+    results = []
+    for path in paths:
+        try:
+            template = groove_template(path, genre, tags=tags, max_bars=max_bars)
+            compile_template(template, path, template["name"])  # Validate before writing
+            directory = os.path.join(output_dir, template["genre"])
+            os.makedirs(directory, exist_ok=True)
+            atomic_write(os.path.join(directory, f"{template['name']}.json"), dumps(template))
+            results.append((path, template["name"], None))
+        except TemplateError as e:
+            results.append((path, None, str(e)))
+        except Exception as e:
+            # Malformed files can fail anywhere in the MIDI parser
+            results.append((path, None, f"{type(e).__name__}: {e}"))
+    return results
+
+def import_grooves(paths: List[str], genre: Optional[str] = None, output_dir: Optional[str] = None,
+                   tags: Optional[List[str]] = None, max_bars: int = 4, max_workers: Optional[int] = None,
+                   chunk_size: Optional[int] = None, max_in_flight: Optional[int] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Import MIDI drum loops as groove templates on a process pool.
+
+    ``paths`` may mix files and directories. Each loop is quantized with
+    ``quantize_drums`` and written as ``<output_dir>/<genre>/<name>.json``;
+    ``output_dir`` defaults to ``imported`` under ``settings.TEMPLATES_DIR``,
+    and the process-wide template library is refreshed afterwards so the
+    grooves can be played straight away. ``progress(done, total)`` reports
+    files processed. Files that would get the same template name as an
+    earlier file (the same stem in one genre) are not imported and are
+    reported as failed.
+
+    Returns a report with the imported template names, failed files with
+    their errors, the elapsed seconds and the throughput in files/sec.
+    """
+    max_workers = settings.GROOVE_IMPORT_MAX_WORKERS if max_workers is None else max_workers
+    chunk_size = chunk_size or settings.GROOVE_IMPORT_CHUNK_SIZE
+    max_in_flight = max_in_flight or settings.GROOVE_IMPORT_MAX_IN_FLIGHT
+    output_dir = output_dir or os.path.join(settings.TEMPLATES_DIR, "imported")
+    files = find_midi_files(paths)
+    report = {"templates": [], "failed": {}}
+    started = time.perf_counter()
+    owners: Dict[str, str] = {}
+    for path in files:
+        name = groove_name(path, genre)
+        owner = owners.setdefault(name, path)
+        if owner != path:
+            report["failed"][path] = f"template {name!r} is already imported from {owner}"
+    todo = [path for path in files if path not in report["failed"]]
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    def finish(results: List[Tuple[str, Optional[str], Optional[str]]]):
+        for path, name, error in results:
+            if error is None:
+                report["templates"].append(name)
+            else:
+                report["failed"][path] = error
+        if progress:
+            progress(len(report["templates"]) + len(report["failed"]), len(files))
+
+    args = (output_dir, genre, tags, max_bars)
+    if max_workers <= 1:
+        for chunk in chunks:
+            finish(_import_chunk(chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for chunk in chunks:
+                if len(pending) >= max_in_flight:
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        finish(future.result())
+                pending.add(executor.submit(_import_chunk, chunk, *args))
+            for future in as_completed(pending):
+                finish(future.result())
+
+    elapsed = time.perf_counter() - started
+    get_template_library(refresh=True)
+    report.update(
+        imported=len(report["templates"]),
+        seconds=elapsed,
+        files_per_sec=len(files) / elapsed if elapsed > 0 else 0.0
+    )
+    return report
@@ -0,0 +1,124 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from src.core.config import settings
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+class Job:
+    """A unit of background work and its outcome."""
+    def __init__(self, key: str, kind: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.kind = kind
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+class JobQueue:
+    """Bounded, deduplicating job queue backed by a local thread pool.
+
+    Submitting a job whose key matches one that is still queued or running
+    returns the existing job instead of doing the work twice. Once
+    ``max_pending`` jobs are unfinished, further submissions raise
+    ``QueueFullError`` so callers can apply backpressure. The last
+    ``history`` jobs are kept for status polling.
+    """
+    def __init__(self, max_workers: int, max_pending: int, history: int):
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._in_flight: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, kind: str, fn: Callable[[], Any]) -> Job:
+        """Queue ``fn`` under a dedup ``key``, returning its job."""
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                return existing
+            if len(self._in_flight) >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending jobs)")
+            job = Job(key, kind)
+            self._in_flight[key] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def _run(self, job: Job, fn: Callable[[], Any]):
+        job.status = RUNNING
+        try:
+            job.result = fn()
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            with self._lock:
+                self._in_flight.pop(job.key, None)
+            job._done.set()
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                max_workers=settings.JOB_WORKERS,
+                max_pending=settings.JOB_MAX_PENDING,
+                history=settings.JOB_HISTORY
+            )
+        return _job_queue
@@ -1,259 +1,268 @@
 import pretty_midi
 import numpy as np
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, Dict, Optional, Tuple
 import mido
-import rtmidi
 from src.core.config import settings
+from src.core.note_store import NoteStore, NoteTrack
+from src.core.midi_writer import StreamingMidiWriter, encode_smf, write_smf
+from src.core.variations import derive_variation
+from src.core.arrangement import Arrangement, SectionSlot
+from src.core.midi_output import get_midi_output_pool
+from src.core.playback import PlaybackEngine, PlaybackEvents
+from src.core.patterns import STEPS_PER_BEAT, get_pattern_registry
+from src.core.templates import get_template_library
 import json
 import os
 
+# Seconds per grid step; patterns are laid out on a 16-step grid.
+STEP_DURATION = 0.25
+SECTION_STEPS = 16
+SECTION_LENGTH = SECTION_STEPS * STEP_DURATION
+
+# Bump whenever a change alters generated output, to invalidate cached renders.
+GENERATOR_VERSION = 6
+
 class MIDIGenerator:
-    def __init__(self, tempo: int = settings.DEFAULT_TEMPO):
-        self.tempo = tempo
-        self.pm = pretty_midi.PrettyMIDI(initial_tempo=tempo)
-        self.midi_out = None
-        self._initialize_midi_output()
-        
-    def _initialize_midi_output(self):
-        """Initialize MIDI output port."""
-        try:
-            self.midi_out = rtmidi.MidiOut()
-            available_ports = self.midi_out.get_ports()
-            
-            if settings.MIDI_OUTPUT_PORT and settings.MIDI_OUTPUT_PORT in available_ports:
-                port_index = available_ports.index(settings.MIDI_OUTPUT_PORT)
-                self.midi_out.open_port(port_index)
-            elif available_ports:
-                self.midi_out.open_port(0)
-        except Exception as e:
-            print(f"Warning: Could not initialize MIDI output: {e}")
-            self.midi_out = None
+    def __init__(self, tempo: Optional[int] = None, seed: Optional[int] = None):
+        self.tempo = settings.DEFAULT_TEMPO if tempo is None else tempo
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.notes = NoteStore()
+        self.arrangement = Arrangement()
             
+    @property
+    def pm(self) -> pretty_midi.PrettyMIDI:
+        """The current pattern as a PrettyMIDI object, built on access."""
+        return self.notes.to_pretty_midi(self.tempo)
+
     def create_pattern(self, pattern_type: str, scenario: str = "loop_based", 
-                      variations: int = 1, complexity: int = 1) -> pretty_midi.PrettyMIDI:
-        """Generate a complete pattern with multiple instruments and variations."""
-        # Clear existing instruments
-        self.pm.instruments = []
-        
-        # Get scenario configuration
-        scenario_config = settings.SCENARIOS.get(scenario, settings.SCENARIOS["loop_based"])
+                      variations: int = 1, complexity: int = 1) -> NoteStore:
+        """Generate a complete pattern with multiple instruments and variations.
+
+        The scenario's sections are laid out one after another on an
+        ``Arrangement``, followed by one section per extra variation. Each
+        instrument role gets a single track spanning the whole song.
+
+        The random generator is re-seeded from ``self.seed`` on every call, so
+        identical inputs always produce identical patterns.
+        """
+        # Clear existing tracks
+        self.notes.clear()
         
-        # Generate patterns for each section
-        for section in scenario_config["sections"]:
-            self._generate_section(section, pattern_type, complexity)
-            
-        # Add variations if requested
-        if variations > 1:
-            self._add_variations(variations, pattern_type)
+        for slot, chunk in self.iter_pattern(pattern_type, scenario, variations, complexity):
+            for n, track in enumerate(chunk.tracks):
+                if n == len(self.notes.tracks):
+                    self.notes.new_track(program=track.program, is_drum=track.is_drum, name=track.name)
+                self.notes.tracks[n].add_notes(track.pitch, track.velocity, track.start, track.end)
             
         # Add transitions if specified in scenario
-        if scenario_config.get("transitions", False):
+        if settings.SCENARIOS.get(scenario, settings.SCENARIOS["loop_based"]).get("transitions", False):
             self._add_transitions()
             
-        return self.pm
+        return self.notes
     
-    def _generate_section(self, section: str, pattern_type: str, complexity: int):
-        """Generate a specific section of the pattern."""
-        # Generate drums
-        self.create_drum_pattern(pattern_type, complexity=complexity)
+    def iter_pattern(self, pattern_type: str, scenario: str = "loop_based",
+                     variations: int = 1, complexity: int = 1) -> Iterator[Tuple[SectionSlot, NoteStore]]:
+        """Generate a pattern lazily, one arrangement section at a time.
+
+        Yields ``(slot, chunk)`` pairs where ``chunk`` holds the section's
+        notes at absolute song times, one track per instrument role in a
+        fixed order. Variation sections are derived only when reached, so
+        memory stays bounded by one section however long the arrangement
+        is. Concatenating the chunks gives exactly what ``create_pattern``
+        builds.
+        """
+        self.rng = np.random.default_rng(self.seed)
         
-        # Generate bass
-        self.create_bass_line(pattern_type, complexity=complexity)
+        # Get scenario configuration
+        scenario_config = settings.SCENARIOS.get(scenario, settings.SCENARIOS["loop_based"])
+        sections = scenario_config["sections"]
+        self.arrangement = Arrangement.from_sections(sections, SECTION_LENGTH, variations)
         
-        # Generate harmony
-        self.create_harmony(pattern_type, complexity=complexity)
+        # Sections differ only by their position, so every scenario section
+        # reuses one generated block; variations are derived from it.
+        base_block = self._generate_section(sections[0], pattern_type, complexity)
+        for slot in self.arrangement.slots:
+            block = base_block if slot.variation == 0 else self._derive_variation(slot.variation, base_block)
+            yield slot, self._place_block(block, slot.offset)
+    
+    def _generate_section(self, section: str, pattern_type: str, complexity: int) -> Dict[str, NoteTrack]:
+        """Generate the note block of one section, keyed by instrument role."""
+        block = {
+            "drums": self._drum_track(pattern_type, complexity),
+            "bass": self._bass_track(pattern_type, complexity),
+            "harmony": self._harmony_track(pattern_type, complexity)
+        }
         
         # Generate melody if complexity is high enough
         if complexity > 1:
-            self.create_melody(pattern_type, complexity=complexity)
+            block["melody"] = self._melody_track(pattern_type, complexity)
+        return block
+    
+    def _place_block(self, block: Dict[str, NoteTrack], offset: float) -> NoteStore:
+        """Copy a section block into a new store, shifted to ``offset``."""
+        chunk = NoteStore()
+        for track in block.values():
+            chunk.new_track(program=track.program, is_drum=track.is_drum, name=track.name).add_notes(
+                track.pitch, track.velocity, track.start + offset, track.end + offset
+            )
+        return chunk
             
-    def create_drum_pattern(self, pattern_type: str, complexity: int = 1) -> pretty_midi.PrettyMIDI:
-        """Generate an enhanced drum pattern."""
-        drum_program = pretty_midi.Instrument(program=0, is_drum=True)
-        
-        # Get pattern configuration
-        pattern_config = settings.GENRE_PATTERNS.get(pattern_type, {}).get("drums", {})
+    def create_drum_pattern(self, pattern_type: str, complexity: int = 1,
+                            template: Optional[str] = None) -> NoteStore:
+        """Generate an enhanced drum pattern.
+
+        ``template`` names a groove from the template library to play
+        instead of the genre's built-in pattern.
+        """
+        self.notes.add_track(self._drum_track(pattern_type, complexity, template))
+        return self.notes
+    
+    def _drum_track(self, pattern_type: str, complexity: int, template: Optional[str] = None) -> NoteTrack:
+        drum_program = NoteTrack(program=0, is_drum=True, name="Drums")
         
-        # Generate basic pattern
-        for drum, pattern in pattern_config.items():
-            self._add_drum_notes(drum_program, drum, pattern, complexity)
+        # Place the genre's (or template's) precompiled hits on the grid
+        if template is None:
+            hits = get_pattern_registry().get(pattern_type)
+        else:
+            hits = get_template_library().get(template)
+            if hits is None:
+                raise ValueError(f"Unknown template: {template}")
+        if hits.drum_count:
+            velocities = self.rng.integers(80, 120, size=hits.drum_count)  # Add some variation
+            velocities = np.where(hits.drum_velocity > 0, hits.drum_velocity, velocities)
+            start_times = np.maximum(hits.drum_step + hits.drum_offset, 0.0) * STEP_DURATION
+            end_times = start_times + hits.drum_duration * (STEPS_PER_BEAT * STEP_DURATION)
+            drum_program.add_notes(hits.drum_pitch, velocities, start_times, end_times)
             
         # Add complexity-based variations
         if complexity > 1:
             self._add_drum_fills(drum_program, complexity)
             
-        self.pm.instruments.append(drum_program)
-        return self.pm
+        return drum_program
     
-    def _add_drum_notes(self, program: pretty_midi.Instrument, drum: str, 
-                       pattern: List[int], complexity: int):
-        """Add drum notes with velocity variations."""
-        drum_notes = {
-            'kick': 36,
-            'snare': 38,
-            'hihat': 42,
-            'tom': 45,
-            'crash': 49
-        }
-        
-        for i, is_note in enumerate(pattern):
-            if is_note:
-                velocity = np.random.randint(80, 120)  # Add some variation
-                start_time = i * 0.25
-                note = pretty_midi.Note(
-                    velocity=velocity,
-                    pitch=drum_notes.get(drum, 36),
-                    start=start_time,
-                    end=start_time + 0.2
-                )
-                program.notes.append(note)
-                
-    def _add_drum_fills(self, program: pretty_midi.Instrument, complexity: int):
+    def _add_drum_fills(self, program: NoteTrack, complexity: int):
         """Add drum fills based on complexity."""
         if complexity > 2:
             # Add tom fills
-            for i in range(4):
-                start_time = i * 0.25
-                note = pretty_midi.Note(
-                    velocity=100,
-                    pitch=45,  # Tom
-                    start=start_time,
-                    end=start_time + 0.2
-                )
-                program.notes.append(note)
+            start_times = np.arange(4) * STEP_DURATION
+            program.add_notes(45, 100, start_times, start_times + 0.2)  # Tom
                 
-    def create_bass_line(self, pattern_type: str, complexity: int = 1) -> pretty_midi.PrettyMIDI:
+    def create_bass_line(self, pattern_type: str, complexity: int = 1) -> NoteStore:
         """Generate an enhanced bass line."""
-        bass_program = pretty_midi.Instrument(program=32)  # Acoustic Bass
-        
-        # Get pattern configuration
-        pattern_config = settings.GENRE_PATTERNS.get(pattern_type, {}).get("bass", {})
+        self.notes.add_track(self._bass_track(pattern_type, complexity))
+        return self.notes
+    
+    def _bass_track(self, pattern_type: str, complexity: int) -> NoteTrack:
+        bass_program = NoteTrack(program=32, name="Bass")  # Acoustic Bass
         
-        # Generate notes
-        for i, rhythm in enumerate(pattern_config.get("rhythm", [])):
-            if rhythm:
-                note = pattern_config.get("notes", ["C2"])[i % len(pattern_config.get("notes", ["C2"]))]
-                start_time = i * 0.25
-                note_obj = pretty_midi.Note(
-                    velocity=100,
-                    pitch=self._note_to_midi(note),
-                    start=start_time,
-                    end=start_time + 0.5
-                )
-                bass_program.notes.append(note_obj)
+        # Place the genre's precompiled bass line on the grid
+        bass = get_pattern_registry().get(pattern_type)
+        if bass.bass_step.size:
+            start_times = bass.bass_step * STEP_DURATION
+            bass_program.add_notes(bass.bass_pitch, 100, start_times, start_times + 0.5)
                 
-        self.pm.instruments.append(bass_program)
-        return self.pm
+        return bass_program
     
-    def create_harmony(self, pattern_type: str, complexity: int = 1) -> pretty_midi.PrettyMIDI:
+    def create_harmony(self, pattern_type: str, complexity: int = 1) -> NoteStore:
         """Generate harmony parts."""
-        harmony_program = pretty_midi.Instrument(program=0)  # Piano
+        self.notes.add_track(self._harmony_track(pattern_type, complexity))
+        return self.notes
+    
+    def _harmony_track(self, pattern_type: str, complexity: int) -> NoteTrack:
+        harmony_program = NoteTrack(program=0, name="Harmony")  # Piano
         
         # Basic chord progression based on genre
-        chords = self._get_chord_progression(pattern_type)
+        chord_pitches = self._chord_pitch_matrix(pattern_type)
         
-        for i, chord in enumerate(chords):
-            start_time = i * 1.0  # One chord per bar
-            for note in chord:
-                note_obj = pretty_midi.Note(
-                    velocity=80,
-                    pitch=self._note_to_midi(note),
-                    start=start_time,
-                    end=start_time + 1.0
-                )
-                harmony_program.notes.append(note_obj)
+        # One chord per bar, every chord tone sounding for the whole bar
+        start_times = np.repeat(np.arange(len(chord_pitches)) * 1.0, chord_pitches.shape[1])
+        harmony_program.add_notes(chord_pitches.ravel(), 80, start_times, start_times + 1.0)
                 
-        self.pm.instruments.append(harmony_program)
-        return self.pm
+        return harmony_program
     
-    def create_melody(self, pattern_type: str, complexity: int = 1) -> pretty_midi.PrettyMIDI:
+    def create_melody(self, pattern_type: str, complexity: int = 1) -> NoteStore:
         """Generate a melody line."""
-        melody_program = pretty_midi.Instrument(program=73)  # Flute
+        self.notes.add_track(self._melody_track(pattern_type, complexity))
+        return self.notes
+    
+    def _melody_track(self, pattern_type: str, complexity: int) -> NoteTrack:
+        melody_program = NoteTrack(program=73, name="Melody")  # Flute
         
         # Generate simple melody based on chord progression
-        chords = self._get_chord_progression(pattern_type)
+        chord_pitches = self._chord_pitch_matrix(pattern_type)
         
-        for i, chord in enumerate(chords):
-            start_time = i * 1.0
-            # Select a note from the chord
-            note = chord[np.random.randint(0, len(chord))]
-            note_obj = pretty_midi.Note(
-                velocity=90,
-                pitch=self._note_to_midi(note) + 12,  # One octave higher
-                start=start_time,
-                end=start_time + 0.5
-            )
-            melody_program.notes.append(note_obj)
+        # Select one note from each chord, one octave higher
+        choices = self.rng.integers(0, chord_pitches.shape[1], size=len(chord_pitches))
+        pitches = chord_pitches[np.arange(len(chord_pitches)), choices] + 12
+        start_times = np.arange(len(chord_pitches)) * 1.0
+        melody_program.add_notes(pitches, 90, start_times, start_times + 0.5)
             
-        self.pm.instruments.append(melody_program)
-        return self.pm
+        return melody_program
     
-    def _note_to_midi(self, note: str) -> int:
-        """Convert note name to MIDI pitch number."""
-        notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-        note_name = note[:-1]
-        octave = int(note[-1])
-        return notes.index(note_name) + (octave + 1) * 12
-        
-    def _get_chord_progression(self, pattern_type: str) -> List[List[str]]:
-        """Get chord progression based on genre."""
-        progressions = {
-            'reggae': [
-                ['C2', 'E2', 'G2'],
-                ['G2', 'B2', 'D3'],
-                ['A2', 'C3', 'E3'],
-                ['F2', 'A2', 'C3']
-            ],
-            'hiphop': [
-                ['C2', 'F2', 'A2'],
-                ['F2', 'A2', 'C3'],
-                ['G2', 'B2', 'D3'],
-                ['A2', 'C3', 'E3']
-            ],
-            'edm': [
-                ['C2', 'E2', 'G2'],
-                ['G2', 'B2', 'D3'],
-                ['A2', 'C3', 'E3'],
-                ['F2', 'A2', 'C3']
-            ]
-        }
-        return progressions.get(pattern_type, progressions['reggae'])
+    def _chord_pitch_matrix(self, pattern_type: str) -> np.ndarray:
+        """Chord progression as a read-only (n_chords, n_tones) array of MIDI pitches."""
+        return get_pattern_registry().get(pattern_type).chord_pitches
         
-    def _add_variations(self, count: int, pattern_type: str):
-        """Add variations to the pattern."""
-        for i in range(1, count):
-            variation = self.create_pattern(pattern_type, complexity=i+1)
-            # Merge variations with original pattern
-            for instrument in variation.instruments:
-                self.pm.instruments.append(instrument)
+    def _derive_variation(self, index: int, base_block: Dict[str, NoteTrack]) -> Dict[str, NoteTrack]:
+        """Derive variation block ``index`` from the base section block."""
+        tracks = derive_variation(list(base_block.values()), index, self.rng, SECTION_LENGTH, STEP_DURATION)
+        return dict(zip(base_block, tracks))
                 
     def _add_transitions(self):
         """Add transitions between sections."""
         # Implement transition logic here
         pass
         
+    def to_bytes(self) -> bytes:
+        """Encode the generated pattern as Standard MIDI File bytes."""
+        return encode_smf(self.notes, self.tempo)
+
     def save_midi(self, filename: str):
         """Save the generated MIDI to a file."""
-        self.pm.write(filename)
+        write_smf(self.notes, filename, self.tempo)
         
-    def play_realtime(self):
-        """Play the pattern in real-time through MIDI output."""
-        if not self.midi_out:
-            raise RuntimeError("MIDI output not initialized")
-            
-        # Convert PrettyMIDI to MIDI messages and send them
-        for instrument in self.pm.instruments:
-            for note in instrument.notes:
-                # Note on
-                self.midi_out.send_message([0x90, note.pitch, note.velocity])
-                # Note off
-                self.midi_out.send_message([0x80, note.pitch, 0])
+    def save_midi_stream(self, filename: str, chunks: Iterable[Tuple[SectionSlot, NoteStore]]):
+        """Write chunks from ``iter_pattern`` to a MIDI file as they are generated."""
+        with StreamingMidiWriter(filename, self.tempo) as writer:
+            for slot, chunk in chunks:
+                writer.write(chunk, until=slot.end)
+        
+    def play_realtime(self, port_name: Optional[str] = None, blocking: bool = True,
+                      chunks: Optional[Iterable[Tuple[SectionSlot, NoteStore]]] = None) -> PlaybackEngine:
+        """Play the pattern in real-time through a shared MIDI output.
+        
+        Events are scheduled in time by a ``PlaybackEngine`` running on its
+        own thread. The engine holds the port of the process-wide output
+        pool until playback finishes or is stopped; ``port_name`` defaults
+        to ``settings.MIDI_OUTPUT_PORT``. With ``blocking=False`` the engine
+        is returned immediately so callers can stop, seek or change tempo,
+        and ``PortBusyError`` is raised if another player keeps the port
+        for longer than ``settings.MIDI_PORT_TIMEOUT`` seconds.
+        
+        Pass ``chunks`` from ``iter_pattern`` to play a pattern while it is
+        being generated instead of the current one.
+        """
+        port_name = port_name or settings.MIDI_OUTPUT_PORT
+        pool = get_midi_output_pool()
+        midi_out = pool.get(port_name)
+        if chunks is None:
+            events, source = PlaybackEvents.from_note_store(self.notes), None
+        else:
+            events = PlaybackEvents.from_note_store(NoteStore())
+            source = ((slot.end, PlaybackEvents.from_note_store(chunk)) for slot, chunk in chunks)
+        engine = PlaybackEngine(
+            events,
+            midi_out,
+            tempo=self.tempo,
+            source=source,
+            port_lock=pool.port_lock(port_name)
+        )
+        engine.start(timeout=None if blocking else settings.MIDI_PORT_TIMEOUT)
+        if blocking:
+            engine.wait()
+        return engine
                 
     def export_to_fl_studio(self, filename: str):
         """Export MIDI file in a format compatible with FL Studio."""
         self.save_midi(filename)
-        
-    def __del__(self):
-        """Clean up MIDI resources."""
-        if self.midi_out:
-            self.midi_out.close_port() 
\ No newline at end of file
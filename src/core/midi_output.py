@@ -0,0 +1,99 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+def open_rtmidi_output(port_name: Optional[str] = None) -> Any:
+    """Open an rtmidi output on ``port_name``, or the first available port."""
+    import rtmidi
+    midi_out = rtmidi.MidiOut()
+    available_ports = midi_out.get_ports()
+    if port_name and port_name in available_ports:
+        midi_out.open_port(available_ports.index(port_name))
+    elif available_ports:
+        midi_out.open_port(0)
+    else:
+        raise RuntimeError("No MIDI output ports available")
+    return midi_out
+
+class PortBusyError(RuntimeError):
+    """Raised when a MIDI output stays in use by another player."""
+
+class MidiOutputPool:
+    """Process-wide MIDI outputs, opened on first use and shared by all projects.
+
+    Nothing is opened until a caller borrows a port, so loading and
+    rendering projects never touches the MIDI backend. Each port has a
+    lock, held by whoever borrows it or by a playing ``PlaybackEngine``,
+    so only one player sends to a device at a time.
+    """
+
+    def __init__(self, factory: Callable[[Optional[str]], Any] = open_rtmidi_output):
+        self._factory = factory
+        self._outputs: Dict[Optional[str], Any] = {}
+        self._port_locks: Dict[Optional[str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, port_name: Optional[str] = None) -> Any:
+        """Return the shared output for a port, opening it if needed."""
+        with self._lock:
+            output = self._outputs.get(port_name)
+            if output is None:
+                try:
+                    output = self._factory(port_name)
+                except Exception as e:
+                    raise RuntimeError(f"MIDI output not available: {e}") from e
+                self._outputs[port_name] = output
+                self._port_locks[port_name] = threading.Lock()
+            return output
+
+    def port_lock(self, port_name: Optional[str] = None) -> threading.Lock:
+        """Return the lock guarding a port, opening the port if needed."""
+        self.get(port_name)
+        with self._lock:
+            return self._port_locks[port_name]
+
+    @contextmanager
+    def borrow(self, port_name: Optional[str] = None):
+        """Exclusively use a shared output for the duration of the block."""
+        output = self.get(port_name)
+        with self.port_lock(port_name):
+            yield output
+
+    def close(self):
+        """Close every opened output."""
+        with self._lock:
+            for output in self._outputs.values():
+                if hasattr(output, "close_port"):
+                    output.close_port()
+            self._outputs.clear()
+            self._port_locks.clear()
+
+_midi_output_pool: Optional[MidiOutputPool] = None
+_midi_output_pool_lock = threading.Lock()
+
+def get_midi_output_pool() -> MidiOutputPool:
+    """Return the process-wide MIDI output pool."""
+    global _midi_output_pool
+    with _midi_output_pool_lock:
+        if _midi_output_pool is None:
+            _midi_output_pool = MidiOutputPool()
+        return _midi_output_pool
+
+class VirtualMidiOut:
+    """In-memory MIDI output recording each message with its send time.
+
+    Stands in for an rtmidi port in tests and on machines without a MIDI
+    backend; ``messages`` holds ``(perf_counter_ns, message)`` pairs.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def send_message(self, message):
+        with self._lock:
+            self.messages.append((time.perf_counter_ns(), list(message)))
+
+    def close_port(self):
+        pass
@@ -0,0 +1,237 @@
+import struct
+import numpy as np
+from typing import BinaryIO, Dict, List, Optional, Union
+from src.core.note_store import NoteStore, NoteTrack
+
+DEFAULT_RESOLUTION = 220  # Ticks per beat, same as pretty_midi
+DRUM_CHANNEL = 9
+# Melodic channels in assignment order (the drum channel is never used for them)
+MELODIC_CHANNELS = [c for c in range(16) if c != DRUM_CHANNEL]
+
+NOTE_ON = 0x90
+PROGRAM_CHANGE = 0xC0
+META = 0xFF
+META_TRACK_NAME = 0x03
+META_END_OF_TRACK = 0x2F
+META_SET_TEMPO = 0x51
+META_TIME_SIGNATURE = 0x58
+
+def encode_vlq(value: int) -> bytes:
+    """Encode a non-negative integer as a MIDI variable-length quantity."""
+    if value < 0:
+        raise ValueError("Variable-length quantities must be non-negative")
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+def _vlq_columns(values: np.ndarray) -> tuple:
+    """Vectorized VLQ encoding.
+
+    Returns a (n, 4) uint8 matrix of big-endian VLQ bytes and a boolean mask
+    selecting the bytes actually used by each value.
+    """
+    if values.size and values.max() >= 1 << 28:
+        raise ValueError("Delta time too large for a MIDI variable-length quantity")
+    shifts = np.array([21, 14, 7, 0])
+    groups = (values[:, None] >> shifts) & 0x7F
+    groups[:, :3] |= 0x80
+    n_bytes = 1 + (values >= 1 << 7).astype(np.int64) + (values >= 1 << 14) + (values >= 1 << 21)
+    mask = np.arange(4) >= (4 - n_bytes)[:, None]
+    return groups.astype(np.uint8), mask
+
+def seconds_to_ticks(times: np.ndarray, tempo: float, resolution: int = DEFAULT_RESOLUTION) -> np.ndarray:
+    """Convert times in seconds to absolute ticks at a constant tempo."""
+    tick_scale = 60.0 / (float(tempo) * resolution)
+    return np.rint(np.asarray(times, dtype=np.float64) / tick_scale).astype(np.int64)
+
+def _encode_note_events(track: NoteTrack, channel: int, tempo: float, resolution: int) -> bytes:
+    """Encode a track's notes as running-status note-on/off events.
+
+    Events are ordered like pretty_midi orders them: by tick, then pitch, then
+    velocity, so a note-off (velocity 0) always precedes a note-on of the same
+    pitch at the same tick.
+    """
+    n = len(track)
+    if n == 0:
+        return b""
+    ticks = np.concatenate([
+        seconds_to_ticks(track.start, tempo, resolution),
+        seconds_to_ticks(track.end, tempo, resolution),
+    ])
+    pitches = np.concatenate([track.pitch, track.pitch]).astype(np.int64)
+    velocities = np.concatenate([track.velocity, np.zeros(n, dtype=track.velocity.dtype)]).astype(np.int64)
+    if ticks.min() < 0:
+        raise ValueError("Note times must be non-negative")
+    if pitches.max() > 127 or velocities.max() > 127:
+        raise ValueError("Note pitch and velocity must be in the range 0-127")
+
+    order = np.lexsort((velocities, pitches, ticks))
+    ticks, pitches, velocities = ticks[order], pitches[order], velocities[order]
+    deltas = np.diff(ticks, prepend=0)
+    return _encode_messages(deltas, np.full(len(ticks), NOTE_ON | channel), pitches, velocities)
+
+def _encode_messages(deltas: np.ndarray, status: np.ndarray, data1: np.ndarray, data2: np.ndarray,
+                     previous_status: Optional[int] = None) -> bytes:
+    """Encode two-byte channel messages, using running status where possible.
+
+    The status byte is written only when it differs from the previous
+    event's, starting from ``previous_status``.
+    """
+    vlq, vlq_mask = _vlq_columns(deltas)
+    status_mask = np.empty(len(status), dtype=bool)
+    status_mask[0] = status[0] != previous_status
+    status_mask[1:] = status[1:] != status[:-1]
+    matrix = np.hstack([vlq, status[:, None].astype(np.uint8),
+                        data1[:, None].astype(np.uint8), data2[:, None].astype(np.uint8)])
+    mask = np.hstack([vlq_mask, status_mask[:, None], np.ones((len(status), 2), dtype=bool)])
+    return matrix[mask].tobytes()
+
+def _chunk(tag: bytes, data: Union[bytes, bytearray]) -> bytes:
+    return tag + struct.pack(">I", len(data)) + bytes(data)
+
+def _tempo_track(tempo: float, resolution: int) -> bytearray:
+    """Track 0: set_tempo, a 4/4 time signature and end of track."""
+    tick_scale = 60.0 / (float(tempo) * resolution)
+    microseconds = int(6e7 / (60. / (tick_scale * resolution)))
+    data = bytearray()
+    data += b"\x00" + bytes([META, META_SET_TEMPO, 3]) + microseconds.to_bytes(3, "big")
+    data += b"\x00" + bytes([META, META_TIME_SIGNATURE, 4, 4, 2, 24, 8])
+    data += b"\x01" + bytes([META, META_END_OF_TRACK, 0])
+    return data
+
+def _instrument_track(track: NoteTrack, channel: int, tempo: float, resolution: int) -> bytearray:
+    data = bytearray()
+    if track.name:
+        name = track.name.encode("latin1")
+        data += b"\x00" + bytes([META, META_TRACK_NAME]) + encode_vlq(len(name)) + name
+    data += b"\x00" + bytes([PROGRAM_CHANGE | channel, track.program])
+    data += _encode_note_events(track, channel, tempo, resolution)
+    data += b"\x01" + bytes([META, META_END_OF_TRACK, 0])
+    return data
+
+def encode_smf(store: NoteStore, tempo: float, resolution: int = DEFAULT_RESOLUTION) -> bytes:
+    """Encode a NoteStore as a type-1 Standard MIDI File.
+
+    The output is byte-identical to ``store.to_pretty_midi(tempo).write(...)``
+    but is built directly from the note arrays, without intermediate mido
+    message objects.
+    """
+    chunks: List[bytes] = [
+        _chunk(b"MThd", struct.pack(">HHH", 1, len(store.tracks) + 1, resolution)),
+        _chunk(b"MTrk", _tempo_track(tempo, resolution)),
+    ]
+    for n, track in enumerate(store.tracks):
+        channel = DRUM_CHANNEL if track.is_drum else MELODIC_CHANNELS[n % len(MELODIC_CHANNELS)]
+        chunks.append(_chunk(b"MTrk", _instrument_track(track, channel, tempo, resolution)))
+    return b"".join(chunks)
+
+def write_smf(store: NoteStore, filename: Union[str, BinaryIO], tempo: float,
+              resolution: int = DEFAULT_RESOLUTION):
+    """Write a NoteStore to a path or binary file object."""
+    data = memoryview(encode_smf(store, tempo, resolution))
+    if isinstance(filename, (str, bytes)) or hasattr(filename, "__fspath__"):
+        with open(filename, "wb") as f:
+            f.write(data)
+    else:
+        filename.write(data)
+
+class StreamingMidiWriter:
+    """Writes a type-1 Standard MIDI File one chunk of notes at a time.
+
+    The file holds the usual tempo track plus a single note track that
+    merges every instrument on its own channel, so memory stays bounded by
+    the chunk size rather than the song length. Note-offs that fall after a
+    chunk's ``until`` time are held back and merged with the next chunk.
+    The note track's length is patched into its header on ``close``, so
+    ``filename`` must be a path or a seekable binary file.
+    """
+
+    def __init__(self, filename: Union[str, BinaryIO], tempo: float, resolution: int = DEFAULT_RESOLUTION):
+        self.tempo = tempo
+        self.resolution = resolution
+        self._owns_file = isinstance(filename, (str, bytes)) or hasattr(filename, "__fspath__")
+        self._file = open(filename, "wb") if self._owns_file else filename
+        self._file.write(_chunk(b"MThd", struct.pack(">HHH", 1, 2, resolution)))
+        self._file.write(_chunk(b"MTrk", _tempo_track(tempo, resolution)))
+        self._file.write(b"MTrk")
+        self._length_offset = self._file.tell()
+        self._file.write(b"\x00\x00\x00\x00")
+        self._length = 0
+        self._tick = 0
+        self._status: Optional[int] = None
+        self._programs: Dict[int, int] = {}
+        empty = np.empty(0, dtype=np.int64)
+        self._pending = (empty, empty, empty, empty)
+        self.closed = False
+
+    def __enter__(self) -> 'StreamingMidiWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _emit(self, data: bytes):
+        self._file.write(data)
+        self._length += len(data)
+
+    def write(self, store: NoteStore, until: Optional[float]):
+        """Add a chunk of notes; later chunks must not start before ``until`` seconds.
+
+        Events before ``until`` are written out; ``None`` writes everything.
+        Tracks are mapped to channels by their index, as in ``encode_smf``,
+        so every chunk must list its tracks in the same order.
+        """
+        ticks, status, pitches, velocities = [self._pending[0]], [self._pending[1]], [self._pending[2]], [self._pending[3]]
+        for n, track in enumerate(store.tracks):
+            channel = DRUM_CHANNEL if track.is_drum else MELODIC_CHANNELS[n % len(MELODIC_CHANNELS)]
+            if channel not in self._programs:
+                self._programs[channel] = track.program
+                self._emit(b"\x00" + bytes([PROGRAM_CHANGE | channel, track.program]))
+                self._status = None
+            if not len(track):
+                continue
+            ticks += [seconds_to_ticks(track.start, self.tempo, self.resolution),
+                      seconds_to_ticks(track.end, self.tempo, self.resolution)]
+            status.append(np.full(2 * len(track), NOTE_ON | channel, dtype=np.int64))
+            pitches += [track.pitch.astype(np.int64)] * 2
+            velocities += [track.velocity.astype(np.int64), np.zeros(len(track), dtype=np.int64)]
+        ticks, status = np.concatenate(ticks), np.concatenate(status)
+        pitches, velocities = np.concatenate(pitches), np.concatenate(velocities)
+        if ticks.size and ticks.min() < self._tick:
+            raise ValueError("Chunk starts before notes that were already written")
+        if pitches.size and (pitches.max() > 127 or velocities.max() > 127):
+            raise ValueError("Note pitch and velocity must be in the range 0-127")
+        # Same order as encode_smf within a channel, so note-offs precede
+        # note-ons of the same pitch at the same tick.
+        order = np.lexsort((velocities, pitches, status, ticks))
+        ticks, status, pitches, velocities = ticks[order], status[order], pitches[order], velocities[order]
+        if until is None:
+            ready = np.ones(len(ticks), dtype=bool)
+        else:
+            ready = ticks < seconds_to_ticks([until], self.tempo, self.resolution)[0]
+        self._pending = (ticks[~ready], status[~ready], pitches[~ready], velocities[~ready])
+        if ready.any():
+            self._write_events(ticks[ready], status[ready], pitches[ready], velocities[ready])
+
+    def _write_events(self, ticks, status, pitches, velocities):
+        deltas = np.diff(ticks, prepend=self._tick)
+        self._emit(_encode_messages(deltas, status, pitches, velocities, self._status))
+        self._tick = int(ticks[-1])
+        self._status = int(status[-1])
+
+    def close(self):
+        """Flush held-back note-offs, end the track and patch its length."""
+        if self.closed:
+            return
+        self.write(NoteStore(), until=None)
+        self._emit(b"\x01" + bytes([META, META_END_OF_TRACK, 0]))
+        end = self._file.tell()
+        self._file.seek(self._length_offset)
+        self._file.write(struct.pack(">I", self._length))
+        self._file.seek(end)
+        if self._owns_file:
+            self._file.close()
+        self.closed = True
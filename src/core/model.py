@@ -1,37 +1,52 @@
-import tensorflow as tf
-from tensorflow.keras import layers, models
+import os
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from src.core.config import settings
+from src.core.data_processor import WindowedDataset
+from src.core.ring_buffer import RingBuffer
+
+# Layers the stateful decoder reuses by name
+DECODER_LAYERS = frozenset(['lstm_1', 'lstm_2', 'genre_embedding', 'hidden', 'output'])
 
 class GenrePatternGenerator:
+    """LSTM pattern model. TensorFlow is imported only when a model is built,
+    loaded or used, so importing this module stays cheap."""
+    
     def __init__(self):
         self.model = None
         self.sequence_length = settings.SEQUENCE_LENGTH
         self.n_features = settings.N_FEATURES
         self.genres = list(settings.GENRE_PATTERNS.keys())
+        # Compiled inference step and the model it was traced for
+        self._step = None
+        self._step_model = None
+        # Compiled one-step LSTM decoder and the model it shares weights with
+        self._decoder = None
+        self._decoder_model = None
         
     def build_model(self):
         """Build the deep learning model."""
+        from tensorflow.keras import layers, models
         input_layer = layers.Input(shape=(self.sequence_length, self.n_features))
         
-        # LSTM layers for sequence processing
-        x = layers.LSTM(256, return_sequences=True)(input_layer)
+        # LSTM layers for sequence processing (named so the step-wise
+        # decoder can share their weights)
+        x = layers.LSTM(256, return_sequences=True, name='lstm_1')(input_layer)
         x = layers.Dropout(0.3)(x)
-        x = layers.LSTM(128)(x)
+        x = layers.LSTM(128, name='lstm_2')(x)
         x = layers.Dropout(0.3)(x)
         
         # Genre-specific processing
         genre_input = layers.Input(shape=(len(self.genres),))
-        genre_embedding = layers.Dense(64)(genre_input)
+        genre_embedding = layers.Dense(64, name='genre_embedding')(genre_input)
         
         # Combine sequence and genre information
         combined = layers.Concatenate()([x, genre_embedding])
         
         # Output layers
-        x = layers.Dense(256, activation='relu')(combined)
+        x = layers.Dense(256, activation='relu', name='hidden')(combined)
         x = layers.Dropout(0.3)(x)
-        output = layers.Dense(self.n_features, activation='sigmoid')(x)
+        output = layers.Dense(self.n_features, activation='sigmoid', name='output')(x)
         
         self.model = models.Model(inputs=[input_layer, genre_input], outputs=output)
         
@@ -42,11 +57,22 @@ class GenrePatternGenerator:
             metrics=['accuracy']
         )
         
-    def train(self, X: np.ndarray, y: np.ndarray, epochs: int = 50, batch_size: int = 32):
-        """Train the model on labeled data."""
+    def train(self, X: Union[np.ndarray, WindowedDataset], y: Optional[np.ndarray] = None,
+              epochs: int = 50, batch_size: int = 32):
+        """Train the model on labeled data.
+        
+        ``X`` may also be a ``WindowedDataset``, which is streamed in shuffled
+        mini-batches (reshuffled every epoch) so datasets larger than memory
+        can be used; each window is trained to predict the note after it.
+        """
+        import tensorflow as tf
         if self.model is None:
             self.build_model()
             
+        if isinstance(X, WindowedDataset):
+            self._train_streaming(X, epochs, batch_size)
+            return
+            
         # Convert genre labels to one-hot encoding
         genre_indices = [self.genres.index(genre) for genre in y]
         genre_one_hot = tf.one_hot(genre_indices, depth=len(self.genres))
@@ -60,45 +86,170 @@ class GenrePatternGenerator:
             validation_split=0.2
         )
         
-    def generate_pattern(self, genre: str, length: int = 32) -> np.ndarray:
+    def _train_streaming(self, dataset: WindowedDataset, epochs: int, batch_size: int):
+        import tensorflow as tf
+        
+        def batches():
+            while True:
+                for windows, genres, targets in dataset.batches(batch_size):
+                    genre_indices = [self.genres.index(genre) for genre in genres]
+                    yield (windows, tf.one_hot(genre_indices, depth=len(self.genres))), targets
+                    
+        self.model.fit(
+            batches(),
+            epochs=epochs,
+            steps_per_epoch=dataset.n_batches(batch_size)
+        )
+        
+    @property
+    def supports_stateful(self) -> bool:
+        """Whether the model has the named layers the stateful decoder needs.
+        
+        Models saved before the layers were named only decode windowed.
+        """
+        return self.model is not None and DECODER_LAYERS <= {layer.name for layer in self.model.layers}
+        
+    def _compiled_step(self):
+        """The model's forward pass as a ``tf.function``, traced once per model.
+        
+        The batch dimension is left unspecified so any number of patterns
+        reuses the same graph.
+        """
+        import tensorflow as tf
+        if self._step is None or self._step_model is not self.model:
+            model = self.model
+            
+            @tf.function(input_signature=[
+                tf.TensorSpec((None, self.sequence_length, self.n_features), tf.float32),
+                tf.TensorSpec((None, len(self.genres)), tf.float32)
+            ])
+            def step(window, genre_one_hot):
+                return model([window, genre_one_hot], training=False)
+                
+            self._step, self._step_model = step, model
+        return self._step
+        
+    def _compiled_decoder(self):
+        """A one-step decoder built from the model's own layers, as a ``tf.function``.
+        
+        The LSTM cells are advanced one step at a time with their hidden
+        state passed in and returned, so each step costs one cell update
+        instead of a pass over the whole window. Dropout is skipped, as in
+        inference.
+        """
+        import tensorflow as tf
+        if self._decoder is None or self._decoder_model is not self.model:
+            model = self.model
+            lstm_1 = model.get_layer('lstm_1').cell
+            lstm_2 = model.get_layer('lstm_2').cell
+            genre_embedding = model.get_layer('genre_embedding')
+            hidden = model.get_layer('hidden')
+            output = model.get_layer('output')
+            
+            def state_spec(cell):
+                return [tf.TensorSpec((None, cell.units), tf.float32)] * 2
+                
+            @tf.function(input_signature=[
+                tf.TensorSpec((None, self.n_features), tf.float32),
+                state_spec(lstm_1),
+                state_spec(lstm_2),
+                tf.TensorSpec((None, len(self.genres)), tf.float32)
+            ])
+            def decode(step, state_1, state_2, genre_one_hot):
+                h_1, state_1 = lstm_1(step, state_1, training=False)
+                h_2, state_2 = lstm_2(h_1, state_2, training=False)
+                combined = tf.concat([h_2, genre_embedding(genre_one_hot)], axis=-1)
+                return output(hidden(combined)), state_1, state_2
+                
+            self._decoder, self._decoder_model = decode, model
+        return self._decoder
+        
+    def generate_pattern(self, genre: str, length: int = 32, stateful: bool = False) -> np.ndarray:
         """Generate a new pattern for a specific genre."""
+        return self.generate_patterns([genre], length, stateful=stateful)[0]
+        
+    def generate_patterns(self, genres: List[str], length: int = 32,
+                          seeds: Optional[List[int]] = None, stateful: bool = False) -> np.ndarray:
+        """Generate one pattern per entry of ``genres`` in a single batched pass.
+        
+        Each step calls the compiled model once for the whole batch and
+        slides the input windows along a ring buffer. Windows start out
+        silent, or as uniform noise drawn from ``seeds`` (one per pattern)
+        when given. Returns an array of shape (len(genres), length, n_features).
+        
+        With ``stateful=True`` the initial window is fed through the LSTMs
+        once and every later step is a single cell update with carried
+        state (see ``_compiled_decoder``). The first step matches the
+        windowed output; later steps condition on the whole generated
+        history rather than only the last ``sequence_length`` steps. Models
+        without ``supports_stateful`` fall back to windowed generation.
+        """
+        import tensorflow as tf
         if self.model is None:
             raise ValueError("Model not trained yet")
             
-        # Create initial sequence
-        initial_sequence = np.zeros((1, self.sequence_length, self.n_features))
-        
-        # Create genre one-hot encoding
-        genre_index = self.genres.index(genre)
-        genre_one_hot = tf.one_hot([genre_index], depth=len(self.genres))
+        batch_size = len(genres)
+        if seeds is None:
+            initial = np.zeros((batch_size, self.sequence_length, self.n_features), dtype=np.float32)
+        else:
+            if len(seeds) != batch_size:
+                raise ValueError("Expected one seed per pattern")
+            initial = np.stack([
+                np.random.default_rng(seed).random((self.sequence_length, self.n_features), dtype=np.float32)
+                for seed in seeds
+            ])
+            
+        # Create genre one-hot encodings
+        genre_indices = [self.genres.index(genre) for genre in genres]
+        genre_one_hot = tf.one_hot(genre_indices, depth=len(self.genres))
         
-        # Generate pattern
-        pattern = []
-        current_sequence = initial_sequence
+        if stateful and self.supports_stateful:
+            return self._decode_patterns(initial, genre_one_hot, length)
+            
+        # Generate patterns
+        step = self._compiled_step()
+        window = RingBuffer(initial)
+        patterns = np.empty((batch_size, length, self.n_features), dtype=np.float32)
+        for i in range(length):
+            next_step = step(window.window(), genre_one_hot).numpy()
+            patterns[:, i] = next_step
+            window.push(next_step)
+            
+        return patterns
         
-        for _ in range(length):
-            # Predict next step
-            next_step = self.model.predict([current_sequence, genre_one_hot])
-            pattern.append(next_step[0])
+    def _decode_patterns(self, initial: np.ndarray, genre_one_hot, length: int) -> np.ndarray:
+        """Stateful generation: warm the LSTM state on ``initial``, then decode step by step."""
+        import tensorflow as tf
+        decode = self._compiled_decoder()
+        batch_size = len(initial)
+        state_1 = [tf.zeros((batch_size, self._decoder_model.get_layer('lstm_1').cell.units))] * 2
+        state_2 = [tf.zeros((batch_size, self._decoder_model.get_layer('lstm_2').cell.units))] * 2
+        for i in range(self.sequence_length - 1):
+            _, state_1, state_2 = decode(initial[:, i], state_1, state_2, genre_one_hot)
             
-            # Update sequence
-            current_sequence = np.roll(current_sequence, -1, axis=1)
-            current_sequence[0, -1] = next_step[0]
+        patterns = np.empty((batch_size, length, self.n_features), dtype=np.float32)
+        step = tf.convert_to_tensor(initial[:, -1])
+        for i in range(length):
+            step, state_1, state_2 = decode(step, state_1, state_2, genre_one_hot)
+            patterns[:, i] = step.numpy()
             
-        return np.array(pattern)
+        return patterns
         
     def save_model(self, path: str):
         """Save the trained model."""
         if self.model is None:
             raise ValueError("No model to save")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         self.model.save(path)
         
     def load_model(self, path: str):
         """Load a trained model."""
+        from tensorflow.keras import models
         self.model = models.load_model(path)
         
     def evaluate(self, X: np.ndarray, y: np.ndarray) -> Dict:
         """Evaluate the model on test data."""
+        import tensorflow as tf
         if self.model is None:
             raise ValueError("Model not trained yet")
             
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from src.core.config import settings
+
+def model_mtime(path: str) -> int:
+    """Modification time of a saved model; for a directory, its newest entry."""
+    mtime = os.stat(path).st_mtime_ns
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                mtime = max(mtime, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return mtime
+
+def load_generator(path: str) -> Any:
+    """Load a saved GenrePatternGenerator model (imports TensorFlow on first use)."""
+    from src.core.model import GenrePatternGenerator
+    generator = GenrePatternGenerator()
+    generator.load_model(path)
+    return generator
+
+def warm_up(generator: Any):
+    """Run one dummy generation in each inference mode the model supports, so graphs are traced up front."""
+    genre = generator.genres[0]
+    generator.generate_patterns([genre], length=1)
+    if generator.supports_stateful:
+        generator.generate_patterns([genre], length=1, stateful=True)
+
+class ModelRegistry:
+    """Process-wide cache of loaded models, shared by every caller.
+
+    Models are keyed by (absolute path, mtime), so saving a new model to the
+    same path is picked up on the next ``get``. Each version is loaded and
+    warmed up once even when many threads ask for it at the same time.
+    Loading a new version of a path evicts its older versions; beyond
+    ``max_models`` the least recently used model is evicted.
+    """
+
+    def __init__(self, max_models: Optional[int] = None,
+                 loader: Callable[[str], Any] = load_generator,
+                 warm_up: Optional[Callable[[Any], None]] = warm_up):
+        self.max_models = max_models or settings.MODEL_REGISTRY_MAX_MODELS
+        self._loader = loader
+        self._warm_up = warm_up
+        self._models: "OrderedDict[Tuple[str, int], Any]" = OrderedDict()
+        self._load_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Optional[str] = None) -> Any:
+        """Return the current version of the model saved at ``path``.
+
+        Defaults to ``settings.MODEL_PATH``; raises FileNotFoundError if
+        nothing is saved there.
+        """
+        path = os.path.abspath(path or settings.MODEL_PATH)
+        key = (path, model_mtime(path))
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+            
+        # Load outside the registry lock so other models stay available
+        try:
+            with load_lock:
+                with self._lock:
+                    model = self._models.get(key)
+                if model is None:
+                    model = self._loader(path)
+                    if self._warm_up is not None:
+                        self._warm_up(model)
+                    self._add(key, model)
+        finally:
+            with self._lock:
+                self._load_locks.pop(key, None)
+        return model
+
+    def _add(self, key: Tuple[str, int], model: Any):
+        with self._lock:
+            for stale in [k for k in self._models if k[0] == key[0] and k != key]:
+                del self._models[stale]
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+_model_registry: Optional[ModelRegistry] = None
+_model_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry()
+        return _model_registry
@@ -0,0 +1,113 @@
+import pretty_midi
+import numpy as np
+from typing import List, Optional
+
+PITCH_DTYPE = np.uint8
+VELOCITY_DTYPE = np.uint8
+TIME_DTYPE = np.float64
+
+class NoteTrack:
+    """Columnar note storage for a single MIDI track.
+
+    Notes are kept as parallel NumPy arrays (pitch, velocity, start, end).
+    Blocks of notes are appended as whole arrays and concatenated lazily, so
+    filling a track never allocates one Python object per note.
+    """
+
+    def __init__(self, program: int = 0, is_drum: bool = False, name: str = ""):
+        self.program = program
+        self.is_drum = is_drum
+        self.name = name
+        self._blocks: List[tuple] = []
+        self._columns: Optional[tuple] = None
+
+    def add_notes(self, pitch, velocity, start, end):
+        """Append a block of notes; scalar arguments are broadcast."""
+        pitch, velocity, start, end = np.broadcast_arrays(
+            np.asarray(pitch), np.asarray(velocity), np.asarray(start), np.asarray(end)
+        )
+        if pitch.size == 0:
+            return
+        # Arrays already in the column dtypes are shared rather than copied
+        self._blocks.append((
+            pitch.astype(PITCH_DTYPE, copy=False).ravel(),
+            velocity.astype(VELOCITY_DTYPE, copy=False).ravel(),
+            start.astype(TIME_DTYPE, copy=False).ravel(),
+            end.astype(TIME_DTYPE, copy=False).ravel(),
+        ))
+        self._columns = None
+
+    def _consolidate(self) -> tuple:
+        if self._columns is None:
+            if not self._blocks:
+                self._columns = (
+                    np.empty(0, dtype=PITCH_DTYPE),
+                    np.empty(0, dtype=VELOCITY_DTYPE),
+                    np.empty(0, dtype=TIME_DTYPE),
+                    np.empty(0, dtype=TIME_DTYPE),
+                )
+            elif len(self._blocks) == 1:
+                self._columns = self._blocks[0]
+            else:
+                self._columns = tuple(np.concatenate(column) for column in zip(*self._blocks))
+                self._blocks = [self._columns]
+        return self._columns
+
+    @property
+    def pitch(self) -> np.ndarray:
+        return self._consolidate()[0]
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self._consolidate()[1]
+
+    @property
+    def start(self) -> np.ndarray:
+        return self._consolidate()[2]
+
+    @property
+    def end(self) -> np.ndarray:
+        return self._consolidate()[3]
+
+    def __len__(self) -> int:
+        return sum(len(block[0]) for block in self._blocks)
+
+    def to_instrument(self) -> pretty_midi.Instrument:
+        """Materialize the track as a pretty_midi.Instrument."""
+        instrument = pretty_midi.Instrument(program=self.program, is_drum=self.is_drum, name=self.name)
+        pitch, velocity, start, end = self._consolidate()
+        instrument.notes = [
+            pretty_midi.Note(velocity=v, pitch=p, start=s, end=e)
+            for p, v, s, e in zip(pitch.tolist(), velocity.tolist(), start.tolist(), end.tolist())
+        ]
+        return instrument
+
+class NoteStore:
+    """Ordered collection of NoteTracks making up one rendered pattern."""
+
+    def __init__(self):
+        self.tracks: List[NoteTrack] = []
+
+    def new_track(self, program: int = 0, is_drum: bool = False, name: str = "") -> NoteTrack:
+        """Create a track and append it to the store."""
+        track = NoteTrack(program=program, is_drum=is_drum, name=name)
+        self.tracks.append(track)
+        return track
+
+    def add_track(self, track: NoteTrack) -> NoteTrack:
+        """Append an existing track to the store."""
+        self.tracks.append(track)
+        return track
+
+    def clear(self):
+        self.tracks = []
+
+    @property
+    def note_count(self) -> int:
+        return sum(len(track) for track in self.tracks)
+
+    def to_pretty_midi(self, tempo: float) -> pretty_midi.PrettyMIDI:
+        """Convert the store to a PrettyMIDI object (export time only)."""
+        pm = pretty_midi.PrettyMIDI(initial_tempo=tempo)
+        pm.instruments = [track.to_instrument() for track in self.tracks]
+        return pm
@@ -0,0 +1,181 @@
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from src.core.config import get_lookups, get_settings
+
+# Grid steps per bar and per beat; GENRE_PATTERNS durations are in beats
+GRID_STEPS = 16
+STEPS_PER_BEAT = 4
+# GENRE_PATTERNS entry holding a genre's bass line rather than a drum
+BASS_KEY = 'bass'
+DEFAULT_BASS_NOTES = ['C2']
+
+DRUM_PITCHES = {
+    'kick': 36,
+    'snare': 38,
+    'hihat': 42,
+    'tom': 45,
+    'crash': 49
+}
+
+CHORD_PROGRESSIONS = {
+    'reggae': [
+        ['C2', 'E2', 'G2'],
+        ['G2', 'B2', 'D3'],
+        ['A2', 'C3', 'E3'],
+        ['F2', 'A2', 'C3']
+    ],
+    'hiphop': [
+        ['C2', 'F2', 'A2'],
+        ['F2', 'A2', 'C3'],
+        ['G2', 'B2', 'D3'],
+        ['A2', 'C3', 'E3']
+    ],
+    'edm': [
+        ['C2', 'E2', 'G2'],
+        ['G2', 'B2', 'D3'],
+        ['A2', 'C3', 'E3'],
+        ['F2', 'A2', 'C3']
+    ]
+}
+DEFAULT_PROGRESSION = 'reggae'
+
+class PatternError(ValueError):
+    """Raised when a genre pattern definition is invalid."""
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+class CompiledGenre:
+    """One genre's patterns as read-only arrays, ready to offset and tile.
+
+    Drum hits are columns ``drum_step`` (grid step), ``drum_pitch``,
+    ``drum_duration`` (in beats), ``drum_velocity`` (0 where unspecified)
+    and ``drum_offset`` (micro-timing in steps), ordered by step then pitch.
+    ``chord_pitches`` is an (n_chords, n_tones) matrix of MIDI pitches,
+    one chord per bar. The bass line is ``bass_step`` and ``bass_pitch``
+    columns, ordered by step.
+    """
+
+    def __init__(self, name: str, drum_step: np.ndarray, drum_pitch: np.ndarray,
+                 drum_duration: np.ndarray, chord_pitches: np.ndarray,
+                 drum_velocity: Optional[np.ndarray] = None, drum_offset: Optional[np.ndarray] = None,
+                 bass_step: Optional[np.ndarray] = None, bass_pitch: Optional[np.ndarray] = None):
+        self.name = name
+        self.drum_step = _frozen(drum_step)
+        self.drum_pitch = _frozen(drum_pitch)
+        self.drum_duration = _frozen(drum_duration)
+        self.drum_velocity = _frozen(
+            drum_velocity if drum_velocity is not None else np.zeros(len(drum_step), dtype=np.uint8))
+        self.drum_offset = _frozen(
+            drum_offset if drum_offset is not None else np.zeros(len(drum_step), dtype=np.float64))
+        self.chord_pitches = _frozen(chord_pitches)
+        self.bass_step = _frozen(bass_step if bass_step is not None else np.empty(0, dtype=np.int64))
+        self.bass_pitch = _frozen(bass_pitch if bass_pitch is not None else np.empty(0, dtype=np.int64))
+
+    @property
+    def drum_count(self) -> int:
+        return len(self.drum_step)
+
+def compile_hits(name: str, drums: Mapping[str, Sequence[Sequence[float]]],
+                 grid_steps: int = GRID_STEPS) -> Tuple[np.ndarray, ...]:
+    """Validate ``{drum: [(step, duration[, velocity[, offset]]), ...]}`` hits.
+
+    Returns step, pitch, duration, velocity and offset columns ordered by
+    step then pitch. A velocity of 0 means "not specified"; ``offset`` is
+    micro-timing as a fraction of a step, within half a step either way.
+    """
+    steps, pitches, durations, velocities, offsets = [], [], [], [], []
+    for drum, hits in drums.items():
+        if drum not in DRUM_PITCHES:
+            raise PatternError(f"{name}: unknown drum {drum!r}")
+        for hit in hits:
+            if not 2 <= len(hit) <= 4:
+                raise PatternError(f"{name}/{drum}: expected (step, duration[, velocity[, offset]]), got {hit!r}")
+            step, duration = hit[0], hit[1]
+            velocity = hit[2] if len(hit) > 2 else 0
+            offset = hit[3] if len(hit) > 3 else 0.0
+            if int(step) != step or not 0 <= step < grid_steps:
+                raise PatternError(f"{name}/{drum}: step {step!r} is outside the {grid_steps}-step grid")
+            if duration <= 0:
+                raise PatternError(f"{name}/{drum}: duration must be positive, got {duration!r}")
+            if int(velocity) != velocity or not 0 <= velocity <= 127:
+                raise PatternError(f"{name}/{drum}: velocity must be 1-127 (or 0 for default), got {velocity!r}")
+            if not -0.5 <= offset <= 0.5:
+                raise PatternError(f"{name}/{drum}: offset must be within half a step, got {offset!r}")
+            steps.append(int(step))
+            pitches.append(DRUM_PITCHES[drum])
+            durations.append(float(duration))
+            velocities.append(int(velocity))
+            offsets.append(float(offset))
+    step = np.array(steps, dtype=np.int64)
+    pitch = np.array(pitches, dtype=np.uint8)
+    order = np.lexsort((pitch, step))
+    return (step[order], pitch[order], np.array(durations, dtype=np.float64)[order],
+            np.array(velocities, dtype=np.uint8)[order], np.array(offsets, dtype=np.float64)[order])
+
+def compile_drums(genre: str, drums: Mapping[str, Sequence[Tuple[int, float]]]) -> Tuple[np.ndarray, ...]:
+    """Validate a genre's ``{drum: [(step, duration), ...]}`` and return step/pitch/duration columns."""
+    return compile_hits(genre, drums)[:3]
+
+def compile_chords(genre: str, progression: List[List[str]], note_pitches: Mapping[str, int]) -> np.ndarray:
+    """Validate a chord progression and return its pitch matrix."""
+    if not progression or len({len(chord) for chord in progression}) != 1:
+        raise PatternError(f"{genre}: chords must be non-empty and all have the same number of tones")
+    try:
+        return np.array([[note_pitches[note] for note in chord] for chord in progression], dtype=np.int64)
+    except KeyError as e:
+        raise PatternError(f"{genre}: unknown note name {e.args[0]!r}") from None
+
+def compile_bass(genre: str, bass: Mapping[str, Sequence], note_pitches: Mapping[str, int],
+                 grid_steps: int = GRID_STEPS) -> Tuple[np.ndarray, np.ndarray]:
+    """Validate a ``{"rhythm": [on/off per step], "notes": [names]}`` bass line.
+
+    Returns step and pitch columns; active steps take ``notes`` in turn by
+    step number, cycling, and ``notes`` defaults to ``DEFAULT_BASS_NOTES``.
+    """
+    rhythm = bass.get("rhythm", [])
+    notes = bass.get("notes", DEFAULT_BASS_NOTES)
+    if len(rhythm) > grid_steps:
+        raise PatternError(f"{genre}/bass: rhythm has {len(rhythm)} steps, more than the {grid_steps}-step grid")
+    if not notes:
+        raise PatternError(f"{genre}/bass: notes must not be empty")
+    try:
+        pitches = np.array([note_pitches[note] for note in notes], dtype=np.int64)
+    except KeyError as e:
+        raise PatternError(f"{genre}/bass: unknown note name {e.args[0]!r}") from None
+    step = np.flatnonzero(np.asarray(rhythm, dtype=bool))
+    return step, pitches[step % len(pitches)]
+
+class PatternRegistry:
+    """Every genre's patterns, validated and compiled once.
+
+    A genre's ``BASS_KEY`` entry is its bass line (see ``compile_bass``);
+    every other entry is a drum. Genres without drum patterns or a bass
+    line get none; genres without a chord progression use the
+    ``DEFAULT_PROGRESSION`` chords. Unknown genres get every fallback.
+    """
+
+    def __init__(self, genre_patterns: Mapping[str, Mapping[str, Sequence[Tuple[int, float]]]],
+                 progressions: Mapping[str, List[List[str]]], note_pitches: Mapping[str, int]):
+        chords = {genre: compile_chords(genre, progression, note_pitches)
+                  for genre, progression in progressions.items()}
+        no_drums = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.float64))
+        self.genres: Dict[str, CompiledGenre] = {}
+        for genre in list(genre_patterns) + [g for g in progressions if g not in genre_patterns]:
+            patterns = dict(genre_patterns.get(genre, {}))
+            bass = patterns.pop(BASS_KEY, None)
+            bass_step, bass_pitch = compile_bass(genre, bass, note_pitches) if bass is not None else (None, None)
+            drums = compile_drums(genre, patterns) if patterns else no_drums
+            self.genres[genre] = CompiledGenre(genre, *drums, chords.get(genre, chords[DEFAULT_PROGRESSION]),
+                                               bass_step=bass_step, bass_pitch=bass_pitch)
+        self._fallback = CompiledGenre('default', *no_drums, chords[DEFAULT_PROGRESSION])
+
+    def get(self, genre: str) -> CompiledGenre:
+        return self.genres.get(genre, self._fallback)
+
+@lru_cache(maxsize=None)
+def get_pattern_registry() -> PatternRegistry:
+    """The registry compiled from the settings' ``GENRE_PATTERNS``, built on first use."""
+    return PatternRegistry(get_settings().GENRE_PATTERNS, CHORD_PROGRESSIONS, get_lookups().note_pitches)
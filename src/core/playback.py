@@ -0,0 +1,308 @@
+import os
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from src.core.midi_output import PortBusyError
+from src.core.midi_writer import DRUM_CHANNEL, MELODIC_CHANNELS
+from src.core.note_store import NoteStore
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+ALL_NOTES_OFF = 123
+
+# Sleep until this close to an event, then spin for the remainder
+SPIN_THRESHOLD_NS = 1_000_000
+# Upper bound on one sleep, so stop/seek/tempo changes are never delayed long
+MAX_SLEEP_NS = 50_000_000
+# Lateness histogram bucket edges, in microseconds
+JITTER_BUCKETS_US = [0, 50, 100, 250, 500, 1_000, 2_000, 5_000, 10_000]
+
+class PlaybackEvents:
+    """Flat, time-ordered MIDI events.
+
+    ``time`` is the song position in seconds at the pattern's own tempo;
+    ``status``, ``data1`` and ``data2`` are the raw message bytes.
+    """
+
+    def __init__(self, time: np.ndarray, status: np.ndarray, data1: np.ndarray, data2: np.ndarray):
+        self.time = time
+        self.status = status
+        self.data1 = data1
+        self.data2 = data2
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @property
+    def length(self) -> float:
+        return float(self.time[-1]) if len(self.time) else 0.0
+
+    @classmethod
+    def from_note_store(cls, store: NoteStore) -> 'PlaybackEvents':
+        """Build note-on/off events, using the same channels as the MIDI writer."""
+        times, statuses, data1, data2 = [], [], [], []
+        for n, track in enumerate(store.tracks):
+            if not len(track):
+                continue
+            channel = DRUM_CHANNEL if track.is_drum else MELODIC_CHANNELS[n % len(MELODIC_CHANNELS)]
+            times += [track.start, track.end]
+            statuses += [np.full(len(track), NOTE_ON | channel), np.full(len(track), NOTE_OFF | channel)]
+            data1 += [track.pitch, track.pitch]
+            data2 += [track.velocity, np.zeros(len(track), dtype=track.velocity.dtype)]
+        if not times:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(np.empty(0), empty, empty, empty)
+        return cls._sorted(np.concatenate(times), np.concatenate(statuses),
+                           np.concatenate(data1), np.concatenate(data2))
+
+    @classmethod
+    def _sorted(cls, time, status, data1, data2) -> 'PlaybackEvents':
+        # At equal times, note-offs go first so repeated notes retrigger
+        order = np.lexsort((status & 0xF0 == NOTE_ON, time))
+        return cls(
+            time[order],
+            status[order].astype(np.int64),
+            data1[order].astype(np.int64),
+            data2[order].astype(np.int64),
+        )
+
+    def merge(self, other: 'PlaybackEvents', start: int = 0) -> 'PlaybackEvents':
+        """Events from index ``start`` onwards merged with ``other``, in time order."""
+        return self._sorted(
+            np.concatenate([self.time[start:], other.time]),
+            np.concatenate([self.status[start:], other.status]),
+            np.concatenate([self.data1[start:], other.data1]),
+            np.concatenate([self.data2[start:], other.data2]),
+        )
+
+def _raise_thread_priority():
+    """Best effort: move the calling thread to a real-time scheduling class."""
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(os.sched_get_priority_min(os.SCHED_FIFO)))
+    except (AttributeError, OSError):
+        pass
+
+class PlaybackEngine:
+    """Plays PlaybackEvents in real time on a dedicated scheduler thread.
+
+    Event deadlines are computed from an anchor (song position, wall-clock
+    time) rather than by accumulating sleeps, so scheduling error never
+    drifts: the thread sleeps until shortly before each deadline, spins on
+    ``time.perf_counter_ns`` for the rest, and records how late each send
+    was. Changing tempo or seeking just moves the anchor.
+
+    ``start``, ``stop``, ``seek`` and ``set_tempo`` never block on playback.
+
+    ``port_lock`` optionally guards ``midi_out`` against other players: it
+    is acquired by ``start`` (waiting at most ``timeout`` seconds for the
+    current holder) and released once the scheduler thread finishes,
+    whether playback ended or was stopped.
+
+    ``source`` optionally supplies further events as ``(until, events)``
+    chunks, where no later chunk has events before ``until``. Chunks are
+    pulled just in time and played events are dropped, so a stream of any
+    length is held in memory one chunk at a time; seeking a stream only
+    reaches events that have not been dropped yet.
+    """
+
+    def __init__(self, events: PlaybackEvents, midi_out: Any, tempo: float,
+                 base_tempo: Optional[float] = None, on_finish: Optional[Callable[[], None]] = None,
+                 source: Optional[Iterable[Tuple[float, PlaybackEvents]]] = None,
+                 port_lock: Optional[threading.Lock] = None):
+        self.midi_out = midi_out
+        self.port_lock = port_lock
+        self.base_tempo = base_tempo or tempo
+        self.on_finish = on_finish
+        self._tempo = tempo
+        self._source = iter(source) if source is not None else None
+        # Buffered events before this song position are final
+        self._horizon = -np.inf if source is not None else np.inf
+        self._set_events(events)
+        self._anchor_position = 0.0
+        self._anchor_ns = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Condition()
+        self._jitter_counts = np.zeros(len(JITTER_BUCKETS_US), dtype=np.int64)
+        self._jitter_max_ns = 0
+        self._jitter_total_ns = 0
+
+    def _set_events(self, events: PlaybackEvents):
+        self.events = events
+        self._messages = list(zip(events.status.tolist(), events.data1.tolist(), events.data2.tolist()))
+        self._times = events.time
+        self._index = 0
+
+    def _pull(self):
+        """Merge the next source chunk into the unplayed events."""
+        try:
+            until, chunk = next(self._source)
+        except StopIteration:
+            self._source = None
+            self._horizon = np.inf
+            return
+        self._set_events(self.events.merge(chunk, self._index))
+        self._horizon = until
+
+    @property
+    def is_playing(self) -> bool:
+        return self._running
+
+    @property
+    def tempo(self) -> float:
+        return self._tempo
+
+    @property
+    def position(self) -> float:
+        """Current song position in seconds at the base tempo."""
+        with self._wakeup:
+            return self._position_at(time.perf_counter_ns())
+
+    def _rate(self) -> float:
+        return self._tempo / self.base_tempo
+
+    def _position_at(self, now_ns: int) -> float:
+        if not self._running:
+            return self._anchor_position
+        return self._anchor_position + (now_ns - self._anchor_ns) * 1e-9 * self._rate()
+
+    def _deadline_ns(self, position: float) -> int:
+        return self._anchor_ns + int((position - self._anchor_position) / self._rate() * 1e9)
+
+    def _reanchor(self, position: float):
+        self._anchor_position = position
+        self._anchor_ns = time.perf_counter_ns()
+
+    def start(self, position: Optional[float] = None, timeout: Optional[float] = None):
+        """Start (or resume) playback on the scheduler thread.
+
+        Raises ``PortBusyError`` if ``port_lock`` is not free within
+        ``timeout`` seconds (``None`` waits for as long as it takes).
+        """
+        with self._wakeup:
+            if self._running:
+                return
+        if self.port_lock is not None and not self.port_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise PortBusyError("MIDI output is in use by another player")
+        try:
+            with self._wakeup:
+                if self._running:  # Started by a concurrent call
+                    self._release_port()
+                    return
+                if position is not None:
+                    self._anchor_position = position
+                self._index = int(np.searchsorted(self._times, self._anchor_position, side="left"))
+                self._reanchor(self._anchor_position)
+                self._thread = threading.Thread(target=self._run, name="midi-playback", daemon=True)
+                self._thread.start()
+                self._running = True
+        except BaseException:
+            self._release_port()
+            raise
+
+    def _release_port(self):
+        if self.port_lock is not None:
+            self.port_lock.release()
+
+    def stop(self):
+        """Stop playback, silencing any sounding notes."""
+        with self._wakeup:
+            if not self._running:
+                return
+            self._anchor_position = self._position_at(time.perf_counter_ns())
+            self._running = False
+            self._wakeup.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def seek(self, position: float):
+        """Jump to a song position; sounding notes are silenced."""
+        with self._wakeup:
+            self._index = int(np.searchsorted(self._times, position, side="left"))
+            self._reanchor(position)
+            if self._running:
+                self._all_notes_off()
+            self._wakeup.notify_all()
+
+    def set_tempo(self, tempo: float):
+        """Change tempo mid-stream, keeping the current song position."""
+        if tempo <= 0:
+            raise ValueError("Tempo must be positive")
+        with self._wakeup:
+            self._reanchor(self._position_at(time.perf_counter_ns()))
+            self._tempo = tempo
+            self._wakeup.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until playback finishes or is stopped; returns False on timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _all_notes_off(self):
+        for channel in range(16):
+            self.midi_out.send_message([CONTROL_CHANGE | channel, ALL_NOTES_OFF, 0])
+
+    def _record_lateness(self, lateness_ns: int):
+        lateness_us = max(lateness_ns, 0) / 1e3
+        self._jitter_counts[np.searchsorted(JITTER_BUCKETS_US, lateness_us, side="right") - 1] += 1
+        self._jitter_max_ns = max(self._jitter_max_ns, lateness_ns)
+        self._jitter_total_ns += max(lateness_ns, 0)
+
+    def jitter_histogram(self) -> Dict:
+        """Histogram of how late each batch of events was sent.
+
+        ``buckets_us`` are the lower bucket edges in microseconds; the last
+        bucket is open-ended.
+        """
+        count = int(self._jitter_counts.sum())
+        return {
+            "buckets_us": list(JITTER_BUCKETS_US),
+            "counts": self._jitter_counts.tolist(),
+            "count": count,
+            "max_us": self._jitter_max_ns / 1e3,
+            "mean_us": self._jitter_total_ns / count / 1e3 if count else 0.0
+        }
+
+    def _run(self):
+        _raise_thread_priority()
+        try:
+            while True:
+                with self._wakeup:
+                    if not self._running:
+                        break
+                    while self._source is not None and (
+                            self._index >= len(self._messages) or self._times[self._index] >= self._horizon):
+                        self._pull()
+                    if self._index >= len(self._messages):
+                        self._anchor_position = max(self._anchor_position, self.events.length)
+                        self._running = False
+                        break
+                    deadline = self._deadline_ns(self._times[self._index])
+                    remaining = deadline - time.perf_counter_ns()
+                    if remaining > SPIN_THRESHOLD_NS:
+                        self._wakeup.wait(min(remaining - SPIN_THRESHOLD_NS, MAX_SLEEP_NS) / 1e9)
+                        continue
+                # Spin outside the lock so control calls stay responsive
+                while time.perf_counter_ns() < deadline:
+                    pass
+                with self._wakeup:
+                    if (not self._running or self._index >= len(self._messages)
+                            or self._deadline_ns(self._times[self._index]) != deadline):
+                        continue  # Stopped, seeked or re-tempoed while spinning
+                    now = time.perf_counter_ns()
+                    self._record_lateness(now - deadline)
+                    # Send every event that is due by now
+                    position = self._position_at(now)
+                    while self._index < len(self._messages) and self._times[self._index] <= position:
+                        self.midi_out.send_message(list(self._messages[self._index]))
+                        self._index += 1
+        finally:
+            self._all_notes_off()
+            self._release_port()
+            if self.on_finish is not None:
+                self.on_finish()
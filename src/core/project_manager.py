@@ -1,14 +1,28 @@
-import json
+import atexit
 import os
-from typing import Dict, List, Optional
+import secrets
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
 from src.core.config import settings
-from src.core.midi_generator import MIDIGenerator
+from src.core.midi_generator import MIDIGenerator, GENERATOR_VERSION
+from src.core.playback import PlaybackEngine
+from src.core.render_cache import get_render_cache, render_key
+from src.core.project_store import ProjectStore
+from src.core.similarity import Fingerprint, get_similarity_index
+
+# Attributes written to the project file; assigning one marks the project dirty
+PERSISTED_FIELDS = frozenset([
+    "name", "user", "created_at", "updated_at", "scenario", "genre",
+    "tempo", "complexity", "variations", "sections", "seed"
+])
 
 class Project:
-    def __init__(self, name: str, user: str = settings.DEFAULT_USER):
+    def __init__(self, name: str, user: Optional[str] = None):
+        self._dirty = set()
         self.name = name
-        self.user = user
+        self.user = settings.DEFAULT_USER if user is None else user
         self.created_at = datetime.now().isoformat()
         self.updated_at = self.created_at
         self.scenario = "loop_based"
@@ -17,7 +31,38 @@ class Project:
         self.complexity = 1
         self.variations = 1
         self.sections: List[Dict] = []
-        self.midi_generator = MIDIGenerator(tempo=self.tempo)
+        self.seed = secrets.randbits(32)
+        self._midi_generator: Optional[MIDIGenerator] = None
+        
+    @property
+    def midi_generator(self) -> MIDIGenerator:
+        """Generator for this project, created on first render or playback."""
+        if self._midi_generator is None:
+            self._midi_generator = MIDIGenerator(tempo=self.tempo, seed=self.seed)
+        return self._midi_generator
+        
+    @midi_generator.setter
+    def midi_generator(self, generator: Optional[MIDIGenerator]):
+        self._midi_generator = generator
+        
+    def __setattr__(self, key, value):
+        # Only reassignment is tracked: mutate lists such as ``sections`` by
+        # assigning a new value.
+        if key in PERSISTED_FIELDS and getattr(self, key, None) != value:
+            self._dirty.add(key)
+        object.__setattr__(self, key, value)
+        
+    @property
+    def dirty_fields(self) -> frozenset:
+        """Persisted fields changed since the project was last saved or loaded."""
+        return frozenset(self._dirty)
+        
+    def mark_clean(self):
+        self._dirty = set()
+        
+    def mark_dirty(self, fields):
+        """Mark persisted fields as unsaved again, e.g. after a failed write."""
+        self._dirty |= set(fields)
         
     def to_dict(self) -> Dict:
         return {
@@ -30,7 +75,8 @@ class Project:
             "tempo": self.tempo,
             "complexity": self.complexity,
             "variations": self.variations,
-            "sections": self.sections
+            "sections": self.sections,
+            "seed": self.seed
         }
         
     @classmethod
@@ -44,70 +90,220 @@ class Project:
         project.complexity = data["complexity"]
         project.variations = data["variations"]
         project.sections = data["sections"]
+        project.mark_clean()
+        # Projects saved before seeds existed keep the freshly drawn one,
+        # which stays dirty so the next save persists it
+        if "seed" in data:
+            project.seed = data["seed"]
+            project.mark_clean()
+        else:
+            project._dirty.add("seed")
         return project
         
-    def generate_pattern(self) -> str:
-        """Generate MIDI pattern and save it."""
+    def render_params(self) -> Dict:
+        """Inputs that fully determine the rendered MIDI file."""
+        return {
+            "genre": self.genre,
+            "scenario": self.scenario,
+            "tempo": self.tempo,
+            "complexity": self.complexity,
+            "variations": self.variations,
+            "seed": self.seed,
+            "generator_version": GENERATOR_VERSION
+        }
+        
+    def render_key(self) -> str:
+        """Content address of the current render, also used as its ETag."""
+        return render_key(self.render_params())
+        
+    def dedup_group(self) -> str:
+        """Render parameters a deduplicated export must share with this project.
+        
+        Fingerprints fold the notes onto one bar, so tempo and the song's
+        length (its scenario and variations) change the file without
+        changing its fingerprint.
+        """
+        return render_key({
+            "scenario": self.scenario,
+            "tempo": self.tempo,
+            "variations": self.variations,
+            "generator_version": GENERATOR_VERSION
+        })
+        
+    def _render(self) -> bytes:
         self.midi_generator.tempo = self.tempo
+        self.midi_generator.seed = self.seed
         self.midi_generator.create_pattern(
             self.genre,
             self.scenario,
             self.variations,
             self.complexity
         )
+        return self.midi_generator.to_bytes()
+        
+    def render(self) -> bytes:
+        """Render the MIDI pattern to bytes, reusing a cached render if any."""
+        cache = get_render_cache()
+        key = self.render_key()
+        data = cache.get(key)
+        if data is None:
+            data = self._render()
+            cache.put(key, data)
+        return data
+        
+    def generate_pattern(self, dedup: bool = False) -> str:
+        """Generate MIDI pattern and save it, returning the cached file path.
         
-        # Save the MIDI file
-        filename = f"{self.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mid"
-        output_path = os.path.join(settings.EXPORTS_DIR, self.user, filename)
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        Newly rendered patterns are added to the similarity index. With
+        ``dedup=True`` a pattern within ``settings.SIMILARITY_DEDUP_RADIUS``
+        bits of an existing export with the same ``dedup_group`` is not
+        stored again: that export is linked under this project's render
+        key instead, so later calls find it without searching.
+        """
+        cache = get_render_cache()
+        key = self.render_key()
+        path = cache.get_path(key)
+        if path is not None:
+            return path
+        data = self._render()
+        index = get_similarity_index()
+        fingerprint = Fingerprint.from_note_store(self.midi_generator.notes)
+        group = self.dedup_group()
+        if dedup:
+            for match, _ in index.search(fingerprint, radius=settings.SIMILARITY_DEDUP_RADIUS, k=3, group=group):
+                path = cache.alias(key, match)
+                if path is not None:
+                    break
+        if path is None:
+            path = cache.put(key, data)
+        index.add(key, fingerprint, group)
+        return path
         
-        self.midi_generator.save_midi(output_path)
-        return output_path
+    def similar_patterns(self, radius: Optional[int] = None, k: int = 10) -> List[Dict]:
+        """Indexed exports and templates near this project's pattern, nearest first."""
+        index = get_similarity_index()
+        key = self.render_key()
+        if key not in index:
+            self._render()
+            index.add(key, Fingerprint.from_note_store(self.midi_generator.notes), self.dedup_group())
+        return [{"key": match, "distance": distance} for match, distance in index.similar_to(key, radius, k)]
         
-    def play_realtime(self):
-        """Play the pattern in real-time."""
+    def play_realtime(self, blocking: bool = True) -> PlaybackEngine:
+        """Play the pattern in real-time, returning its playback engine."""
         self.midi_generator.tempo = self.tempo
+        self.midi_generator.seed = self.seed
         self.midi_generator.create_pattern(
             self.genre,
             self.scenario,
             self.variations,
             self.complexity
         )
-        self.midi_generator.play_realtime()
+        return self.midi_generator.play_realtime(blocking=blocking)
+
+class RenderResult:
+    """Outcome of rendering one project in a batch."""
+    def __init__(self, user: str, name: str, output_path: Optional[str] = None,
+                 error: Optional[str] = None):
+        self.user = user
+        self.name = name
+        self.output_path = output_path
+        self.error = error
+        
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+        
+    def to_dict(self) -> Dict:
+        return {
+            "user": self.user,
+            "name": self.name,
+            "output_path": self.output_path,
+            "error": self.error
+        }
+
+def _render_chunk(chunk: List[Dict], exports_dir: str) -> List[RenderResult]:
+    """Render a chunk of serialized projects (runs inside worker processes)."""
+    settings.EXPORTS_DIR = exports_dir
+    results = []
+    for data in chunk:
+        try:
+            output_path = Project.from_dict(data).generate_pattern()
+            results.append(RenderResult(data["user"], data["name"], output_path=output_path))
+        except Exception as e:
+            results.append(RenderResult(data["user"], data["name"], error=f"{type(e).__name__}: {e}"))
+    return results
 
 class ProjectManager:
-    def __init__(self):
+    def __init__(self, flush_delay: Optional[float] = None):
+        # Loaded projects; everything else is only in the store's index until accessed
         self.projects: Dict[str, Project] = {}
-        self._load_projects()
+        self.store = ProjectStore(settings.PROJECTS_DIR)
+        # Seconds to coalesce updates before writing; 0 writes through
+        self.flush_delay = settings.PROJECT_FLUSH_DELAY if flush_delay is None else flush_delay
+        self._pending: Dict[str, threading.Timer] = {}
+        self._pending_lock = threading.Lock()
+        if self.flush_delay > 0:
+            atexit.register(self.flush)
         
-    def _load_projects(self):
-        """Load projects from disk."""
-        projects_dir = settings.PROJECTS_DIR
-        if not os.path.exists(projects_dir):
-            return
-            
-        for user_dir in os.listdir(projects_dir):
-            user_path = os.path.join(projects_dir, user_dir)
-            if os.path.isdir(user_path):
-                for project_file in os.listdir(user_path):
-                    if project_file.endswith('.json'):
-                        with open(os.path.join(user_path, project_file), 'r') as f:
-                            data = json.load(f)
-                            project = Project.from_dict(data)
-                            self.projects[f"{user_dir}/{project.name}"] = project
-                            
     def _save_project(self, project: Project):
-        """Save project to disk."""
-        project_dir = os.path.join(settings.PROJECTS_DIR, project.user)
-        os.makedirs(project_dir, exist_ok=True)
+        """Save project to disk if it has unsaved changes."""
+        with self.store.lock_for(project.user, project.name):
+            if not project.dirty_fields:
+                return
+            # Clear before snapshotting: changes racing with the write mark
+            # the project dirty again instead of being lost
+            dirty = project.dirty_fields
+            project.mark_clean()
+            try:
+                self.store.save(project.to_dict())
+            except BaseException:
+                project.mark_dirty(dirty)
+                raise
+            
+    def _schedule_save(self, project: Project):
+        """Write the project after flush_delay, coalescing repeated updates."""
+        project_key = f"{project.user}/{project.name}"
+        with self._pending_lock:
+            if project_key in self._pending:
+                return
+            timer = threading.Timer(self.flush_delay, self._flush_one, args=(project_key, project))
+            timer.daemon = True
+            self._pending[project_key] = timer
+        timer.start()
         
-        project_file = os.path.join(project_dir, f"{project.name}.json")
-        with open(project_file, 'w') as f:
-            json.dump(project.to_dict(), f, indent=2)
+    def _flush_one(self, project_key: str, project: Project):
+        with self._pending_lock:
+            self._pending.pop(project_key, None)
+        try:
+            self._save_project(project)
+        except Exception:
+            # Still dirty: retry after another delay, or on the next flush
+            self._schedule_save(project)
+            raise
+        
+    def flush(self):
+        """Write every project with a pending coalesced update.
+        
+        Projects that fail to save stay pending; the first error is raised
+        once every other project has been written.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        error = None
+        for project_key, timer in pending.items():
+            timer.cancel()
+            try:
+                self._save_project(timer.args[1])
+            except Exception as e:
+                self._schedule_save(timer.args[1])
+                error = error or e
+        if error is not None:
+            raise error
             
-    def create_project(self, name: str, user: str = settings.DEFAULT_USER) -> Project:
+    def create_project(self, name: str, user: Optional[str] = None) -> Project:
         """Create a new project."""
-        if f"{user}/{name}" in self.projects:
+        user = settings.DEFAULT_USER if user is None else user
+        if self.get_project(name, user) is not None:
             raise ValueError(f"Project {name} already exists for user {user}")
             
         project = Project(name, user)
@@ -115,36 +311,113 @@ class ProjectManager:
         self._save_project(project)
         return project
         
-    def get_project(self, name: str, user: str = settings.DEFAULT_USER) -> Optional[Project]:
-        """Get a project by name and user."""
-        return self.projects.get(f"{user}/{name}")
+    def get_project(self, name: str, user: Optional[str] = None) -> Optional[Project]:
+        """Get a project by name and user, loading it from disk on first access."""
+        user = settings.DEFAULT_USER if user is None else user
+        project_key = f"{user}/{name}"
+        project = self.projects.get(project_key)
+        if project is None:
+            data = self.store.load(user, name)
+            if data is None:
+                return None
+            project = Project.from_dict(data)
+            self.projects[project_key] = project
+        return project
         
     def update_project(self, project: Project):
-        """Update a project."""
-        project.updated_at = datetime.now().isoformat()
+        """Update a project; unchanged projects are not rewritten."""
         self.projects[f"{project.user}/{project.name}"] = project
-        self._save_project(project)
+        if not project.dirty_fields:
+            return
+        project.updated_at = datetime.now().isoformat()
+        if self.flush_delay > 0:
+            self._schedule_save(project)
+        else:
+            self._save_project(project)
         
-    def delete_project(self, name: str, user: str = settings.DEFAULT_USER):
+    def delete_project(self, name: str, user: Optional[str] = None):
         """Delete a project."""
+        user = settings.DEFAULT_USER if user is None else user
         project_key = f"{user}/{name}"
-        if project_key in self.projects:
-            del self.projects[project_key]
-            project_file = os.path.join(settings.PROJECTS_DIR, user, f"{name}.json")
-            if os.path.exists(project_file):
-                os.remove(project_file)
+        with self._pending_lock:
+            timer = self._pending.pop(project_key, None)
+        if timer:
+            timer.cancel()
+        self.projects.pop(project_key, None)
+        self.store.delete(user, name)
                 
-    def list_projects(self, user: str = settings.DEFAULT_USER) -> List[Project]:
-        """List all projects for a user."""
-        return [p for k, p in self.projects.items() if k.startswith(f"{user}/")]
-        
-    def generate_all_patterns(self, user: str = settings.DEFAULT_USER) -> List[str]:
-        """Generate patterns for all projects of a user."""
-        generated_files = []
-        for project in self.list_projects(user):
-            try:
-                output_path = project.generate_pattern()
-                generated_files.append(output_path)
-            except Exception as e:
-                print(f"Error generating pattern for project {project.name}: {e}")
-        return generated_files 
\ No newline at end of file
+    def list_projects(self, user: Optional[str] = None, offset: int = 0,
+                      limit: Optional[int] = None) -> List[Project]:
+        """List a user's projects ordered by name, optionally one page at a time."""
+        user = settings.DEFAULT_USER if user is None else user
+        entries = self.store.list(user, offset=offset, limit=limit)
+        return [self.get_project(entry["name"], user) for entry in entries]
+        
+    def count_projects(self, user: Optional[str] = None) -> int:
+        """Number of projects a user has."""
+        user = settings.DEFAULT_USER if user is None else user
+        return self.store.count(user)
+        
+    def dedup_groups(self) -> Dict[str, str]:
+        """Dedup group of every project's current render, keyed by render key."""
+        return {
+            project.render_key(): project.dedup_group()
+            for user in self.store.users() for project in self.list_projects(user)
+        }
+        
+    def render_projects(self, projects: List[Project], max_workers: Optional[int] = None,
+                        chunk_size: Optional[int] = None, max_in_flight: Optional[int] = None,
+                        progress: Optional[Callable[[int, int], None]] = None) -> List[RenderResult]:
+        """Render many projects on a process pool.
+        
+        Projects are serialized and submitted in chunks of ``chunk_size``; at
+        most ``max_in_flight`` chunks are pending at once, which bounds the
+        memory held by queued work. ``progress(done, total)`` is called as
+        chunks complete. With ``max_workers <= 1`` rendering runs in-process.
+        Results are returned in input order, one per project.
+        """
+        max_workers = settings.BATCH_MAX_WORKERS if max_workers is None else max_workers
+        chunk_size = chunk_size or settings.BATCH_CHUNK_SIZE
+        max_in_flight = max_in_flight or settings.BATCH_MAX_IN_FLIGHT
+        
+        total = len(projects)
+        chunks = [
+            [p.to_dict() for p in projects[i:i + chunk_size]]
+            for i in range(0, total, chunk_size)
+        ]
+        chunk_results: List[Optional[List[RenderResult]]] = [None] * len(chunks)
+        done = 0
+        
+        def finish(index: int, results: List[RenderResult]):
+            nonlocal done
+            chunk_results[index] = results
+            done += len(results)
+            if progress:
+                progress(done, total)
+                
+        if max_workers <= 1:
+            for index, chunk in enumerate(chunks):
+                finish(index, _render_chunk(chunk, settings.EXPORTS_DIR))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                pending = {}
+                for index, chunk in enumerate(chunks):
+                    if len(pending) >= max_in_flight:
+                        completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in completed:
+                            finish(pending.pop(future), future.result())
+                    pending[executor.submit(_render_chunk, chunk, settings.EXPORTS_DIR)] = index
+                for future in as_completed(list(pending)):
+                    finish(pending.pop(future), future.result())
+                    
+        return [result for results in chunk_results for result in results]
+        
+    def generate_all_patterns(self, user: Optional[str] = None, **kwargs) -> List[str]:
+        """Generate patterns for all projects of a user.
+        
+        Returns the paths of the successful renders; use ``render_projects``
+        to also get per-project errors. Keyword arguments are passed through
+        to ``render_projects``.
+        """
+        results = self.render_projects(self.list_projects(user), **kwargs)
+        return [result.output_path for result in results if result.ok] 
\ No newline at end of file
@@ -0,0 +1,150 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+INDEX_FILENAME = "index.sqlite3"
+INDEX_VERSION = 1
+
+def dumps(data: Dict) -> bytes:
+    """Compact JSON encoding, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+def atomic_write(path: str, data: bytes):
+    """Write a file so readers see either the old or the new content, never a mix."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ProjectStore:
+    """Project files on disk plus a persistent SQLite index of their metadata.
+
+    Project bodies stay in ``<projects_dir>/<user>/<name>.json``; the index
+    maps each user to their projects so listing and existence checks never
+    scan the directory tree. Existing project files are imported into the
+    index once, the first time a store is opened on a directory without one.
+    """
+
+    def __init__(self, projects_dir: str):
+        self.projects_dir = projects_dir
+        os.makedirs(projects_dir, exist_ok=True)
+        self.index_path = os.path.join(projects_dir, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._project_locks: Dict[tuple, threading.RLock] = {}
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                " user TEXT NOT NULL, name TEXT NOT NULL, genre TEXT, scenario TEXT,"
+                " tempo REAL, updated_at TEXT, PRIMARY KEY (user, name))"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if self._meta("version") is None:
+            self.rebuild_index()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def lock_for(self, user: str, name: str) -> threading.RLock:
+        """Lock serializing writes to one project."""
+        with self._lock:
+            return self._project_locks.setdefault((user, name), threading.RLock())
+
+    def path_for(self, user: str, name: str) -> str:
+        return os.path.join(self.projects_dir, user, f"{name}.json")
+
+    @staticmethod
+    def _row(data: Dict) -> tuple:
+        return (data["user"], data["name"], data.get("genre"), data.get("scenario"),
+                data.get("tempo"), data.get("updated_at"))
+
+    def rebuild_index(self):
+        """Re-create the index from the project files on disk."""
+        rows = []
+        for user_dir in os.listdir(self.projects_dir):
+            user_path = os.path.join(self.projects_dir, user_dir)
+            if not os.path.isdir(user_path):
+                continue
+            for project_file in os.listdir(user_path):
+                if project_file.endswith('.json'):
+                    with open(os.path.join(user_path, project_file), 'r') as f:
+                        rows.append(self._row(json.load(f)))
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM projects")
+            self._db.executemany("INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+
+    def exists(self, user: str, name: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM projects WHERE user = ? AND name = ?", (user, name)
+            ).fetchone()
+        return row is not None
+
+    def load(self, user: str, name: str) -> Optional[Dict]:
+        """Load a project body, or None if it is not indexed."""
+        if not self.exists(user, name):
+            return None
+        with open(self.path_for(user, name), 'rb') as f:
+            return json.loads(f.read())
+
+    def save(self, data: Dict):
+        """Atomically write a project body and update its index entry."""
+        path = self.path_for(data["user"], data["name"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock_for(data["user"], data["name"]):
+            atomic_write(path, dumps(data))
+            with self._lock, self._db:
+                self._db.execute("INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?)", self._row(data))
+
+    def delete(self, user: str, name: str):
+        with self.lock_for(user, name):
+            with self._lock, self._db:
+                self._db.execute("DELETE FROM projects WHERE user = ? AND name = ?", (user, name))
+            path = self.path_for(user, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def list(self, user: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Index entries of a user's projects, ordered by name."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user, name, genre, scenario, tempo, updated_at FROM projects"
+                " WHERE user = ? ORDER BY name LIMIT ? OFFSET ?",
+                (user, -1 if limit is None else limit, offset)
+            ).fetchall()
+        keys = ("user", "name", "genre", "scenario", "tempo", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def users(self) -> List[str]:
+        """Every user with at least one project."""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT user FROM projects ORDER BY user").fetchall()
+        return [row[0] for row in rows]
+
+    def count(self, user: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM projects WHERE user = ?", (user,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
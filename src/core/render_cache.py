@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from src.core.config import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Running total of the bytes on disk, shared by every process using the directory
+USAGE_FILENAME = ".usage"
+
+def render_key(params: Dict) -> str:
+    """Content address for a render: a SHA-256 of its canonicalized inputs."""
+    payload = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class RenderCache:
+    """Two-tier cache of rendered MIDI files.
+
+    Rendered bytes live on disk as ``<key>.mid`` under ``directory``, bounded
+    to ``max_bytes`` by evicting the least recently used files (tracked by
+    mtime). The most recently used entries are also kept in memory.
+
+    The size of the disk tier is tracked in a ``.usage`` file shared, under
+    a file lock, by every process writing to ``directory``, so renders from
+    batch workers and other servers count towards the bound. The total may
+    overestimate (a key rendered twice is counted twice); it is corrected
+    by re-scanning the directory whenever it crosses ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, memory_items: int):
+        # Absolute, so returned paths stay valid whatever the reader's working directory
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mid")
+
+    def _remember(self, key: str, data: bytes):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for a key, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            path = self.path_for(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return None
+            os.utime(path)
+            self._remember(key, data)
+            return data
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Return the path of a cached file, or None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store rendered bytes and return their path."""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, data)
+            self._account(len(data))
+        return path
+
+    def alias(self, key: str, target: str) -> Optional[str]:
+        """Store the cached render of ``target`` under ``key`` too; returns its path.
+
+        The file is hard-linked where the filesystem allows it and copied
+        otherwise. Returns None if ``target`` is not cached.
+        """
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(self.path_for(target), tmp_path)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            data = self.get(target)
+            return None if data is None else self.put(key, data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._account(os.stat(path).st_size)
+        return path
+
+    def _account(self, size: int):
+        """Add a stored file to the shared usage total, evicting if it grows past max_bytes."""
+        with self._usage() as usage:
+            total = usage.read()
+            if total is None or total + size > self.max_bytes:
+                usage.write(self._evict())
+            else:
+                usage.write(total + size)
+
+    @contextmanager
+    def _usage(self):
+        """Exclusive, cross-process access to the shared disk usage total."""
+        fd = os.open(os.path.join(self.directory, USAGE_FILENAME), os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield _Usage(f)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _evict(self) -> int:
+        """Remove least recently used files until the store fits max_bytes; returns the bytes left."""
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".mid")]
+        stats = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries))
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in stats:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._memory.pop(os.path.basename(path)[:-len(".mid")], None)
+        return total
+
+    def clear(self):
+        """Remove every cached render."""
+        with self._lock, self._usage() as usage:
+            self._memory.clear()
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".mid"):
+                    os.remove(entry.path)
+            usage.write(0)
+
+class _Usage:
+    """The usage file's byte total; ``read`` returns None if it is missing or unreadable."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self) -> Optional[int]:
+        self._f.seek(0)
+        try:
+            return int(self._f.read())
+        except ValueError:
+            return None
+
+    def write(self, total: int):
+        self._f.seek(0)
+        self._f.truncate()
+        self._f.write(str(total))
+
+_render_cache: Optional[RenderCache] = None
+
+def get_render_cache() -> RenderCache:
+    """Return the process-wide render cache under settings.EXPORTS_DIR."""
+    global _render_cache
+    directory = os.path.abspath(os.path.join(settings.EXPORTS_DIR, "cache"))
+    if _render_cache is None or _render_cache.directory != directory:
+        _render_cache = RenderCache(
+            directory,
+            max_bytes=settings.RENDER_CACHE_MAX_BYTES,
+            memory_items=settings.RENDER_CACHE_MEMORY_ITEMS,
+        )
+    return _render_cache
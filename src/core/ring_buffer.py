@@ -0,0 +1,25 @@
+import numpy as np
+
+class RingBuffer:
+    """Sliding window over the last ``length`` steps of a batch of sequences.
+
+    Every step is stored twice, ``length`` slots apart, so the current window
+    is always one contiguous slice: pushing a step writes two rows instead of
+    shifting the whole window like ``np.roll``.
+    """
+
+    def __init__(self, initial: np.ndarray):
+        """``initial`` is the starting window, shaped (batch, length, features)."""
+        self.length = initial.shape[1]
+        self._data = np.concatenate([initial, initial], axis=1)
+        self._head = 0
+
+    def window(self) -> np.ndarray:
+        """The last ``length`` steps, oldest first (a view, not a copy)."""
+        return self._data[:, self._head:self._head + self.length]
+
+    def push(self, step: np.ndarray):
+        """Append a (batch, features) step, dropping the oldest one."""
+        self._data[:, self._head] = step
+        self._data[:, self._head + self.length] = step
+        self._head = (self._head + 1) % self.length
@@ -0,0 +1,555 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pretty_midi
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.core.config import settings
+from src.core.grooves import GM_DRUMS
+from src.core.midi_generator import STEP_DURATION
+from src.core.note_store import NoteStore
+from src.core.patterns import DRUM_PITCHES, GRID_STEPS
+from src.core.project_store import atomic_write
+from src.core.templates import Template
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Fingerprint layout: a one-bar grid per drum, the melodic onset grid and
+# the melodic pitch classes, packed little-endian into two uint64 words
+DRUMS = list(DRUM_PITCHES)
+FINGERPRINT_BITS = len(DRUMS) * GRID_STEPS + GRID_STEPS + 12
+CHUNK_BITS = 16
+N_CHUNKS = -(-FINGERPRINT_BITS // CHUNK_BITS)
+TEMPLATE_PREFIX = "template:"
+
+CURRENT_FILENAME = "CURRENT"
+PENDING_FILENAME = "pending.jsonl"
+LOCK_FILENAME = ".lock"
+SEGMENT_ARRAYS = ("keys", "entry_code", "histograms", "codes", "chunk_keys", "chunk_order",
+                  "postings", "code_start", "posting_groups", "variant_start")
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def hamming(codes: np.ndarray, code: np.ndarray) -> np.ndarray:
+    """Bit distance between each row of ``codes`` and ``code``."""
+    x = np.bitwise_xor(codes, code)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT[x.view(np.uint8)].reshape(len(x), -1).sum(axis=1, dtype=np.int64)
+
+def group_id(group: str) -> int:
+    """Numeric id of an entry group; the default group ``""`` is 0."""
+    if not group:
+        return 0
+    return int.from_bytes(hashlib.blake2b(group.encode("utf-8"), digest_size=8).digest(), "little") | 1
+
+def _group_bounds(groups: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                  group: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sub-ranges of ``[starts, ends)`` holding ``group``; each range of ``groups`` must be sorted."""
+    # Most ranges hold a single group and need no search
+    first = np.take(groups, starts, mode="clip")
+    last = np.take(groups, ends - 1, mode="clip")
+    whole = (first == group) & (last == group)
+    empty = (starts == ends) | (first > group) | (last < group)
+    mixed = np.flatnonzero(~(whole | empty))
+    lo, hi = np.where(whole, starts, ends), ends.copy()
+    if len(mixed):
+        lo[mixed], hi[mixed] = _search_bounds(groups, starts[mixed], ends[mixed], group)
+    return lo, hi
+
+def _search_bounds(groups: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                   group: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Binary search every range for ``group`` at once."""
+    bounds = []
+    for right in (False, True):
+        lo, hi = starts.copy(), ends.copy()
+        while True:
+            active = np.flatnonzero(lo < hi)
+            if not len(active):
+                break
+            mid = (lo[active] + hi[active]) // 2
+            values = np.take(groups, mid)
+            below = values <= group if right else values < group
+            lo[active[below]] = mid[below] + 1
+            hi[active[~below]] = mid[~below]
+        bounds.append(lo)
+    return bounds[0], bounds[1]
+
+def _chunk_keys(codes: np.ndarray) -> np.ndarray:
+    """(N_CHUNKS, n) lookup keys: each 16-bit chunk tagged with its position in the high bits.
+
+    Sorting each row and concatenating the rows gives one globally sorted
+    table, so every chunk of a query is looked up in a single searchsorted.
+    """
+    chunks = np.ascontiguousarray(codes, dtype="<u8").view("<u2")[:, :N_CHUNKS].T.astype(np.uint32)
+    return chunks | (np.arange(N_CHUNKS, dtype=np.uint32) << CHUNK_BITS)[:, None]
+
+class Fingerprint:
+    """Compact summary of a pattern for near-duplicate search.
+
+    ``code`` packs ``FINGERPRINT_BITS`` bits into two uint64 words: a
+    16-step grid per drum in ``DRUM_PITCHES`` order, the grid of melodic
+    onsets and the pitch classes the melodic parts use. Longer patterns
+    are folded onto one bar. ``histogram`` is the melodic pitch-class
+    distribution scaled to 0-255; it ranks patterns with equal codes.
+    """
+
+    def __init__(self, code: np.ndarray, histogram: np.ndarray):
+        self.code = np.asarray(code, dtype=np.uint64)
+        self.histogram = np.asarray(histogram, dtype=np.uint8)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, Fingerprint) and np.array_equal(self.code, other.code)
+                and np.array_equal(self.histogram, other.histogram))
+
+    def distance(self, other: 'Fingerprint') -> int:
+        return int(hamming(self.code[None], other.code)[0])
+
+    @classmethod
+    def from_grids(cls, drum_grid: np.ndarray, onset_grid: np.ndarray, pitch_counts: np.ndarray) -> 'Fingerprint':
+        """Build from a (drums, 16) hit grid, a 16-step onset grid and 12 pitch-class counts."""
+        bits = np.zeros(128, dtype=bool)
+        bits[:FINGERPRINT_BITS] = np.concatenate([np.ravel(drum_grid), onset_grid, pitch_counts > 0])
+        code = np.packbits(bits, bitorder="little").view("<u8")
+        peak = pitch_counts.max()
+        histogram = np.rint(pitch_counts * 255.0 / peak) if peak else np.zeros(12)
+        return cls(code, histogram)
+
+    @classmethod
+    def from_notes(cls, tracks: Iterable[Tuple[bool, np.ndarray, np.ndarray]],
+                   step_duration: float = STEP_DURATION) -> 'Fingerprint':
+        """Fingerprint ``(is_drum, pitch, start)`` note columns, with times in seconds."""
+        drum_grid = np.zeros((len(DRUMS), GRID_STEPS), dtype=bool)
+        onset_grid = np.zeros(GRID_STEPS, dtype=bool)
+        pitch_counts = np.zeros(12, dtype=np.int64)
+        for is_drum, pitch, start in tracks:
+            steps = np.rint(np.asarray(start) / step_duration).astype(np.int64) % GRID_STEPS
+            pitch = np.asarray(pitch, dtype=np.int64)
+            if is_drum:
+                drums = np.array([DRUMS.index(GM_DRUMS[p]) if p in GM_DRUMS else -1 for p in pitch.tolist()],
+                                 dtype=np.int64)
+                known = drums >= 0
+                drum_grid[drums[known], steps[known]] = True
+            else:
+                onset_grid[steps] = True
+                pitch_counts += np.bincount(pitch % 12, minlength=12)
+        return cls.from_grids(drum_grid, onset_grid, pitch_counts)
+
+    @classmethod
+    def from_note_store(cls, store: NoteStore) -> 'Fingerprint':
+        return cls.from_notes((track.is_drum, track.pitch, track.start) for track in store.tracks)
+
+    @classmethod
+    def from_pretty_midi(cls, midi: pretty_midi.PrettyMIDI) -> 'Fingerprint':
+        return cls.from_notes(
+            (instrument.is_drum, [n.pitch for n in instrument.notes], [n.start for n in instrument.notes])
+            for instrument in midi.instruments
+        )
+
+    @classmethod
+    def from_template(cls, template: Template) -> 'Fingerprint':
+        """Fingerprint a groove template; its chords count as melodic notes on each bar's downbeat."""
+        drum_grid = np.zeros((len(DRUMS), GRID_STEPS), dtype=bool)
+        drums = np.array([DRUMS.index(GM_DRUMS[int(p)]) for p in template.drum_pitch], dtype=np.int64)
+        drum_grid[drums, template.drum_step % GRID_STEPS] = True
+        onset_grid = np.zeros(GRID_STEPS, dtype=bool)
+        onset_grid[0] = template.chord_pitches.size > 0
+        pitch_counts = np.bincount(template.chord_pitches.ravel() % 12, minlength=12)
+        return cls.from_grids(drum_grid, onset_grid, pitch_counts)
+
+class SimilarityIndex:
+    """Persistent near-duplicate index over pattern fingerprints.
+
+    Entries map a key (a render key for exports, ``template:<name>`` for
+    templates) to a ``Fingerprint``. Most entries live in an immutable
+    segment of ``.npy`` files, opened memory-mapped, so opening an index
+    of millions of patterns reads almost nothing. New entries go to an
+    append-only ``pending.jsonl`` log and are merged into a new segment by
+    ``compact``, which is never run implicitly: once ``max_pending``
+    accumulate, ``needs_compaction`` tells the caller to run it off the
+    request path. The ``CURRENT`` file names the live segment.
+
+    Search is multi-index hashing: codes are split into ``N_CHUNKS``
+    16-bit chunks, and any code within ``radius < N_CHUNKS`` bits of a
+    query equals it exactly in at least one chunk. Candidates therefore
+    come from binary searches in per-chunk sorted tables, and only those
+    are compared bit by bit. Identical codes are stored once with a
+    posting list of their entries.
+
+    Entries may be added to a named group, and a search can be limited to
+    one group; postings are ordered by group within each code, so this
+    costs a binary search per candidate code. Within a group, postings are
+    ordered by histogram, then key: each run of equal histograms (a
+    variant) is ranked as a whole.
+
+    Writers in other processes are serialized with a file lock; each
+    reader picks up their changes on its next call.
+    """
+
+    def __init__(self, directory: str, max_pending: Optional[int] = None):
+        self.directory = directory
+        self.max_pending = max_pending or settings.SIMILARITY_MAX_PENDING
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._state: Optional[Tuple] = None
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _stat_state(self) -> Tuple:
+        state = []
+        for name in (CURRENT_FILENAME, PENDING_FILENAME):
+            try:
+                stat = os.stat(self._path(name))
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def _load(self):
+        """(Re)open the live segment and replay the pending log."""
+        self._state = self._stat_state()
+        try:
+            with open(self._path(CURRENT_FILENAME)) as f:
+                self._segment = f.read().strip()
+        except FileNotFoundError:
+            self._segment = None
+        if self._segment:
+            for name in SEGMENT_ARRAYS:
+                path = os.path.join(self._path(self._segment), f"{name}.npy")
+                if name == "posting_groups" and not os.path.exists(path):
+                    # Segments written before groups existed hold only the default group
+                    self._posting_groups = np.zeros(len(self._postings), dtype=np.uint64)
+                    continue
+                if name == "variant_start" and not os.path.exists(path):
+                    # ... or before variants: every entry is ranked on its own
+                    self._variant_start = np.arange(len(self._postings) + 1, dtype=np.int64)
+                    continue
+                array = np.load(path, mmap_mode="r")
+                # Plain ndarray views of the mapping index faster than np.memmap
+                setattr(self, f"_{name}", array.view(np.ndarray))
+        else:
+            self._keys = np.empty(0, dtype="S1")
+            self._entry_code = np.empty(0, dtype=np.uint32)
+            self._histograms = np.empty((0, 12), dtype=np.uint8)
+            self._codes = np.empty((0, 2), dtype=np.uint64)
+            self._chunk_keys = np.empty(0, dtype=np.uint32)
+            self._chunk_order = np.empty(0, dtype=np.uint32)
+            self._postings = np.empty(0, dtype=np.uint32)
+            self._code_start = np.zeros(1, dtype=np.int64)
+            self._posting_groups = np.empty(0, dtype=np.uint64)
+            self._variant_start = np.zeros(1, dtype=np.int64)
+        self._pending_keys: List[str] = []
+        self._pending_index = {}
+        self._pending_codes = np.empty((0, 2), dtype=np.uint64)
+        self._pending_histograms = np.empty((0, 12), dtype=np.uint8)
+        self._pending_groups = np.empty(0, dtype=np.uint64)
+        try:
+            with open(self._path(PENDING_FILENAME), "rb") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # Torn by an interrupted write
+        self._remember([r for r in records if self._segment_entry(r["key"]) is None])
+
+    def _sync(self):
+        if self._stat_state() != self._state:
+            self._load()
+
+    def _remember(self, records: List[dict]):
+        records = [r for r in records if r["key"] not in self._pending_index]
+        if not records:
+            return
+        for record in records:
+            self._pending_index[record["key"]] = len(self._pending_keys)
+            self._pending_keys.append(record["key"])
+        self._pending_codes = np.concatenate(
+            [self._pending_codes, np.array([r["code"] for r in records], dtype=np.uint64)])
+        self._pending_histograms = np.concatenate(
+            [self._pending_histograms, np.array([r["histogram"] for r in records], dtype=np.uint8)])
+        self._pending_groups = np.concatenate(
+            [self._pending_groups, np.array([r.get("group", 0) for r in records], dtype=np.uint64)])
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock across processes for appending and compacting."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(LOCK_FILENAME), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _segment_entry(self, key: str) -> Optional[int]:
+        """Position of a key in the live segment (whose keys are sorted), or None."""
+        encoded = key.encode("utf-8")
+        i = int(np.searchsorted(self._keys, encoded))
+        if i < len(self._keys) and self._keys[i] == encoded:
+            return i
+        return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._keys) + len(self._pending_keys)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: str) -> Optional[Fingerprint]:
+        """The fingerprint stored under a key, or None."""
+        with self._lock:
+            self._sync()
+            if key in self._pending_index:
+                i = self._pending_index[key]
+                return Fingerprint(self._pending_codes[i], self._pending_histograms[i])
+            i = self._segment_entry(key)
+            if i is None:
+                return None
+            return Fingerprint(self._codes[self._entry_code[i]], self._histograms[i])
+
+    def add(self, key: str, fingerprint: Fingerprint, group: str = "") -> bool:
+        """Store a fingerprint unless the key is already indexed; returns whether it was added."""
+        return self.add_many([(key, fingerprint)], group) == 1
+
+    def add_many(self, items: Iterable[Tuple[str, Fingerprint]], group: str = "") -> int:
+        """Store several fingerprints in ``group`` with one log write; returns how many were new."""
+        gid = group_id(group)
+        with self._lock, self._file_lock():
+            self._sync()
+            records, seen = [], set()
+            for key, fingerprint in items:
+                if key in seen or key in self._pending_index or self._segment_entry(key) is not None:
+                    continue
+                seen.add(key)
+                records.append({"key": key, "code": [int(w) for w in fingerprint.code],
+                                "histogram": fingerprint.histogram.tolist(), "group": gid})
+            if not records:
+                return 0
+            with open(self._path(PENDING_FILENAME), "a+b") as f:
+                # Start a fresh line after one torn by an interrupted write
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    f.seek(end - 1)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(b"".join(json.dumps(r, separators=(",", ":")).encode("utf-8") + b"\n"
+                                 for r in records))
+                f.flush()
+                os.fsync(f.fileno())
+            self._remember(records)
+            self._state = self._stat_state()
+            return len(records)
+
+    @property
+    def needs_compaction(self) -> bool:
+        """Whether at least ``max_pending`` entries are waiting in the log."""
+        with self._lock:
+            self._sync()
+            return len(self._pending_keys) >= self.max_pending
+
+    def search(self, fingerprint: Fingerprint, radius: Optional[int] = None, k: int = 10,
+               exclude: Optional[str] = None, group: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Up to ``k`` ``(key, distance)`` pairs within ``radius`` bits, nearest first.
+
+        Ties are broken by pitch-class histogram distance, then by key.
+        With ``group``, only entries added to that group are returned.
+        Entries sharing a code in the segment are expanded only as far as
+        the results can need: codes beyond the distance at which ``k``
+        entries are found are skipped, and each variant of the kept codes
+        contributes at most ``k`` entries (its first by key), so heavily
+        duplicated patterns cost no more than distinct ones.
+        """
+        radius = settings.SIMILARITY_RADIUS if radius is None else radius
+        if not 0 <= radius < N_CHUNKS:
+            raise ValueError(f"radius must be between 0 and {N_CHUNKS - 1}")
+        if k <= 0:
+            return []
+        needed = k + (exclude is not None)
+        with self._lock:
+            self._sync()
+            code = fingerprint.code
+            chunk_keys = _chunk_keys(code[None])[:, 0]
+            starts = np.searchsorted(self._chunk_keys, chunk_keys, side="left")
+            ends = np.searchsorted(self._chunk_keys, chunk_keys, side="right")
+            candidates = np.sort(np.concatenate([self._chunk_order[a:b] for a, b in zip(starts, ends)]))
+            # A code within ``radius`` bits differs in at most ``radius`` chunks,
+            # so it is listed under every other chunk of the query
+            first = np.flatnonzero(np.concatenate([[True], candidates[1:] != candidates[:-1]]))
+            matches = np.diff(np.append(first, len(candidates)))
+            candidates = candidates[first[matches >= N_CHUNKS - radius]]
+            distances = hamming(np.take(self._codes, candidates, axis=0), code)
+            close = distances <= radius
+            candidates, distances = candidates[close], distances[close]
+            # Nearest codes first; stop at the distance where enough entries are found
+            order = np.argsort(distances, kind="stable")
+            candidates, distances = candidates[order], distances[order]
+            starts, ends = self._code_start[candidates], self._code_start[candidates + 1]
+            if group is not None:
+                starts, ends = _group_bounds(self._posting_groups, starts, ends, group_id(group))
+            lengths = np.minimum(ends - starts, needed)
+            enough = np.searchsorted(np.cumsum(lengths), needed)
+            if enough < len(lengths):
+                cut = np.searchsorted(distances, distances[enough], side="right")
+                starts, ends, distances = starts[:cut], ends[:cut], distances[:cut]
+            # Any variant of a kept code may rank first, but within one only
+            # the first ``needed`` entries by key can be returned
+            first = np.searchsorted(self._variant_start, starts)
+            counts = np.searchsorted(self._variant_start, ends) - first
+            variants = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - first, counts)
+            starts = self._variant_start[variants]
+            lengths = np.minimum(self._variant_start[variants + 1] - starts, needed)
+            distances = np.repeat(distances, counts)
+            # Expand the kept variants into their postings in one gather
+            positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+            entries = self._postings[positions]
+            keys = self._keys[entries]
+            distances = np.repeat(distances, lengths)
+            histograms = self._histograms[entries]
+
+            # Pending entries are few, so they are compared by brute force
+            if self._pending_keys:
+                pending = hamming(self._pending_codes, code)
+                close = pending <= radius
+                if group is not None:
+                    close &= self._pending_groups == group_id(group)
+                close = np.flatnonzero(close)
+                keys = np.concatenate([keys, np.array([self._pending_keys[i].encode("utf-8") for i in close],
+                                                      dtype=bytes)])
+                distances = np.concatenate([distances, pending[close]])
+                histograms = np.concatenate([histograms, self._pending_histograms[close]])
+
+        spread = np.abs(histograms.astype(np.int64) - fingerprint.histogram.astype(np.int64)).sum(axis=1)
+        rank = distances * (12 * 255 + 1) + spread
+        if len(rank) > needed:
+            # Only the best ranks (one may be excluded) need a full sort
+            best = np.flatnonzero(rank <= np.partition(rank, needed - 1)[needed - 1])
+            keys, rank = keys[best], rank[best]
+            distances = distances[best]
+        results = []
+        for i in np.lexsort((keys, rank)):
+            key = keys[i].decode("utf-8")
+            if key != exclude:
+                results.append((key, int(distances[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    def similar_to(self, key: str, radius: Optional[int] = None, k: int = 10) -> List[Tuple[str, int]]:
+        """Patterns near an indexed one, excluding itself."""
+        fingerprint = self.get(key)
+        if fingerprint is None:
+            raise KeyError(key)
+        return self.search(fingerprint, radius, k, exclude=key)
+
+    def compact(self):
+        """Merge pending entries into a new memory-mapped segment."""
+        with self._lock, self._file_lock():
+            self._sync()
+            self._compact()
+
+    def _compact(self):
+        if not self._pending_keys:
+            return
+        keys = np.concatenate([
+            np.asarray(self._keys),
+            np.array([key.encode("utf-8") for key in self._pending_keys])
+        ])
+        all_codes = np.concatenate([np.asarray(self._codes)[np.asarray(self._entry_code)], self._pending_codes])
+        histograms = np.concatenate([np.asarray(self._histograms), self._pending_histograms])
+        groups = np.empty(len(self._keys), dtype=np.uint64)
+        groups[np.asarray(self._postings)] = self._posting_groups
+        groups = np.concatenate([groups, self._pending_groups])
+        order = np.argsort(keys, kind="stable")
+        keys, all_codes, histograms, groups = keys[order], all_codes[order], histograms[order], groups[order]
+
+        # Identical codes are stored once; entries point at them
+        rows = np.ascontiguousarray(all_codes).view([("low", "<u8"), ("high", "<u8")]).ravel()
+        unique, entry_code = np.unique(rows, return_inverse=True)
+        codes = unique.view("<u8").reshape(-1, 2)
+        chunk_keys = _chunk_keys(codes)
+        chunk_order = np.argsort(chunk_keys, axis=1, kind="stable")
+        # Each code's entries ordered by group, histogram, then key (the entry order)
+        postings = np.lexsort([np.arange(len(keys))] + [histograms[:, i] for i in reversed(range(12))]
+                              + [groups, entry_code])
+        posting_codes, posting_groups, posting_histograms = entry_code[postings], groups[postings], histograms[postings]
+        boundary = ((posting_codes[1:] != posting_codes[:-1]) | (posting_groups[1:] != posting_groups[:-1])
+                    | (posting_histograms[1:] != posting_histograms[:-1]).any(axis=1))
+        variant_start = np.flatnonzero(np.concatenate([[True], boundary]))
+        arrays = {
+            "keys": keys,
+            "entry_code": entry_code.astype(np.uint32),
+            "histograms": histograms,
+            "codes": codes,
+            "chunk_keys": np.take_along_axis(chunk_keys, chunk_order, axis=1).ravel(),
+            "chunk_order": chunk_order.astype(np.uint32).ravel(),
+            "postings": postings.astype(np.uint32),
+            "code_start": np.searchsorted(entry_code[postings], np.arange(len(codes) + 1)).astype(np.int64),
+            "posting_groups": posting_groups,
+            "variant_start": np.append(variant_start, len(postings)).astype(np.int64)
+        }
+        number = int(self._segment.split("-")[1]) + 1 if self._segment else 0
+        segment = f"segment-{number:06d}"
+        os.makedirs(self._path(segment), exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(self._path(segment), f"{name}.npy"), array)
+        previous = self._segment
+        atomic_write(self._path(CURRENT_FILENAME), segment.encode("utf-8"))
+        # Entries still in the log after a crash here are skipped on replay
+        atomic_write(self._path(PENDING_FILENAME), b"")
+        # Readers in other processes may still be opening the previous
+        # segment, so it is kept until the next compaction
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("segment-") and entry.name not in (segment, previous):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        self._load()
+
+_similarity_index: Optional[SimilarityIndex] = None
+_similarity_index_lock = threading.Lock()
+
+def get_similarity_index() -> SimilarityIndex:
+    """Return the process-wide similarity index under settings.EXPORTS_DIR."""
+    global _similarity_index
+    with _similarity_index_lock:
+        directory = os.path.join(settings.EXPORTS_DIR, "similarity")
+        if _similarity_index is None or _similarity_index.directory != directory:
+            _similarity_index = SimilarityIndex(directory)
+        return _similarity_index
+
+def index_templates(index: SimilarityIndex, templates: Iterable[Template]) -> int:
+    """Add templates as ``template:<name>`` entries; returns how many were new."""
+    return index.add_many((TEMPLATE_PREFIX + t.name, Fingerprint.from_template(t)) for t in templates)
+
+def index_exports(index: SimilarityIndex, directory: str, groups: Optional[Dict[str, str]] = None) -> int:
+    """Add rendered ``<render key>.mid`` files not indexed yet; returns how many were new.
+
+    Each export is added to ``groups[key]`` (the dedup group of the project
+    rendering it) so dedup can match it; others go to the default group.
+    """
+    groups = groups or {}
+    items: Dict[str, List[Tuple[str, Fingerprint]]] = {}
+    for entry in os.scandir(directory) if os.path.isdir(directory) else []:
+        key = entry.name[:-len(".mid")]
+        if not entry.name.endswith(".mid") or key in index:
+            continue
+        try:
+            fingerprint = Fingerprint.from_pretty_midi(pretty_midi.PrettyMIDI(entry.path))
+        except Exception:
+            continue  # Partially written or corrupt; picked up again next time
+        items.setdefault(groups.get(key, ""), []).append((key, fingerprint))
+    return sum(index.add_many(group_items, group) for group, group_items in items.items())
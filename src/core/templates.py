@@ -0,0 +1,324 @@
+import io
+import json
+import os
+import threading
+import zipfile
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.core.config import get_lookups, settings
+from src.core.patterns import GRID_STEPS, CompiledGenre, PatternError, compile_chords, compile_hits
+from src.core.project_store import atomic_write
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+CACHE_FILENAME = ".catalog.npz"
+CACHE_VERSION = 1
+TEMPLATE_FIELDS = {"name", "genre", "tags", "bpm", "steps", "drums", "chords"}
+HIT_COLUMNS = ("step", "pitch", "duration", "velocity", "offset")
+
+class TemplateError(PatternError):
+    """Raised when a template file cannot be read or fails validation."""
+
+class Template(CompiledGenre):
+    """A compiled groove template from the template library.
+
+    Besides the drum and chord arrays of ``CompiledGenre`` it carries
+    catalog metadata: ``genre``, ``tags``, the inclusive ``bpm_range`` it
+    suits, its grid length in ``steps`` and the ``source`` file it came
+    from (relative to the library directory). ``chord_pitches`` is empty
+    when the template defines no chords.
+    """
+
+    def __init__(self, name: str, genre: str, tags: List[str], bpm_range: Tuple[int, int], steps: int,
+                 source: str, hits: Tuple[np.ndarray, ...], chord_pitches: np.ndarray):
+        step, pitch, duration, velocity, offset = hits
+        super().__init__(name, step, pitch, duration, chord_pitches, velocity, offset)
+        self.genre = genre
+        self.tags = tags
+        self.bpm_range = bpm_range
+        self.steps = steps
+        self.source = source
+
+    def to_dict(self) -> Dict:
+        """Catalog metadata, as stored in the cache and served by the API."""
+        return {
+            "name": self.name,
+            "genre": self.genre,
+            "tags": self.tags,
+            "bpm": list(self.bpm_range),
+            "steps": self.steps,
+            "source": self.source,
+            "chords": self.chord_pitches.tolist() if self.chord_pitches.size else []
+        }
+
+def _read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+def _read_yaml(path: str) -> Any:
+    if yaml is None:
+        raise TemplateError("PyYAML is required to read YAML templates")
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def _read_midi_clip(path: str) -> Any:
+    # Imported lazily: the groove importer builds on this module
+    from src.core.grooves import groove_template
+    return groove_template(path)
+
+# Template readers by file extension; each returns the parsed document
+TEMPLATE_READERS: Dict[str, Callable[[str], Any]] = {
+    ".json": _read_json,
+    ".yaml": _read_yaml,
+    ".yml": _read_yaml,
+    ".mid": _read_midi_clip,
+    ".midi": _read_midi_clip
+}
+
+def _bpm_range(name: str, genre: str, bpm: Any) -> Tuple[int, int]:
+    if bpm is None:
+        return get_lookups().bpm_ranges.get(genre, (settings.DEFAULT_TEMPO, settings.DEFAULT_TEMPO))
+    bounds = [bpm, bpm] if not isinstance(bpm, list) else bpm
+    if len(bounds) != 2 or not all(type(b) is int for b in bounds) or not 0 < bounds[0] <= bounds[1]:
+        raise TemplateError(f"{name}: bpm must be a positive integer or a [low, high] range, got {bpm!r}")
+    return bounds[0], bounds[1]
+
+def compile_template(entry: Any, source: str, default_name: str) -> Template:
+    """Validate one template definition against the schema and compile it.
+
+    Schema (``genre`` and ``drums`` are required)::
+
+        name: deep-house-01        # defaults to the file name
+        genre: house
+        tags: [deep, classic]
+        bpm: [120, 126]            # or one BPM; defaults to the genre's range
+        steps: 32                  # grid length, a whole number of bars; default 16
+        drums:                     # hits are [step, beats, velocity?, offset?]
+          kick: [[0, 1], [4, 1, 110], [8, 1], [12, 1, 100, -0.1]]
+        chords: [[C2, E2, G2], [G2, B2, D3]]
+    """
+    if not isinstance(entry, dict):
+        raise TemplateError(f"{default_name}: a template must be a mapping, got {type(entry).__name__}")
+    unknown = set(entry) - TEMPLATE_FIELDS
+    if unknown:
+        raise TemplateError(f"{default_name}: unknown fields {sorted(unknown)}")
+    name = entry.get("name", default_name)
+    genre = entry.get("genre")
+    tags = entry.get("tags", [])
+    steps = entry.get("steps", GRID_STEPS)
+    drums = entry.get("drums")
+    if not isinstance(name, str) or not name:
+        raise TemplateError(f"{default_name}: name must be a non-empty string")
+    if not isinstance(genre, str) or not genre:
+        raise TemplateError(f"{name}: genre must be a non-empty string")
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise TemplateError(f"{name}: tags must be a list of strings")
+    if not isinstance(steps, int) or steps <= 0 or steps % GRID_STEPS:
+        raise TemplateError(f"{name}: steps must be a positive multiple of {GRID_STEPS}, got {steps!r}")
+    if not isinstance(drums, dict) or not drums:
+        raise TemplateError(f"{name}: drums must be a non-empty mapping of drum to hits")
+    try:
+        hits = compile_hits(name, drums, steps)
+        chords = entry.get("chords")
+        chord_pitches = (compile_chords(name, chords, get_lookups().note_pitches) if chords is not None
+                         else np.empty((0, 0), dtype=np.int64))
+    except (PatternError, TypeError) as e:
+        raise TemplateError(str(e)) from None
+    return Template(name, genre, tags, _bpm_range(name, genre, entry.get("bpm")), steps, source, hits, chord_pitches)
+
+def load_template_file(path: str, source: Optional[str] = None) -> List[Template]:
+    """Parse a template file holding one template or a ``templates`` list."""
+    source = source or os.path.basename(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    reader = TEMPLATE_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise TemplateError(f"{source}: unsupported template format")
+    try:
+        data = reader(path)
+    except Exception as e:
+        raise TemplateError(f"{source}: {e}") from None
+    if isinstance(data, dict) and "templates" in data:
+        entries = data["templates"]
+        if not isinstance(entries, list):
+            raise TemplateError(f"{source}: templates must be a list")
+        return [compile_template(entry, source, f"{stem}-{i}") for i, entry in enumerate(entries)]
+    return [compile_template(data, source, stem)]
+
+class TemplateLibrary:
+    """Groove templates loaded from a directory tree, with an indexed catalog.
+
+    Every ``.json``/``.yaml`` file under ``directory`` holds one template or
+    a ``templates`` list; ``.mid`` drum loops are read as one template each
+    (see ``grooves.groove_template``), with their directory as the genre.
+    Compiled templates are stored in a binary cache (``CACHE_FILENAME`` in
+    the directory) together with each source's mtime and size, so a load
+    only parses files that changed since the cache was written, and none
+    at all when nothing changed. Files that fail validation are skipped
+    and reported in ``errors``.
+
+    Lookups by name, genre, tag and BPM are dict lookups into indexes built
+    once per load.
+    """
+
+    def __init__(self, directory: str, cache_path: Optional[str] = None):
+        self.directory = directory
+        self.cache_path = cache_path or os.path.join(directory, CACHE_FILENAME)
+        self.templates: List[Template] = []
+        self.errors: Dict[str, str] = {}
+        self.parsed_files = 0
+        self._sources: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Supported source files, relative to the directory, with (mtime_ns, size)."""
+        found = {}
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for filename in files:
+                if filename.startswith(".") or os.path.splitext(filename)[1].lower() not in TEMPLATE_READERS:
+                    continue
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                found[os.path.relpath(path, self.directory)] = (stat.st_mtime_ns, stat.st_size)
+        return dict(sorted(found.items()))
+
+    def refresh(self) -> bool:
+        """Pick up added, changed and removed sources; returns whether anything changed."""
+        with self._lock:
+            fingerprints = self._scan()
+            loaded = self._sources is not None
+            if not loaded:
+                self._sources = self._read_cache()
+            unchanged = {k: (v["mtime_ns"], v["size"]) for k, v in self._sources.items()} == fingerprints
+            if loaded and unchanged:
+                return False
+            sources, parsed = {}, 0
+            for source, (mtime_ns, size) in fingerprints.items():
+                previous = self._sources.get(source)
+                if previous is not None and (previous["mtime_ns"], previous["size"]) == (mtime_ns, size):
+                    sources[source] = previous
+                    continue
+                parsed += 1
+                record = {"mtime_ns": mtime_ns, "size": size, "error": None, "templates": []}
+                try:
+                    record["templates"] = load_template_file(os.path.join(self.directory, source), source)
+                except TemplateError as e:
+                    record["error"] = str(e)
+                sources[source] = record
+            changed = not unchanged
+            self._sources = sources
+            self.parsed_files = parsed
+            self._build_index()
+            if changed:
+                self._write_cache()
+            return changed
+
+    def _build_index(self):
+        self.templates = []
+        self.errors = {}
+        self._by_name: Dict[str, Template] = {}
+        self._by_genre: Dict[str, List[Template]] = {}
+        self._by_tag: Dict[str, List[Template]] = {}
+        self._by_bpm: Dict[int, List[Template]] = {}
+        for source, record in self._sources.items():
+            if record["error"] is not None:
+                self.errors[source] = record["error"]
+            for template in record["templates"]:
+                if template.name in self._by_name:
+                    self.errors[source] = f"{template.name}: duplicate template name"
+                    continue
+                self.templates.append(template)
+                self._by_name[template.name] = template
+                self._by_genre.setdefault(template.genre, []).append(template)
+                for tag in template.tags:
+                    self._by_tag.setdefault(tag, []).append(template)
+                low, high = template.bpm_range
+                for bpm in range(low, high + 1):
+                    self._by_bpm.setdefault(bpm, []).append(template)
+
+    def get(self, name: str) -> Optional[Template]:
+        return self._by_name.get(name)
+
+    def genres(self) -> List[str]:
+        return sorted(self._by_genre)
+
+    def find(self, genre: Optional[str] = None, tag: Optional[str] = None,
+             bpm: Optional[int] = None) -> List[Template]:
+        """Templates matching every given criterion, in catalog order."""
+        candidates = [
+            index.get(key, []) for index, key in
+            ((self._by_genre, genre), (self._by_tag, tag), (self._by_bpm, bpm)) if key is not None
+        ]
+        if not candidates:
+            return list(self.templates)
+        candidates.sort(key=len)
+        others = [set(map(id, c)) for c in candidates[1:]]
+        return [t for t in candidates[0] if all(id(t) in other for other in others)]
+
+    def _read_cache(self) -> Dict[str, Dict]:
+        """Per-source records from the binary cache, or nothing if it is missing or stale."""
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as cache:
+                meta = json.loads(cache["meta"].tobytes())
+                if meta.get("version") != CACHE_VERSION:
+                    return {}
+                bounds = cache["hit_bounds"]
+                columns = [cache[column] for column in HIT_COLUMNS]
+            templates = []
+            for n, entry in enumerate(meta["templates"]):
+                hits = tuple(column[bounds[n]:bounds[n + 1]] for column in columns)
+                chords = np.array(entry["chords"] or np.empty((0, 0)), dtype=np.int64)
+                templates.append(Template(entry["name"], entry["genre"], entry["tags"], tuple(entry["bpm"]),
+                                          entry["steps"], entry["source"], hits, chords))
+            return {
+                source: dict(record, templates=[templates[n] for n in record["templates"]])
+                for source, record in meta["sources"].items()
+            }
+        except (OSError, ValueError, KeyError, IndexError, zipfile.BadZipFile):
+            return {}
+
+    def _write_cache(self):
+        """Store every compiled template as one set of concatenated columns."""
+        templates, sources = [], {}
+        for source, record in self._sources.items():
+            start = len(templates)
+            templates += record["templates"]
+            sources[source] = dict(record, templates=list(range(start, len(templates))))
+        meta = {"version": CACHE_VERSION, "sources": sources, "templates": [t.to_dict() for t in templates]}
+        bounds = np.cumsum([0] + [t.drum_count for t in templates])
+        columns = {
+            column: np.concatenate([getattr(t, f"drum_{column}") for t in templates])
+            if templates else np.empty(0) for column in HIT_COLUMNS
+        }
+        buffer = io.BytesIO()
+        np.savez(buffer, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+                 hit_bounds=bounds, **columns)
+        try:
+            atomic_write(self.cache_path, buffer.getvalue())
+        except OSError:
+            pass  # A read-only library still works, it just reparses on the next start
+
+_template_library: Optional[TemplateLibrary] = None
+_template_library_lock = threading.Lock()
+
+def get_template_library(refresh: bool = False) -> TemplateLibrary:
+    """Return the process-wide template library under settings.TEMPLATES_DIR.
+
+    The library is loaded on first use; pass ``refresh=True`` to pick up
+    template files changed since.
+    """
+    global _template_library
+    with _template_library_lock:
+        directory = settings.TEMPLATES_DIR
+        if _template_library is None or _template_library.directory != directory:
+            _template_library = TemplateLibrary(directory)
+        elif refresh:
+            _template_library.refresh()
+        return _template_library
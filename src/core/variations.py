@@ -0,0 +1,61 @@
+import numpy as np
+from typing import List
+from src.core.note_store import NoteTrack
+
+TOM = 45
+VELOCITY_JITTER = 10
+THIN_KEEP_PROBABILITY = 0.5
+
+def _copy_track(track: NoteTrack, pitch=None, velocity=None, start=None, end=None) -> NoteTrack:
+    """Build a track over the source arrays, replacing only the given columns."""
+    derived = NoteTrack(program=track.program, is_drum=track.is_drum, name=track.name)
+    derived.add_notes(
+        track.pitch if pitch is None else pitch,
+        track.velocity if velocity is None else velocity,
+        track.start if start is None else start,
+        track.end if end is None else end,
+    )
+    return derived
+
+def jitter_velocity(track: NoteTrack, rng: np.random.Generator, amount: int = VELOCITY_JITTER) -> NoteTrack:
+    """Randomly humanize velocities, sharing pitch and timing arrays."""
+    jitter = rng.integers(-amount, amount + 1, size=len(track))
+    velocity = np.clip(track.velocity.astype(np.int16) + jitter, 1, 127)
+    return _copy_track(track, velocity=velocity)
+
+def thin_offbeats(track: NoteTrack, rng: np.random.Generator, beat: float,
+                  keep_probability: float = THIN_KEEP_PROBABILITY) -> NoteTrack:
+    """Drop a random share of the notes that do not fall on a beat."""
+    on_beat = np.isclose(np.mod(track.start, beat), 0.0)
+    keep = on_beat | (rng.random(len(track)) < keep_probability)
+    return _copy_track(
+        track, pitch=track.pitch[keep], velocity=track.velocity[keep],
+        start=track.start[keep], end=track.end[keep]
+    )
+
+def add_fill(track: NoteTrack, section_length: float, step: float, n_steps: int = 4) -> NoteTrack:
+    """Append a rising tom fill over the last ``n_steps`` grid steps."""
+    start = section_length - step * np.arange(n_steps, 0, -1)
+    velocity = np.linspace(80, 120, n_steps).astype(np.uint8)
+    filled = _copy_track(track)
+    filled.add_notes(TOM, velocity, start, start + step * 0.8)
+    return filled
+
+def derive_variation(base: List[NoteTrack], index: int, rng: np.random.Generator,
+                     section_length: float, step: float) -> List[NoteTrack]:
+    """Derive variation ``index`` (1-based) from a base section's tracks.
+
+    Every track gets velocity jitter; drum tracks additionally alternate
+    between a fill (odd variations) and thinned-out off-beats (even ones).
+    Pitch and timing arrays are shared with the base wherever unchanged, so
+    a variation costs one pass over the base notes.
+    """
+    derived = []
+    for track in base:
+        if track.is_drum:
+            if index % 2:
+                track = add_fill(track, section_length, step)
+            else:
+                track = thin_offbeats(track, rng, beat=4 * step)
+        derived.append(jitter_velocity(track, rng))
+    return derived
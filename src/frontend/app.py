@@ -10,16 +10,17 @@ if src_path not in sys.path:
     sys.path.append(src_path)
 
 try:
-    from src.core.config import Settings
-    from src.core.model import GenrePatternGenerator
+    from src.core.config import get_lookups, get_settings
+    from src.core.model_registry import get_model_registry
     from src.core.data_processor import DataProcessor
 except ImportError as e:
     st.error(f"Error importing modules: {e}")
     st.stop()
 
-# Initialize settings
+# Settings are loaded once per process and shared across reruns
 try:
-    settings = Settings()
+    settings = get_settings()
+    lookups = get_lookups()
 except Exception as e:
     st.error(f"Error initializing settings: {e}")
     st.stop()
@@ -72,9 +73,9 @@ with st.sidebar:
         
         bpm = st.slider(
             "BPM",
-            min_value=settings.BPM_RANGES[genre][0],
-            max_value=settings.BPM_RANGES[genre][1],
-            value=(settings.BPM_RANGES[genre][0] + settings.BPM_RANGES[genre][1]) // 2
+            min_value=lookups.bpm_ranges[genre][0],
+            max_value=lookups.bpm_ranges[genre][1],
+            value=lookups.default_bpm[genre]
         )
         
         pattern_length = st.slider(
@@ -95,12 +96,11 @@ with col1:
     st.header("Pattern Preview")
     
     try:
-        # Initialize pattern generator
-        generator = GenrePatternGenerator()
-        
         if st.button("Generate Pattern"):
             with st.spinner("Generating pattern..."):
                 try:
+                    # Loaded once per process and shared by every session
+                    generator = get_model_registry().get()
                     pattern = generator.generate_pattern(genre, pattern_length)
                     
                     # Display pattern visualization
@@ -124,7 +124,7 @@ with col2:
     try:
         # Display genre-specific information
         st.write(f"### {genre.capitalize()} Characteristics")
-        st.write(f"**BPM Range:** {settings.BPM_RANGES[genre][0]} - {settings.BPM_RANGES[genre][1]}")
+        st.write(f"**BPM Range:** {lookups.bpm_ranges[genre][0]} - {lookups.bpm_ranges[genre][1]}")
         
         st.write("### Common Patterns")
         for drum_type, patterns in settings.GENRE_PATTERNS[genre].items():
@@ -1,15 +1,25 @@
-import tensorflow as tf
 import numpy as np
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict
+
+if TYPE_CHECKING:
+    import tensorflow as tf
 
 class PatternGenerator:
     def __init__(self, sequence_length: int = 32, n_features: int = 128):
         self.sequence_length = sequence_length
         self.n_features = n_features
-        self.model = self._build_model()
+        self._model = None
+        
+    @property
+    def model(self) -> 'tf.keras.Model':
+        """The LSTM model, built (and TensorFlow imported) on first access."""
+        if self._model is None:
+            self._model = self._build_model()
+        return self._model
         
-    def _build_model(self) -> tf.keras.Model:
+    def _build_model(self) -> 'tf.keras.Model':
         """Build the LSTM model for pattern generation."""
+        import tensorflow as tf
         model = tf.keras.Sequential([
             tf.keras.layers.LSTM(256, return_sequences=True, input_shape=(self.sequence_length, self.n_features)),
             tf.keras.layers.Dropout(0.2),
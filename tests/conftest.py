@@ -0,0 +1,9 @@
+import pytest
+from src.core.config import settings
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Point project and export storage at a temporary directory."""
+    monkeypatch.setattr(settings, "PROJECTS_DIR", str(tmp_path / "projects"))
+    monkeypatch.setattr(settings, "EXPORTS_DIR", str(tmp_path / "exports"))
+    return tmp_path
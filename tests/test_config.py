@@ -1,4 +1,7 @@
-from src.core.config import Settings
+import os
+import subprocess
+import sys
+from src.core.config import Settings, get_lookups, get_settings, settings
 
 def test_settings_initialization():
     """Test that settings can be initialized correctly."""
@@ -23,4 +26,41 @@ def test_genre_patterns():
     house_patterns = settings.GENRE_PATTERNS['house']
     assert 'kick' in house_patterns
     assert 'snare' in house_patterns
-    assert 'hihat' in house_patterns 
\ No newline at end of file
+    assert 'hihat' in house_patterns
+
+def test_settings_are_cached_and_shared():
+    """Test that get_settings returns one instance behind the module-level settings."""
+    assert get_settings() is get_settings()
+    assert settings.DEFAULT_TEMPO == get_settings().DEFAULT_TEMPO
+    assert settings.SCENARIOS["loop_based"]["sections"][0] == "main_loop"
+
+def test_import_has_no_side_effects(tmp_path):
+    """Test that importing the config module creates no directories."""
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run(
+        [sys.executable, "-c", "import src.core.config"],
+        cwd=tmp_path, env=dict(os.environ, PYTHONPATH=repo_root), check=True
+    )
+    assert os.listdir(tmp_path) == []
+
+def test_core_imports_do_not_load_settings(tmp_path):
+    """Test that importing the core modules leaves the settings unloaded."""
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "from src.core.config import get_settings\n"
+        "import src.core.midi_generator, src.core.project_manager, src.core.data_processor\n"
+        "print(get_settings.cache_info().currsize)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True,
+        cwd=tmp_path, env=dict(os.environ, PYTHONPATH=repo_root), check=True
+    )
+    assert result.stdout.strip() == "0"
+
+def test_lookup_tables():
+    """Test the precomputed note and BPM tables."""
+    lookups = get_lookups()
+    assert lookups.note_pitches["C4"] == 60
+    assert lookups.note_pitches["C-1"] == 0 and lookups.note_pitches["G9"] == 127
+    assert lookups.note_pitches["Bb2"] == lookups.note_pitches["A#2"] == 46
+    assert lookups.default_bpm["dubstep"] == 145
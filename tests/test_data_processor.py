@@ -0,0 +1,153 @@
+import json
+import os
+import numpy as np
+import pretty_midi
+from src.core.config import settings
+from src.core.data_processor import MANIFEST_FILENAME, DataProcessor, WindowedDataset, read_manifest
+
+def _midi(notes, tempo=120.0, program=0):
+    midi = pretty_midi.PrettyMIDI(initial_tempo=tempo)
+    instrument = pretty_midi.Instrument(program=program)
+    for pitch, velocity, start, end in notes:
+        instrument.notes.append(pretty_midi.Note(velocity=velocity, pitch=pitch, start=start, end=end))
+    midi.instruments.append(instrument)
+    return midi
+
+def test_note_features():
+    """Test per-note features: sorted by start, in beats, normalized and clipped."""
+    midi = _midi([(64, 100, 1.0, 1.5), (60, 127, 0.0, 0.5), (67, 50, 1.0, 20.0)], tempo=120.0)
+    features = DataProcessor().extract_note_features(midi)
+    assert settings.NOTE_FEATURES == ['pitch', 'velocity', 'duration', 'time_since_last']
+    expected = np.array([
+        [60 / 127, 127 / 127, 1.0 / 4.0, 0.0],
+        [64 / 127, 100 / 127, 1.0 / 4.0, 2.0 / 4.0],
+        [67 / 127, 50 / 127, 1.0, 0.0],  # Duration clipped; starts with the previous note
+    ])
+    np.testing.assert_allclose(features, expected)
+
+def test_features_merge_instruments_and_respect_tempo():
+    """Test that notes from every instrument are interleaved and timed at the file tempo."""
+    midi = _midi([(60, 100, 0.0, 0.25)], tempo=60.0)
+    midi.instruments += _midi([(36, 100, 0.5, 0.75)], program=32).instruments
+    features = DataProcessor().extract_note_features(midi)
+    np.testing.assert_allclose(features[:, 0] * 127, [60, 36])
+    np.testing.assert_allclose(features[:, 3], [0.0, 0.5 / 4.0])
+
+def test_extract_features_is_padded_to_sequence_length():
+    """Test that the fixed-size matrix truncates or zero-pads the note rows."""
+    processor = DataProcessor()
+    short = processor.extract_features(_midi([(60, 100, 0.0, 0.5)]))
+    assert short.shape == (settings.SEQUENCE_LENGTH, settings.N_FEATURES)
+    assert np.all(short[1:] == 0)
+    notes = [(60, 100, i * 0.25, i * 0.25 + 0.2) for i in range(settings.SEQUENCE_LENGTH * 2)]
+    long = processor.extract_features(_midi(notes))
+    np.testing.assert_allclose(long, processor.extract_note_features(_midi(notes))[:settings.SEQUENCE_LENGTH])
+    empty = processor.extract_features(pretty_midi.PrettyMIDI())
+    assert not empty.any()
+
+def _dataset(tmp_path, n_files=5):
+    dataset = tmp_path / "dataset"
+    dataset.mkdir()
+    metadata = []
+    for i in range(n_files):
+        notes = [(30 + j, 20 + 20 * i, j * 0.5, j * 0.5 + 0.25) for j in range(10 * (i + 1))]
+        _midi(notes).write(str(dataset / f"{i}.mid"))
+        metadata.append({"file": f"{i}.mid", "genre": "reggae" if i % 2 else "edm"})
+    (dataset / "broken.mid").write_bytes(b"not midi")
+    metadata.append({"file": "broken.mid", "genre": "edm"})
+    (dataset / "metadata.json").write_text(json.dumps(metadata))
+    return dataset
+
+def test_process_dataset_shards_match_direct_extraction(tmp_path):
+    """Test that the sharded pipeline returns the same features as processing in-process."""
+    dataset = _dataset(tmp_path)
+    processor = DataProcessor()
+    for workers in (1, 2):
+        output_dir = tmp_path / f"processed-{workers}"
+        X, y = processor.process_dataset(str(dataset), output_dir=str(output_dir), max_workers=workers, shard_size=2)
+        expected = [processor.extract_features(pretty_midi.PrettyMIDI(str(dataset / f"{i}.mid"))) for i in range(5)]
+        np.testing.assert_allclose(X, np.array(expected), rtol=1e-6)
+        assert y.tolist() == ["edm", "reggae", "edm", "reggae", "edm"]
+        assert sorted(os.listdir(output_dir)) == [MANIFEST_FILENAME, "shard-00000.npy", "shard-00001.npy", "shard-00002.npy"]
+        assert read_manifest(str(output_dir))["broken.mid"]["error"]
+
+def test_unreadable_files_are_reported_through_the_manifest(tmp_path, capsys):
+    """Test that read errors are recorded per file and fail the CLI, without printing to stdout."""
+    from src.cli import main
+    dataset = _dataset(tmp_path, n_files=1)
+    metadata = json.loads((dataset / "metadata.json").read_text())
+    (dataset / "metadata.json").write_text(json.dumps(metadata + [{"file": "missing.mid", "genre": "edm"}]))
+    output_dir = str(tmp_path / "processed")
+    assert main(["preprocess", str(dataset), "--output", output_dir, "--workers", "1"]) == 1
+    manifest = read_manifest(output_dir)
+    assert "FileNotFoundError" in manifest["missing.mid"]["error"]
+    assert isinstance(manifest["broken.mid"]["error"], str) and not manifest["0.mid"].get("error")
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert f"Error processing missing.mid: {manifest['missing.mid']['error']}" in err
+
+def test_preprocess_resumes_and_skips_unchanged_files(tmp_path):
+    """Test that reruns only process new or modified files."""
+    dataset = _dataset(tmp_path)
+    output_dir = str(tmp_path / "processed")
+    processor = DataProcessor()
+    calls = []
+    progress = lambda done, total: calls.append((done, total))
+    processor.preprocess_dataset(str(dataset), output_dir=output_dir, max_workers=1, shard_size=2)
+    
+    # An interrupted append leaves a torn last line, which is ignored
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), 'a') as f:
+        f.write('[{"file": "0.mid"')
+    processor.preprocess_dataset(str(dataset), output_dir=output_dir, max_workers=1, progress=progress)
+    assert calls == []
+    
+    # Touched but identical files are re-hashed, not re-featurized
+    before = read_manifest(output_dir)
+    os.utime(dataset / "1.mid", ns=(0, 0))
+    _midi([(72, 90, 0.0, 1.0)]).write(str(dataset / "3.mid"))
+    manifest = processor.preprocess_dataset(str(dataset), output_dir=output_dir, max_workers=1, progress=progress)
+    assert calls == [(2, 2)]
+    assert manifest["1.mid"]["shard"] == before["1.mid"]["shard"] and manifest["1.mid"]["mtime_ns"] == 0
+    assert manifest["3.mid"]["shard"] == 3 and manifest["3.mid"]["length"] == 1
+    assert read_manifest(output_dir) == manifest
+
+def test_sequence_windows_are_views(tmp_path):
+    """Test that sequences are zero-copy windows of memory-mapped data."""
+    processor = DataProcessor()
+    X = np.arange(100 * 4, dtype=np.float32).reshape(100, 4)
+    y = np.arange(100)
+    processor.save_processed_data(X, y, str(tmp_path / "train"))
+    X_loaded, y_loaded = processor.load_processed_data(str(tmp_path / "train"))
+    assert isinstance(X_loaded, np.memmap)
+    sequences, labels = processor.create_sequence_dataset(X_loaded, y_loaded)
+    L = settings.SEQUENCE_LENGTH
+    assert sequences.shape == (100 - L, L, 4) and labels.shape == (100 - L,)
+    assert np.shares_memory(sequences, X_loaded)
+    np.testing.assert_array_equal(sequences[5], X[5:5 + L])
+    assert labels[5] == y[5 + L]
+    assert processor.create_sequence_dataset(X[:L], y[:L])[0].shape == (0, L, 4)
+
+def test_windowed_dataset_batches(tmp_path):
+    """Test that shuffled mini-batches cover every in-file window exactly once."""
+    dataset = _dataset(tmp_path)
+    output_dir = str(tmp_path / "processed")
+    processor = DataProcessor()
+    manifest = processor.preprocess_dataset(str(dataset), output_dir=output_dir, max_workers=1, shard_size=2)
+    windows = WindowedDataset.from_shards(output_dir, sequence_length=8, seed=0)
+    # Files have 10, 20, ... 50 notes; windows never cross file boundaries
+    assert len(windows) == sum(10 * (i + 1) - 8 for i in range(5))
+    
+    seen = []
+    for batch, genres, targets in windows.batches(batch_size=16):
+        assert batch.shape[1:] == (8, 4) and len(batch) == len(genres) == len(targets) <= 16
+        seen += [tuple(w.ravel()) + tuple(t) for w, t in zip(batch, targets)]
+    assert len(set(seen)) == len(windows)
+    
+    # Window i of a file is its notes i..i+7 followed by note i+8
+    record = manifest["2.mid"]
+    notes = processor.extract_note_features(pretty_midi.PrettyMIDI(str(dataset / "2.mid")))
+    first = windows._first[2]  # Samples are numbered file by file, in manifest order
+    batch, genres, targets = windows.take([first + 3])
+    np.testing.assert_allclose(batch[0], notes[3:11], rtol=1e-6)
+    np.testing.assert_allclose(targets[0], notes[11], rtol=1e-6)
+    assert genres[0] == "edm" and record["length"] == len(notes)
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import pretty_midi
+import pytest
+from src.core import grooves
+from src.core.config import settings
+from src.core.grooves import groove_template, import_grooves, quantize_drums
+from src.core.midi_generator import MIDIGenerator
+from src.core.templates import TemplateError, TemplateLibrary
+
+def _loop(tempo=100.0):
+    """A one-bar drum loop with a late snare, a doubled kick and a ride."""
+    midi = pretty_midi.PrettyMIDI(initial_tempo=tempo)
+    drums = pretty_midi.Instrument(program=0, is_drum=True)
+    step = 60.0 / tempo / 4
+    for s, pitch, velocity, shift in [(0, 36, 100, 0.0), (0, 35, 120, 0.0), (8, 36, 90, 0.0),
+                                      (4, 38, 110, 0.2), (12, 38, 105, -0.1), (2, 51, 80, 0.0)]:
+        start = (s + shift) * step
+        drums.notes.append(pretty_midi.Note(velocity, pitch, start, start + step))
+    bass = pretty_midi.Instrument(program=32)
+    bass.notes.append(pretty_midi.Note(100, 36, 0.0, 1.0))
+    midi.instruments += [drums, bass]
+    return midi
+
+def test_quantize_drums_extracts_grid_and_micro_timing():
+    """Test onsets snap to the 16th grid and keep their timing offsets."""
+    steps, drums = quantize_drums(_loop())
+    assert steps == 16
+    assert list(drums) == ['kick', 'snare']
+    assert drums['kick']['step'].tolist() == [0, 8]
+    assert drums['kick']['velocity'].tolist() == [120, 90]
+    assert drums['snare']['step'].tolist() == [4, 12]
+    np.testing.assert_allclose(drums['snare']['offset'], [0.2, -0.1], atol=0.01)
+    np.testing.assert_allclose(drums['snare']['duration'], 0.25, atol=0.01)
+
+def test_quantize_drums_without_drums_fails():
+    """Test that a file without General MIDI drum hits is rejected."""
+    midi = pretty_midi.PrettyMIDI()
+    midi.instruments.append(pretty_midi.Instrument(program=0))
+    with pytest.raises(TemplateError):
+        quantize_drums(midi)
+
+def test_import_grooves_writes_playable_templates(tmp_path, monkeypatch):
+    """Test a parallel batch import into the template library."""
+    monkeypatch.setattr(settings, "TEMPLATES_DIR", str(tmp_path / "templates"))
+    source = tmp_path / "loops" / "house"
+    os.makedirs(source)
+    for n in range(3):
+        _loop(tempo=100.0 + n).write(str(source / f"loop{n}.mid"))
+    (source / "broken.mid").write_bytes(b"not midi")
+    progress = []
+    report = import_grooves([str(tmp_path / "loops")], max_workers=2, chunk_size=2,
+                            progress=lambda done, total: progress.append((done, total)))
+    assert sorted(report["templates"]) == ["house-loop0", "house-loop1", "house-loop2"]
+    assert list(report["failed"]) == [str(source / "broken.mid")]
+    assert report["files_per_sec"] > 0
+    assert progress[-1] == (4, 4)
+    assert os.path.exists(tmp_path / "templates" / "imported" / "house" / "house-loop1.json")
+    
+    track = MIDIGenerator(seed=1).create_drum_pattern("house", template="house-loop0").tracks[0]
+    snares = track.start[track.pitch == 38]
+    np.testing.assert_allclose(snares, [(4 + 0.2) * 0.25, (12 - 0.1) * 0.25], atol=0.01)
+
+def test_import_grooves_reports_per_file_errors(tmp_path, monkeypatch):
+    """Test that parser errors and template name collisions fail single files."""
+    monkeypatch.setattr(settings, "TEMPLATES_DIR", str(tmp_path / "templates"))
+    for kit in ("a", "b"):
+        os.makedirs(tmp_path / "loops" / kit)
+        _loop().write(str(tmp_path / "loops" / kit / "loop.mid"))
+    _loop().write(str(tmp_path / "loops" / "a" / "fill.mid"))
+    report = import_grooves([str(tmp_path / "loops")], genre="house", max_workers=1)
+    first, second = str(tmp_path / "loops" / "a" / "loop.mid"), str(tmp_path / "loops" / "b" / "loop.mid")
+    assert sorted(report["templates"]) == ["house-fill", "house-loop"]
+    assert report["failed"] == {second: f"template 'house-loop' is already imported from {first}"}
+    
+    def truncated(midi, max_bars=4):
+        raise EOFError("truncated track")
+    monkeypatch.setattr(grooves, "quantize_drums", truncated)
+    report = import_grooves([str(tmp_path / "loops" / "a")], max_workers=1)
+    assert report["templates"] == []
+    assert set(report["failed"].values()) == {"EOFError: truncated track"}
+
+def test_library_reads_midi_clips(tmp_path):
+    """Test that .mid loops in the template directory load as templates."""
+    os.makedirs(tmp_path / "techno")
+    _loop(tempo=130.0).write(str(tmp_path / "techno" / "clip.mid"))
+    library = TemplateLibrary(str(tmp_path))
+    template = library.get("techno-clip")
+    assert template.genre == "techno" and template.bpm_range == (130, 130)
+    assert "imported" in template.tags
+    assert groove_template(str(tmp_path / "techno" / "clip.mid"))["steps"] == 16
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_entry_points_do_not_import_tensorflow(tmp_path):
+    """Test that TensorFlow is only imported once a neural model is actually used."""
+    code = (
+        "import sys\n"
+        "import src.api.app, src.core.model, src.core.model_registry, src.models.pattern_generator\n"
+        "from src.core.model import GenrePatternGenerator\n"
+        "from src.models.pattern_generator import PatternGenerator\n"
+        "GenrePatternGenerator()\n"
+        "PatternGenerator().generate_pattern('reggae', 32)\n"
+        "print('tensorflow' in sys.modules)\n"
+    )
+    # Run outside the repository so storage created on import lands in tmp_path
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True, cwd=tmp_path, env=env)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,139 @@
+import threading
+import time
+import pytest
+from src.core.config import settings
+from src.core.jobs import FAILED, SUCCEEDED, JobQueue, QueueFullError
+from src.core.project_manager import ProjectManager
+from src.core.similarity import get_similarity_index
+
+def test_job_runs_and_reports_result():
+    """Test that jobs run in the background and record their outcome."""
+    queue = JobQueue(max_workers=2, max_pending=4, history=8)
+    ok = queue.submit("a", "test", lambda: 42)
+    failing = queue.submit("b", "test", lambda: 1 / 0)
+    assert ok.wait(timeout=5) and failing.wait(timeout=5)
+    assert ok.status == SUCCEEDED and ok.result == 42
+    assert failing.status == FAILED and "ZeroDivisionError" in failing.error
+    assert queue.get(ok.id) is ok
+    queue.shutdown()
+
+def test_identical_in_flight_jobs_are_deduplicated():
+    """Test that a job with the same key is reused while it is in flight."""
+    queue = JobQueue(max_workers=1, max_pending=4, history=8)
+    release = threading.Event()
+    first = queue.submit("same", "test", release.wait)
+    assert queue.submit("same", "test", release.wait) is first
+    release.set()
+    first.wait(timeout=5)
+    assert queue.submit("same", "test", lambda: None) is not first
+    queue.shutdown()
+
+def test_full_queue_applies_backpressure():
+    """Test that submissions beyond max_pending are rejected."""
+    queue = JobQueue(max_workers=1, max_pending=2, history=8)
+    release = threading.Event()
+    jobs = [queue.submit(key, "test", release.wait) for key in ("a", "b")]
+    with pytest.raises(QueueFullError):
+        queue.submit("c", "test", release.wait)
+    release.set()
+    for job in jobs:
+        job.wait(timeout=5)
+    assert queue.pending == 0
+    queue.shutdown()
+
+def test_generate_endpoint_returns_job(storage, monkeypatch):
+    """Test the submit, poll and download flow of the generate endpoint."""
+    from src.api import app as api
+    manager = ProjectManager()
+    manager.create_project("song")
+    monkeypatch.setattr(api, "project_manager", manager)
+    client = api.app.test_client()
+
+    response = client.post("/api/projects/song/generate")
+    assert response.status_code == 202
+    job_id = response.json["id"]
+    assert response.headers["Location"] == f"/api/jobs/{job_id}"
+    assert api.get_job_queue().get(job_id).wait(timeout=10)
+
+    status = client.get(f"/api/jobs/{job_id}").json
+    assert status["status"] == SUCCEEDED
+    result = client.get(f"/api/jobs/{job_id}/result")
+    assert result.status_code == 200
+    assert result.data.startswith(b"MThd")
+    assert result.headers["ETag"] == f'"{status["result"]["etag"]}"'
+
+def test_similarity_index_is_compacted_in_the_background(storage, monkeypatch):
+    """Test that a render past SIMILARITY_MAX_PENDING queues a compaction job."""
+    from src.api import app as api
+    monkeypatch.setattr(settings, "SIMILARITY_MAX_PENDING", 1)
+    manager = ProjectManager()
+    manager.create_project("song")
+    monkeypatch.setattr(api, "project_manager", manager)
+    client = api.app.test_client()
+
+    job_id = client.post("/api/projects/song/generate").json["id"]
+    assert api.get_job_queue().get(job_id).wait(timeout=10)
+    index = get_similarity_index()
+    deadline = time.monotonic() + 10
+    while index.needs_compaction and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not index.needs_compaction and len(index) == 1
+
+def test_job_result_with_relative_exports_dir(tmp_path, monkeypatch):
+    """Test that render results download when EXPORTS_DIR is relative."""
+    from src.api import app as api
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "PROJECTS_DIR", "projects")
+    monkeypatch.setattr(settings, "EXPORTS_DIR", "exports")
+    manager = ProjectManager()
+    manager.create_project("song")
+    monkeypatch.setattr(api, "project_manager", manager)
+    client = api.app.test_client()
+
+    job_id = client.post("/api/projects/song/generate").json["id"]
+    assert api.get_job_queue().get(job_id).wait(timeout=10)
+    result = client.get(f"/api/jobs/{job_id}/result")
+    assert result.status_code == 200
+    assert result.data.startswith(b"MThd")
+
+def test_saturated_queue_returns_429(storage, monkeypatch):
+    """Test that the API reports backpressure with 429."""
+    from src.api import app as api
+    manager = ProjectManager()
+    manager.create_project("song")
+    monkeypatch.setattr(api, "project_manager", manager)
+    queue = JobQueue(max_workers=1, max_pending=0, history=8)
+    monkeypatch.setattr(api, "get_job_queue", lambda: queue)
+    response = api.app.test_client().post("/api/projects/song/generate")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+def test_batch_render_runs_as_job(storage, monkeypatch):
+    """Test that batch renders are queued and their workers and names are validated."""
+    from src.api import app as api
+    manager = ProjectManager()
+    for name in ("a", "b"):
+        manager.create_project(name)
+    monkeypatch.setattr(api, "project_manager", manager)
+    monkeypatch.setattr(settings, "BATCH_MAX_WORKERS", 1)
+    workers = []
+    render_projects = manager.render_projects
+
+    def record(projects, max_workers):
+        workers.append(max_workers)
+        return render_projects(projects, max_workers=max_workers)
+    monkeypatch.setattr(manager, "render_projects", record)
+    client = api.app.test_client()
+
+    for invalid in ("8", 2.5, True):
+        assert client.post("/api/projects/generate", json={"workers": invalid}).status_code == 400
+    for invalid in ("ab", {"a": 1}, ["a", 1]):
+        assert client.post("/api/projects/generate", json={"names": invalid}).status_code == 400
+
+    response = client.post("/api/projects/generate", json={"workers": 1000, "names": ["b"]})
+    assert response.status_code == 202
+    job = api.get_job_queue().get(response.json["id"])
+    assert job.wait(timeout=10)
+    assert workers == [1]
+    assert job.result["succeeded"] == 1
+    assert [r["name"] for r in job.result["results"]] == ["b"]
@@ -0,0 +1,148 @@
+import pytest
+import numpy as np
+from src.core.config import settings
+from src.core.midi_generator import MIDIGenerator
+from src.core.note_store import NoteStore, NoteTrack
+
+def test_note_track_appends_blocks():
+    """Test that note blocks are stored as concatenated columns."""
+    track = NoteTrack(program=32)
+    track.add_notes([36, 38], 100, [0.0, 0.25], [0.2, 0.45])
+    track.add_notes(42, [90, 91, 92], [0.5, 0.75, 1.0], [0.7, 0.95, 1.2])
+    assert len(track) == 5
+    assert track.pitch.tolist() == [36, 38, 42, 42, 42]
+    assert track.velocity.tolist() == [100, 100, 90, 91, 92]
+    assert np.allclose(track.end - track.start, 0.2)
+
+def test_note_store_to_pretty_midi():
+    """Test that a store converts to an equivalent PrettyMIDI object."""
+    store = NoteStore()
+    store.new_track(program=0, is_drum=True).add_notes([36, 38], 100, [0.0, 0.5], [0.2, 0.7])
+    store.new_track(program=73).add_notes(72, 90, 1.0, 1.5)
+    pm = store.to_pretty_midi(tempo=120)
+    assert [i.is_drum for i in pm.instruments] == [True, False]
+    assert [n.pitch for n in pm.instruments[0].notes] == [36, 38]
+    assert pm.instruments[1].notes[0].start == 1.0
+    assert store.note_count == 3
+
+def test_drum_notes_follow_step_grid():
+    """Test that drum hits are placed on the genre's compiled grid steps."""
+    track = MIDIGenerator().create_drum_pattern('dubstep').tracks[0]
+    snares = track.pitch == 38
+    assert track.start[snares].tolist() == [1.0, 3.0]
+    assert ((track.velocity >= 80) & (track.velocity < 120)).all()
+
+def test_create_harmony_and_melody():
+    """Test that chords and melody come from the genre progression."""
+    generator = MIDIGenerator()
+    generator.create_harmony('reggae')
+    generator.create_melody('reggae')
+    harmony, melody = generator.notes.tracks
+    assert len(harmony) == 12
+    assert harmony.pitch[:3].tolist() == [36, 40, 43]  # C2, E2, G2
+    assert len(melody) == 4
+    chords = harmony.pitch.reshape(4, 3)
+    for i, pitch in enumerate(melody.pitch.tolist()):
+        assert pitch - 12 in chords[i]
+
+def test_same_seed_gives_identical_bytes():
+    """Test that rendering is reproducible for a given seed."""
+    first = MIDIGenerator(seed=7)
+    first.create_pattern('reggae', complexity=3)
+    second = MIDIGenerator(seed=7)
+    second.create_pattern('reggae', complexity=3)
+    assert first.to_bytes() == second.to_bytes()
+    # Re-rendering with the same generator is reproducible too
+    data = first.to_bytes()
+    first.create_pattern('reggae', complexity=3)
+    assert first.to_bytes() == data
+
+def test_seed_changes_random_choices():
+    """Test that velocities are drawn from the generator's own RNG."""
+    velocities = []
+    for seed in (1, 2):
+        generator = MIDIGenerator(seed=seed)
+        generator.create_pattern('techno')
+        velocities.append(generator.notes.tracks[0].velocity.tolist())
+    assert velocities[0] != velocities[1]
+
+def test_variations_scale_linearly():
+    """Test that each variation appends one derived section to the same tracks."""
+    generator = MIDIGenerator(seed=3)
+    base = generator.create_pattern('reggae', 'loop_based', variations=1, complexity=3)
+    base_tracks, base_notes = len(base.tracks), base.note_count
+    section_notes = base_notes // 3
+    for variations in range(1, 17):
+        store = generator.create_pattern('reggae', 'loop_based', variations=variations, complexity=3)
+        extra = variations - 1
+        assert len(store.tracks) == base_tracks == 4
+        assert len(generator.arrangement.slots) == 3 + extra
+        # Fills add at most 4 notes and thinning removes at most 3 per variation
+        assert base_notes + extra * (section_notes - 3) <= store.note_count
+        assert store.note_count <= base_notes + extra * (section_notes + 4)
+
+def test_sections_are_sequential():
+    """Test that scenario sections follow each other on the timeline."""
+    generator = MIDIGenerator(seed=3)
+    store = generator.create_pattern('reggae', 'full_song', complexity=2)
+    slots = generator.arrangement.slots
+    assert [slot.name for slot in slots] == ["intro", "verse", "chorus", "bridge", "outro"]
+    assert [slot.offset for slot in slots] == [0.0, 4.0, 8.0, 12.0, 16.0]
+    assert [track.name for track in store.tracks] == ["Drums", "Bass", "Harmony", "Melody"]
+    harmony = store.tracks[2]
+    block = harmony.start[:12]
+    for i, slot in enumerate(slots):
+        section = harmony.start[i * 12:(i + 1) * 12]
+        assert np.array_equal(section, block + slot.offset)
+        assert section.min() >= slot.offset and harmony.end[i * 12:(i + 1) * 12].max() <= slot.end
+
+class FakeMidiOut:
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+def test_midi_output_is_opened_only_for_playback(monkeypatch):
+    """Test that generators never open a MIDI port until they play."""
+    from src.core import midi_generator, midi_output
+    opened = []
+    pool = midi_output.MidiOutputPool(factory=lambda port: opened.append(port) or FakeMidiOut())
+    monkeypatch.setattr(midi_generator, "get_midi_output_pool", lambda: pool)
+    generators = [MIDIGenerator(seed=i) for i in range(10)]
+    for generator in generators:
+        generator.create_pattern('reggae')
+    assert opened == []
+    for generator in generators[:2]:
+        engine = generator.play_realtime(blocking=False)
+        assert engine.is_playing
+        engine.stop()
+    assert opened == [None]  # One shared port
+
+def test_concurrent_players_share_a_port(monkeypatch):
+    """Test that a second non-blocking player on a busy port fails instead of blocking."""
+    from src.core import midi_generator, midi_output
+    pool = midi_output.MidiOutputPool(factory=lambda port: FakeMidiOut())
+    monkeypatch.setattr(midi_generator, "get_midi_output_pool", lambda: pool)
+    monkeypatch.setattr(settings, "MIDI_PORT_TIMEOUT", 0.05)
+    first, second = MIDIGenerator(seed=1), MIDIGenerator(seed=2)
+    for generator in (first, second):
+        generator.create_pattern('reggae')
+    engine = first.play_realtime(blocking=False)
+    with pytest.raises(midi_output.PortBusyError):
+        second.play_realtime(blocking=False)
+    engine.stop()
+    second.play_realtime(blocking=False).stop()
+    assert not pool.port_lock().locked()
+
+def test_unavailable_midi_output_raises_on_play():
+    """Test that a missing MIDI backend only fails playback."""
+    from src.core.midi_output import MidiOutputPool
+
+    def unavailable(port):
+        raise OSError("no backend")
+
+    pool = MidiOutputPool(factory=unavailable)
+    with pytest.raises(RuntimeError, match="no backend"):
+        with pool.borrow():
+            pass
@@ -0,0 +1,82 @@
+import io
+import numpy as np
+import pretty_midi
+from src.core.midi_generator import MIDIGenerator
+from src.core.midi_writer import StreamingMidiWriter, encode_smf, encode_vlq, write_smf
+from src.core.note_store import NoteStore
+
+def _pretty_midi_bytes(store: NoteStore, tempo: float) -> bytes:
+    buffer = io.BytesIO()
+    store.to_pretty_midi(tempo).write(buffer)
+    return buffer.getvalue()
+
+def test_encode_vlq():
+    """Test variable-length quantity encoding against the SMF spec examples."""
+    assert encode_vlq(0) == b"\x00"
+    assert encode_vlq(0x7F) == b"\x7f"
+    assert encode_vlq(0x80) == b"\x81\x00"
+    assert encode_vlq(0x3FFF) == b"\xff\x7f"
+    assert encode_vlq(0x200000) == b"\x81\x80\x80\x00"
+
+def test_matches_pretty_midi_bytes():
+    """Test that the writer output is byte-identical to PrettyMIDI.write."""
+    rng = np.random.default_rng(0)
+    store = NoteStore()
+    for i in range(18):
+        start = np.sort(rng.uniform(0, 60, 200))
+        start[:20] = np.round(start[:20])  # Coinciding note-on/off ticks
+        store.new_track(program=i, is_drum=(i % 6 == 0), name=f"track {i}" if i % 2 else "").add_notes(
+            rng.integers(0, 128, 200), rng.integers(1, 128, 200), start, start + rng.choice([0.0, 0.25, 1.0, 90.0], 200)
+        )
+    store.new_track(program=5)  # Empty track
+    for tempo in (120, 97.5):
+        assert encode_smf(store, tempo) == _pretty_midi_bytes(store, tempo)
+
+def test_generator_round_trip(tmp_path):
+    """Test that a generated pattern round-trips through a MIDI file."""
+    generator = MIDIGenerator(tempo=128)
+    generator.create_pattern('reggae', complexity=3)
+    path = tmp_path / "pattern.mid"
+    generator.save_midi(str(path))
+    loaded = pretty_midi.PrettyMIDI(str(path))
+    tracks = [track for track in generator.notes.tracks if len(track)]  # Empty tracks are not loaded
+    assert len(loaded.instruments) == len(tracks)
+    for instrument, track in zip(loaded.instruments, tracks):
+        assert sorted(n.pitch for n in instrument.notes) == sorted(track.pitch.tolist())
+    assert path.read_bytes() == generator.to_bytes()
+
+def test_write_to_file_object():
+    """Test writing to a binary file object."""
+    store = NoteStore()
+    store.new_track(program=0).add_notes(60, 100, 0.0, 0.5)
+    buffer = io.BytesIO()
+    write_smf(store, buffer, tempo=120)
+    assert buffer.getvalue().startswith(b"MThd")
+
+def _note_set(instruments):
+    return sorted(
+        (i.program, i.is_drum, n.pitch, n.velocity, round(n.start, 3), round(n.end, 3))
+        for i in instruments for n in i.notes
+    )
+
+def test_streaming_writer_matches_create_pattern(tmp_path):
+    """Test that a streamed song holds exactly the notes of the materialized one."""
+    generator = MIDIGenerator(tempo=128, seed=3)
+    generator.create_pattern('reggae', 'live_performance', variations=6, complexity=3)
+    expected = _note_set(pretty_midi.PrettyMIDI(io.BytesIO(generator.to_bytes())).instruments)
+    path = tmp_path / "stream.mid"
+    generator.save_midi_stream(str(path), generator.iter_pattern('reggae', 'live_performance', 6, 3))
+    assert _note_set(pretty_midi.PrettyMIDI(str(path)).instruments) == expected
+
+def test_streaming_writer_carries_note_offs_across_chunks():
+    """Test that notes outlasting their chunk are closed in a later one."""
+    buffer = io.BytesIO()
+    with StreamingMidiWriter(buffer, tempo=120) as writer:
+        for offset in range(4):
+            chunk = NoteStore()
+            chunk.new_track(program=0).add_notes(60 + offset, 100, float(offset), offset + 2.5)
+            writer.write(chunk, until=offset + 1.0)
+    notes = pretty_midi.PrettyMIDI(io.BytesIO(buffer.getvalue())).instruments[0].notes
+    assert sorted((n.pitch, n.start, n.end) for n in notes) == [
+        (60, 0.0, 2.5), (61, 1.0, 3.5), (62, 2.0, 4.5), (63, 3.0, 5.5)
+    ]
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from src.core.ring_buffer import RingBuffer
+
+def test_ring_buffer_matches_roll():
+    """Test that the ring buffer window always equals the np.roll window."""
+    rng = np.random.default_rng(0)
+    rolled = rng.random((3, 5, 4))
+    ring = RingBuffer(rolled.copy())
+    for _ in range(12):
+        step = rng.random((3, 4))
+        rolled = np.roll(rolled, -1, axis=1)
+        rolled[:, -1] = step
+        ring.push(step)
+        np.testing.assert_array_equal(ring.window(), rolled)
+
+def _model():
+    pytest.importorskip("tensorflow")
+    from src.core.model import GenrePatternGenerator
+    generator = GenrePatternGenerator()
+    generator.build_model()
+    return generator
+
+def _predict_loop(generator, genre, length, initial):
+    """The previous generate_pattern: one predict call and np.roll per step."""
+    import tensorflow as tf
+    genre_one_hot = tf.one_hot([generator.genres.index(genre)], depth=len(generator.genres))
+    current_sequence = initial[None].copy()
+    pattern = []
+    for _ in range(length):
+        next_step = generator.model.predict([current_sequence, genre_one_hot], verbose=0)
+        pattern.append(next_step[0])
+        current_sequence = np.roll(current_sequence, -1, axis=1)
+        current_sequence[0, -1] = next_step[0]
+    return np.array(pattern)
+
+def test_batched_generation_matches_predict_loop():
+    """Test that compiled batched generation gives the per-step predict results."""
+    generator = _model()
+    genres = generator.genres[:2] * 2
+    seeds = [0, 1, 2, 3]
+    patterns = generator.generate_patterns(genres, length=6, seeds=seeds)
+    assert patterns.shape == (4, 6, generator.n_features)
+    for pattern, genre, seed in zip(patterns, genres, seeds):
+        initial = np.random.default_rng(seed).random(
+            (generator.sequence_length, generator.n_features), dtype=np.float32
+        )
+        np.testing.assert_allclose(pattern, _predict_loop(generator, genre, 6, initial), atol=1e-5)
+    np.testing.assert_allclose(
+        generator.generate_pattern(genres[0], length=6),
+        _predict_loop(generator, genres[0], 6, np.zeros((generator.sequence_length, generator.n_features))),
+        atol=1e-5
+    )
+
+def _full_history_reference(generator, genre, initial, length):
+    """Run the model's layers over the entire history for every step."""
+    import tensorflow as tf
+    model = generator.model
+    genre_one_hot = tf.one_hot([generator.genres.index(genre)], depth=len(generator.genres))
+    history = initial[None].astype(np.float32)
+    pattern = []
+    for _ in range(length):
+        h = model.get_layer('lstm_2')(model.get_layer('lstm_1')(history))
+        combined = tf.concat([h, model.get_layer('genre_embedding')(genre_one_hot)], axis=-1)
+        step = model.get_layer('output')(model.get_layer('hidden')(combined)).numpy()
+        pattern.append(step[0])
+        history = np.concatenate([history, step[:, None]], axis=1)
+    return np.array(pattern)
+
+def test_model_with_unnamed_layers_loads_through_registry(tmp_path):
+    """Test that a model saved before its layers were named loads and decodes windowed."""
+    generator = _model()
+    from tensorflow.keras import layers, models
+    from src.core.model_registry import ModelRegistry
+    window = layers.Input(shape=(generator.sequence_length, generator.n_features))
+    genre = layers.Input(shape=(len(generator.genres),))
+    x = layers.LSTM(16)(layers.LSTM(16, return_sequences=True)(window))
+    x = layers.Concatenate()([x, layers.Dense(8)(genre)])
+    output = layers.Dense(generator.n_features, activation='sigmoid')(x)
+    model = models.Model(inputs=[window, genre], outputs=output)
+    path = str(tmp_path / "old.keras")
+    model.save(path)
+    loaded = ModelRegistry().get(path)
+    assert not loaded.supports_stateful
+    np.testing.assert_allclose(
+        loaded.generate_patterns(generator.genres[:1], length=3, seeds=[0], stateful=True),
+        loaded.generate_patterns(generator.genres[:1], length=3, seeds=[0])
+    )
+
+def test_stateful_decoding_matches_windowed_model():
+    """Test that step-wise decoding shares the trained weights and carries state correctly."""
+    generator = _model()
+    genres = generator.genres[:3]
+    stateful = generator.generate_patterns(genres, length=5, seeds=[4, 5, 6], stateful=True)
+    windowed = generator.generate_patterns(genres, length=5, seeds=[4, 5, 6])
+    # The first step sees exactly the initial window in both modes. Later
+    # stateful steps condition on the whole history, which the windowed model
+    # truncates to sequence_length steps, so they are checked against a
+    # full-history pass instead
+    np.testing.assert_allclose(stateful[:, 0], windowed[:, 0], atol=1e-5)
+    for pattern, genre, seed in zip(stateful, genres, [4, 5, 6]):
+        initial = np.random.default_rng(seed).random(
+            (generator.sequence_length, generator.n_features), dtype=np.float32
+        )
+        np.testing.assert_allclose(pattern, _full_history_reference(generator, genre, initial, 5), atol=1e-5)
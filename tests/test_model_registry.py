@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+import pytest
+from src.core.model_registry import ModelRegistry, warm_up
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+        self.warm = False
+
+def _registry(loads, max_models=2, delay=0.0):
+    def loader(path):
+        time.sleep(delay)
+        loads.append(path)
+        return FakeModel(path)
+
+    def warm_up(model):
+        model.warm = True
+
+    return ModelRegistry(max_models=max_models, loader=loader, warm_up=warm_up)
+
+def test_models_are_loaded_once_and_warmed(tmp_path):
+    """Test that concurrent callers share one warmed-up load."""
+    path = tmp_path / "model.keras"
+    path.write_bytes(b"v1")
+    loads = []
+    registry = _registry(loads, delay=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get(str(path)))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert all(model is results[0] for model in results) and results[0].warm
+
+def test_new_versions_reload_and_evict(tmp_path):
+    """Test mtime-based reloads, stale version eviction and the LRU bound."""
+    loads = []
+    registry = _registry(loads, max_models=2)
+    a, b, c = (tmp_path / name for name in "abc")
+    for path in (a, b, c):
+        path.mkdir()
+        (path / "weights").write_bytes(b"v1")
+    first = registry.get(str(a))
+    
+    # Rewriting a file inside a saved model directory is a new version
+    os.utime(a / "weights", ns=(10**18, 10**18))
+    second = registry.get(str(a))
+    assert second is not first and len(registry) == 1
+    
+    registry.get(str(b))
+    registry.get(str(a))  # a is now the most recently used
+    registry.get(str(c))
+    assert len(registry) == 2
+    registry.get(str(a))
+    assert len(loads) == 4
+    registry.get(str(b))
+    assert len(loads) == 5  # b was evicted
+
+class FakeGenerator:
+    genres = ["house"]
+
+    def __init__(self, supports_stateful):
+        self.supports_stateful = supports_stateful
+        self.calls = []
+
+    def generate_patterns(self, genres, length, stateful=False):
+        self.calls.append(stateful)
+
+def test_warm_up_skips_unsupported_stateful_decoding():
+    """Test that models without the decoder's named layers are only warmed up windowed."""
+    for supports_stateful, calls in [(True, [False, True]), (False, [False])]:
+        generator = FakeGenerator(supports_stateful)
+        warm_up(generator)
+        assert generator.calls == calls
+
+def test_missing_model_raises(tmp_path):
+    """Test that asking for an unsaved model fails clearly."""
+    with pytest.raises(FileNotFoundError):
+        _registry([]).get(str(tmp_path / "missing"))
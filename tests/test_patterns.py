@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+from src.core.midi_generator import MIDIGenerator
+from src.core.patterns import CHORD_PROGRESSIONS, PatternError, PatternRegistry, get_pattern_registry
+
+NOTES = {'C2': 36, 'E2': 40, 'F2': 41, 'G2': 43, 'A2': 45, 'B2': 47, 'C3': 48, 'D3': 50, 'E3': 52}
+
+def test_registry_compiles_genre_tables():
+    """Test that drum hits and chords are compiled to read-only arrays."""
+    house = get_pattern_registry().get('house')
+    kicks = house.drum_step[house.drum_pitch == 36]
+    assert kicks.tolist() == [0, 4, 8, 12]
+    assert np.all(np.diff(house.drum_step) >= 0)
+    assert not house.drum_step.flags.writeable
+    techno = get_pattern_registry().get('techno')
+    assert techno.drum_duration[techno.drum_pitch == 42].tolist() == [0.25] * 16
+    reggae = get_pattern_registry().get('reggae')
+    assert reggae.drum_count == 0
+    assert reggae.chord_pitches.shape == (4, 3)
+    assert not reggae.chord_pitches.flags.writeable
+    # Unknown genres fall back to the default progression with no drums
+    assert get_pattern_registry().get('polka').chord_pitches.tolist() == reggae.chord_pitches.tolist()
+    assert get_pattern_registry().get('polka').drum_count == 0
+
+@pytest.mark.parametrize("drums", [
+    {'kick': [(16, 1)]},
+    {'kick': [(-1, 1)]},
+    {'kick': [(0, 0)]},
+    {'cowbell': [(0, 1)]},
+    {'kick': [(0,)]},
+])
+def test_invalid_drum_definitions_are_rejected(drums):
+    """Test that bad steps, durations and drum names fail at compile time."""
+    with pytest.raises(PatternError):
+        PatternRegistry({'bad': drums}, CHORD_PROGRESSIONS, NOTES)
+
+def test_bass_lines_are_compiled():
+    """Test that a genre's bass entry becomes step/pitch columns rather than a drum."""
+    patterns = {'dub': {'kick': [(0, 1)], 'bass': {'rhythm': [1, 0, 1, 1], 'notes': ['C2', 'E2']}}}
+    dub = PatternRegistry(patterns, CHORD_PROGRESSIONS, NOTES).get('dub')
+    assert dub.bass_step.tolist() == [0, 2, 3]
+    assert dub.bass_pitch.tolist() == [36, 36, 40]
+    assert dub.drum_count == 1
+    assert not dub.bass_pitch.flags.writeable
+    assert get_pattern_registry().get('house').bass_step.size == 0
+
+@pytest.mark.parametrize("bass", [
+    {'rhythm': [1] * 17},
+    {'rhythm': [1], 'notes': []},
+    {'rhythm': [1], 'notes': ['H2']},
+])
+def test_invalid_bass_lines_are_rejected(bass):
+    """Test that overlong rhythms and bad notes fail at compile time."""
+    with pytest.raises(PatternError):
+        PatternRegistry({'bad': {'bass': bass}}, CHORD_PROGRESSIONS, NOTES)
+
+def test_bass_track_plays_compiled_line(monkeypatch):
+    """Test that the generator places the compiled bass line on the grid."""
+    from src.core import midi_generator
+    patterns = {'dub': {'bass': {'rhythm': [1, 0, 0, 0, 1], 'notes': ['G2']}}}
+    monkeypatch.setattr(midi_generator, "get_pattern_registry",
+                        lambda: PatternRegistry(patterns, CHORD_PROGRESSIONS, NOTES))
+    track = MIDIGenerator().create_bass_line('dub').tracks[0]
+    assert track.pitch.tolist() == [43, 43]
+    assert track.start.tolist() == [0.0, 1.0]
+    assert np.allclose(track.end - track.start, 0.5)
+
+def test_generated_drums_follow_genre_pattern():
+    """Test that house drums land on the configured grid steps with beat-based lengths."""
+    generator = MIDIGenerator(seed=3)
+    track = generator.create_drum_pattern('house').tracks[0]
+    kicks = track.pitch == 36
+    assert track.start[kicks].tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert np.allclose(track.end[kicks] - track.start[kicks], 1.0)
+    hihats = track.pitch == 42
+    assert np.allclose(track.end[hihats] - track.start[hihats], 0.5)
+    assert ((track.velocity >= 80) & (track.velocity < 120)).all()
@@ -0,0 +1,138 @@
+import threading
+import time
+import numpy as np
+import pytest
+from src.core.midi_generator import MIDIGenerator
+from src.core.midi_output import PortBusyError, VirtualMidiOut
+from src.core.note_store import NoteStore
+from src.core import playback
+from src.core.playback import ALL_NOTES_OFF, NOTE_OFF, NOTE_ON, PlaybackEngine, PlaybackEvents
+
+def _store(starts, duration=0.01):
+    store = NoteStore()
+    track = store.new_track(0, name="Lead")
+    starts = np.asarray(starts, dtype=float)
+    track.add_notes(60, 100, starts, starts + duration)
+    return store
+
+def _notes(midi_out):
+    return [(t, m) for t, m in midi_out.messages if m[0] & 0xF0 in (NOTE_ON, NOTE_OFF)]
+
+def test_events_are_time_ordered_with_note_offs_first():
+    """Test that a note ending where the next begins is released first."""
+    events = PlaybackEvents.from_note_store(_store([0.0, 0.1], duration=0.1))
+    assert events.time.tolist() == [0.0, 0.1, 0.1, 0.2]
+    assert [s & 0xF0 for s in events.status.tolist()] == [NOTE_ON, NOTE_OFF, NOTE_ON, NOTE_OFF]
+    assert events.length == 0.2
+
+def test_events_are_sent_on_time():
+    """Test that each event is sent close to its scheduled time."""
+    starts = np.arange(10) * 0.02
+    midi_out = VirtualMidiOut()
+    engine = PlaybackEngine(PlaybackEvents.from_note_store(_store(starts)), midi_out, tempo=120)
+    began = time.perf_counter_ns()
+    engine.start()
+    assert engine.wait(timeout=5)
+    sent = [(t - began) / 1e9 for t, m in _notes(midi_out) if m[0] & 0xF0 == NOTE_ON]
+    assert len(sent) == 10
+    # Deadlines are absolute, so lateness does not accumulate over the pattern
+    assert np.all(np.asarray(sent) >= starts - 1e-3)
+    assert np.all(np.asarray(sent) - starts < 0.02)
+    histogram = engine.jitter_histogram()
+    assert histogram["count"] > 0 and sum(histogram["counts"]) == histogram["count"]
+    assert not engine.is_playing
+
+def test_stop_silences_notes_and_is_responsive():
+    """Test that stopping returns promptly and sends all-notes-off."""
+    midi_out = VirtualMidiOut()
+    engine = PlaybackEngine(PlaybackEvents.from_note_store(_store([0.0, 10.0])), midi_out, tempo=120)
+    engine.start()
+    time.sleep(0.05)
+    began = time.perf_counter()
+    engine.stop()
+    assert time.perf_counter() - began < 0.5
+    assert not engine.is_playing
+    assert 0.0 < engine.position < 1.0
+    assert [m[1] for t, m in midi_out.messages[-16:]] == [ALL_NOTES_OFF] * 16
+    assert len([m for t, m in _notes(midi_out) if m[0] & 0xF0 == NOTE_ON]) == 1
+
+def test_seek_and_tempo_change():
+    """Test that seeking skips events and a faster tempo plays sooner."""
+    starts = [0.0, 1.0, 2.0]
+    midi_out = VirtualMidiOut()
+    engine = PlaybackEngine(PlaybackEvents.from_note_store(_store(starts)), midi_out, tempo=120)
+    engine.start(position=0.95)
+    engine.set_tempo(120 * 10)
+    began = time.perf_counter()
+    assert engine.wait(timeout=5)
+    # One second of song time remains after the first note, at 10x speed
+    assert time.perf_counter() - began < 0.5
+    assert len([m for t, m in _notes(midi_out) if m[0] & 0xF0 == NOTE_ON]) == 2
+    assert engine.tempo == 1200
+
+def test_seek_to_end_while_spinning(monkeypatch):
+    """Test that seeking past the last event during the spin wait ends playback cleanly."""
+    monkeypatch.setattr(playback, "SPIN_THRESHOLD_NS", 10**10)  # Spin for the whole wait
+    # A real-time spinning thread could starve this one on a single CPU
+    monkeypatch.setattr(playback, "_raise_thread_priority", lambda: None)
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    midi_out = VirtualMidiOut()
+    engine = PlaybackEngine(PlaybackEvents.from_note_store(_store([0.5])), midi_out, tempo=120)
+    engine.start()
+    time.sleep(0.05)
+    engine.seek(10.0)
+    assert engine.wait(timeout=5)
+    assert not errors and not engine.is_playing
+    assert not _notes(midi_out)
+
+def test_streamed_chunks_play_every_event():
+    """Test that playing generated chunks sends the same events as the full pattern."""
+    generator = MIDIGenerator(seed=1)
+    full = PlaybackEvents.from_note_store(generator.create_pattern('edm', 'live_performance', 2, 2))
+    source = ((slot.end, PlaybackEvents.from_note_store(chunk))
+              for slot, chunk in generator.iter_pattern('edm', 'live_performance', 2, 2))
+    midi_out = VirtualMidiOut()
+    # 200x speed: the 24 second song plays in about 0.12 seconds
+    engine = PlaybackEngine(PlaybackEvents.from_note_store(NoteStore()), midi_out,
+                            tempo=generator.tempo * 200, base_tempo=generator.tempo, source=source)
+    engine.start()
+    assert engine.wait(timeout=5)
+    expected = sorted(zip(full.status.tolist(), full.data1.tolist(), full.data2.tolist()))
+    assert sorted(tuple(m) for t, m in _notes(midi_out)) == expected
+    assert engine.position == full.length
+
+def test_port_is_held_while_playing():
+    """Test that the engine holds its port from start until stop, including after a restart."""
+    port_lock = threading.Lock()
+    engine = PlaybackEngine(PlaybackEvents.from_note_store(_store([0.0, 10.0])), VirtualMidiOut(),
+                            tempo=120, port_lock=port_lock)
+    engine.start()
+    assert port_lock.locked()
+    engine.stop()
+    assert not port_lock.locked()
+    engine.start()
+    assert engine.is_playing and port_lock.locked()
+    engine.stop()
+    assert not port_lock.locked()
+
+def test_busy_port_raises_and_failed_start_releases(monkeypatch):
+    """Test that a second player times out on a held port and a failed start frees it."""
+    port_lock = threading.Lock()
+    first, second = (PlaybackEngine(PlaybackEvents.from_note_store(_store([0.0, 10.0])), VirtualMidiOut(),
+                                    tempo=120, port_lock=port_lock) for _ in range(2))
+    first.start()
+    began = time.perf_counter()
+    with pytest.raises(PortBusyError):
+        second.start(timeout=0.05)
+    assert time.perf_counter() - began < 0.5
+    first.stop()
+    second.start(timeout=0.05)
+    second.stop()
+
+    def fail(self):
+        raise RuntimeError("can't start new thread")
+    monkeypatch.setattr(threading.Thread, "start", fail)
+    with pytest.raises(RuntimeError):
+        first.start()
+    assert not port_lock.locked() and not first.is_playing
@@ -0,0 +1,189 @@
+import os
+import pytest
+from src.core.config import settings
+from src.core.project_manager import Project, ProjectManager
+
+def test_seed_is_persisted(storage):
+    """Test that a project's seed survives a save/load cycle."""
+    manager = ProjectManager()
+    project = manager.create_project("song")
+    assert isinstance(project.seed, int)
+    reloaded = ProjectManager().get_project("song")
+    assert reloaded.seed == project.seed
+    assert reloaded.render() == project.render()
+
+def test_seed_defaults_for_legacy_projects():
+    """Test that projects saved without a seed still load."""
+    data = Project("song").to_dict()
+    del data["seed"]
+    assert isinstance(Project.from_dict(data).seed, int)
+
+def test_seed_is_part_of_render_key():
+    """Test that changing the seed changes the render key."""
+    project = Project("song")
+    key = project.render_key()
+    project.seed += 1
+    assert project.render_key() != key
+
+def _make_projects(manager, count):
+    projects = [manager.create_project(f"song{i}") for i in range(count)]
+    projects[1].tempo = 0  # Cannot be rendered
+    return projects
+
+def test_render_projects_in_process(storage):
+    """Test that batch rendering returns one result per project, in order."""
+    manager = ProjectManager()
+    projects = _make_projects(manager, 5)
+    calls = []
+    results = manager.render_projects(projects, max_workers=1, chunk_size=2,
+                                      progress=lambda done, total: calls.append((done, total)))
+    assert [r.name for r in results] == [p.name for p in projects]
+    assert [r.ok for r in results] == [True, False, True, True, True]
+    assert "ZeroDivisionError" in results[1].error
+    assert calls == [(2, 5), (4, 5), (5, 5)]
+
+def test_render_projects_on_process_pool(storage):
+    """Test that the process pool produces the same files as in-process rendering."""
+    manager = ProjectManager()
+    projects = _make_projects(manager, 6)
+    parallel = manager.render_projects(projects, max_workers=2, chunk_size=1, max_in_flight=2)
+    serial = manager.render_projects(projects, max_workers=1)
+    assert [r.to_dict() for r in parallel] == [r.to_dict() for r in serial]
+    assert manager.generate_all_patterns(max_workers=1) == [r.output_path for r in serial if r.ok]
+
+def test_projects_load_lazily(storage):
+    """Test that opening a manager does not load project bodies."""
+    manager = ProjectManager()
+    for name in ("b", "a", "c"):
+        manager.create_project(name)
+    reopened = ProjectManager()
+    assert reopened.projects == {}
+    assert reopened.get_project("a").name == "a"
+    assert list(reopened.projects) == ["default/a"]
+    assert reopened.get_project("missing") is None
+
+def test_list_projects_is_paginated(storage):
+    """Test ordering, paging and counting of a user's projects."""
+    manager = ProjectManager()
+    for i in range(5):
+        manager.create_project(f"song{i}")
+    manager.create_project("other", user="someone")
+    assert [p.name for p in manager.list_projects()] == [f"song{i}" for i in range(5)]
+    assert [p.name for p in manager.list_projects(offset=1, limit=2)] == ["song1", "song2"]
+    assert manager.count_projects() == 5
+    manager.delete_project("song0")
+    assert ProjectManager().count_projects() == 4
+
+def test_existing_files_are_indexed_once(storage):
+    """Test that project files written without an index are imported."""
+    ProjectManager().create_project("song")
+    os.remove(os.path.join(settings.PROJECTS_DIR, "index.sqlite3"))
+    manager = ProjectManager()
+    assert [p.name for p in manager.list_projects()] == ["song"]
+    with pytest.raises(ValueError):
+        manager.create_project("song")
+
+def test_dirty_fields_are_tracked():
+    """Test that only changed persisted fields mark a project dirty."""
+    project = Project.from_dict(Project("song").to_dict())
+    assert project.dirty_fields == frozenset()
+    project.tempo = project.tempo
+    assert project.dirty_fields == frozenset()
+    project.tempo = 140
+    project.midi_generator = None  # Not persisted
+    assert project.dirty_fields == {"tempo"}
+
+def test_clean_updates_are_not_written(storage, monkeypatch):
+    """Test that updating an unchanged project skips the write."""
+    manager = ProjectManager()
+    project = manager.create_project("song")
+    writes = []
+    original = manager.store.save
+    monkeypatch.setattr(manager.store, "save", lambda data: writes.append(data) or original(data))
+    manager.update_project(project)
+    assert writes == []
+    project.genre = "hiphop"
+    manager.update_project(project)
+    assert len(writes) == 1
+    assert ProjectManager().get_project("song").genre == "hiphop"
+
+def test_writes_are_atomic_and_compact(storage):
+    """Test that saves leave no temporary files and use compact JSON."""
+    manager = ProjectManager()
+    manager.create_project("song")
+    user_dir = os.path.join(settings.PROJECTS_DIR, settings.DEFAULT_USER)
+    assert os.listdir(user_dir) == ["song.json"]
+    with open(os.path.join(user_dir, "song.json"), "rb") as f:
+        assert b"\n" not in f.read()
+
+def test_updates_are_coalesced(storage, monkeypatch):
+    """Test that updates within the flush delay produce a single write."""
+    manager = ProjectManager(flush_delay=60)
+    project = manager.create_project("song")
+    writes = []
+    original = manager.store.save
+    monkeypatch.setattr(manager.store, "save", lambda data: writes.append(data) or original(data))
+    for tempo in (121, 122, 123):
+        project.tempo = tempo
+        manager.update_project(project)
+    assert writes == []
+    manager.flush()
+    assert [data["tempo"] for data in writes] == [123]
+    assert ProjectManager().get_project("song").tempo == 123
+
+def test_failed_writes_are_retried(storage, monkeypatch):
+    """Test that changes stay dirty when a write fails, so a later flush saves them."""
+    manager = ProjectManager(flush_delay=60)
+    project = manager.create_project("song")
+    original = manager.store.save
+
+    def fail(data):
+        raise OSError("disk full")
+    monkeypatch.setattr(manager.store, "save", fail)
+    project.tempo = 140
+    manager.update_project(project)
+    with pytest.raises(OSError):
+        manager.flush()
+    assert "tempo" in project.dirty_fields
+
+    monkeypatch.setattr(manager.store, "save", original)
+    manager.flush()
+    assert project.dirty_fields == frozenset()
+    assert ProjectManager().get_project("song").tempo == 140
+
+def test_concurrent_updates_keep_files_valid(storage):
+    """Test that concurrent updates never leave a corrupt project file."""
+    import threading
+    manager = ProjectManager()
+    project = manager.create_project("song")
+
+    def edit(offset):
+        for i in range(20):
+            project.sections = [{"n": offset + i}] * 50
+            manager.update_project(project)
+
+    threads = [threading.Thread(target=edit, args=(i * 100,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(ProjectManager().get_project("song").sections) == 50
+
+def test_update_endpoint_only_changes_editable_fields(storage, monkeypatch):
+    """Test that PUT rejects internal, identity and unknown fields."""
+    from src.api import app as api
+    manager = ProjectManager(flush_delay=0)
+    manager.create_project("song")
+    monkeypatch.setattr(api, "project_manager", manager)
+    client = api.app.test_client()
+    
+    for body in ({"_dirty": []}, {"_midi_generator": None}, {"name": "other"}, {"bogus": 1}, ["tempo"]):
+        response = client.put("/api/projects/song", json=body)
+        assert response.status_code == 400
+    project = manager.get_project("song")
+    assert project.name == "song" and not project.dirty_fields
+    
+    response = client.put("/api/projects/song", json={"tempo": 128, "genre": "techno"})
+    assert response.status_code == 200 and response.json["tempo"] == 128
+    reloaded = ProjectManager().get_project("song")
+    assert (reloaded.tempo, reloaded.genre) == (128, "techno")
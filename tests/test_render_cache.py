@@ -0,0 +1,77 @@
+import os
+from src.core.config import settings
+from src.core.project_manager import Project, ProjectManager
+from src.core.render_cache import RenderCache, render_key
+
+def test_render_key_is_canonical():
+    """Test that render keys ignore parameter order and track every value."""
+    assert render_key({"a": 1, "b": 2}) == render_key({"b": 2, "a": 1})
+    assert render_key({"a": 1, "b": 2}) != render_key({"a": 1, "b": 3})
+
+def test_memory_tier_is_lru(tmp_path):
+    """Test that the in-memory tier keeps only the most recent entries."""
+    cache = RenderCache(str(tmp_path), max_bytes=1 << 20, memory_items=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.encode())
+    assert list(cache._memory) == ["b", "c"]
+    assert cache.get("a") == b"a"  # Falls back to disk
+    assert list(cache._memory) == ["c", "a"]
+
+def test_disk_tier_is_size_bounded(tmp_path):
+    """Test that the oldest files are evicted once the store is full."""
+    cache = RenderCache(str(tmp_path), max_bytes=250, memory_items=0)
+    for i, key in enumerate(("a", "b", "c")):
+        path = cache.put(key, b"x" * 100)
+        os.utime(path, (i, i))
+    assert cache.get_path("a") is None
+    assert cache.get_path("b") is not None
+    assert cache.get("c") == b"x" * 100
+
+def test_disk_bound_covers_other_processes(tmp_path):
+    """Test that files written by other cache instances count towards the bound."""
+    first, second = (RenderCache(str(tmp_path), max_bytes=250, memory_items=0) for _ in range(2))
+    for i, cache in enumerate((first, second, first, second)):
+        path = cache.put(f"k{i}", b"x" * 100)
+        os.utime(path, (i, i))
+        sizes = [e.stat().st_size for e in os.scandir(tmp_path) if e.name.endswith(".mid")]
+        assert sum(sizes) <= 250
+    assert first.get_path("k3") is not None
+    second.clear()
+    assert not any(e.name.endswith(".mid") for e in os.scandir(tmp_path))
+
+def test_generate_pattern_reuses_render(storage, monkeypatch):
+    """Test that identical projects are rendered only once."""
+    project = Project("song")
+    renders = []
+    original = project._render
+    monkeypatch.setattr(project, "_render", lambda: renders.append(1) or original())
+    first = project.generate_pattern()
+    second = project.generate_pattern()
+    assert first == second
+    assert os.path.dirname(first) == os.path.join(settings.EXPORTS_DIR, "cache")
+    assert len(renders) == 1
+    project.tempo = 128
+    assert project.generate_pattern() != first
+    assert len(renders) == 2
+
+def test_export_supports_etag(storage, monkeypatch):
+    """Test that the export endpoint honours If-None-Match."""
+    from src.api import app as api
+    manager = ProjectManager()
+    manager.create_project("song")
+    monkeypatch.setattr(api, "project_manager", manager)
+    client = api.app.test_client()
+
+    # The first export renders in the background
+    response = client.get("/api/export/song")
+    assert response.status_code == 202
+    assert api.get_job_queue().get(response.json["id"]).wait(timeout=10)
+
+    response = client.get("/api/export/song")
+    assert response.status_code == 200
+    assert response.data.startswith(b"MThd")
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/export/song", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
@@ -0,0 +1,203 @@
+import json
+import os
+import numpy as np
+import pytest
+from src.core.note_store import NoteStore
+from src.core.project_manager import Project, ProjectManager
+from src.core.render_cache import get_render_cache
+from src.core.similarity import (
+    CURRENT_FILENAME, FINGERPRINT_BITS, N_CHUNKS, PENDING_FILENAME, Fingerprint, SimilarityIndex,
+    get_similarity_index, hamming, index_exports, index_templates
+)
+from src.core.templates import TemplateLibrary
+
+def _drums(steps, pitch=36):
+    store = NoteStore()
+    starts = np.asarray(steps) * 0.25
+    store.new_track(program=0, is_drum=True).add_notes(pitch, 100, starts, starts + 0.1)
+    return store
+
+def _random_fingerprints(n, seed=0, flips=3):
+    """Random codes plus near copies with a few bits flipped."""
+    rng = np.random.default_rng(seed)
+    bits = rng.random((n, 128)) < 0.3
+    bits[:, FINGERPRINT_BITS:] = False
+    copies = bits.copy()
+    for row in copies:
+        row[rng.choice(FINGERPRINT_BITS, flips, replace=False)] ^= True
+    codes = np.packbits(np.concatenate([bits, copies]), axis=1, bitorder="little").view("<u8")
+    return [Fingerprint(code, rng.integers(0, 256, 12)) for code in codes]
+
+def test_fingerprint_layout():
+    """Test that hits fold onto one bar and melodic notes set onset and pitch-class bits."""
+    store = _drums([0, 4, 20])
+    store.new_track(program=0).add_notes([60, 64, 72], 80, [0.0, 1.0, 2.0], [0.5, 1.5, 2.5])
+    fingerprint = Fingerprint.from_note_store(store)
+    bits = np.unpackbits(fingerprint.code.view(np.uint8), bitorder="little")
+    assert np.flatnonzero(bits).tolist() == [0, 4, 80, 84, 88, 96 + 0, 96 + 4]
+    assert fingerprint.histogram[[0, 4]].tolist() == [255, 128]
+    assert Fingerprint.from_note_store(_drums([0, 4])).distance(Fingerprint.from_note_store(_drums([0, 8]))) == 2
+
+def test_template_and_rendered_fingerprints_match(tmp_path):
+    """Test that a template fingerprints like the drum track it plays as."""
+    (tmp_path / "groove.json").write_text(json.dumps(
+        {"name": "groove", "genre": "house", "drums": {"kick": [[0, 1], [8, 1]], "hihat": [[2, 0.5, 90, 0.2]]}}
+    ))
+    template = TemplateLibrary(str(tmp_path)).get("groove")
+    store = _drums([0, 8])
+    store.tracks[0].add_notes(42, 90, 0.55, 0.6)
+    assert Fingerprint.from_template(template) == Fingerprint.from_note_store(store)
+
+def test_search_matches_brute_force_before_and_after_compaction(tmp_path):
+    """Test that chunked lookups find exactly what a full scan finds."""
+    fingerprints = _random_fingerprints(500)
+    index = SimilarityIndex(str(tmp_path), max_pending=10_000)
+    assert index.add_many((f"p{i}", fp) for i, fp in enumerate(fingerprints)) == 1000
+    codes = np.array([fp.code for fp in fingerprints])
+    for query in range(0, 1000, 97):
+        expected = set(np.flatnonzero(hamming(codes, fingerprints[query].code) <= 4))
+        pending = index.search(fingerprints[query], radius=4, k=1000)
+        index.compact()
+        compacted = index.search(fingerprints[query], radius=4, k=1000)
+        assert {int(key[1:]) for key, _ in compacted} == expected
+        assert compacted == pending
+        assert compacted[0] == (f"p{query}", 0)
+    reopened = SimilarityIndex(str(tmp_path))
+    assert len(reopened) == 1000
+    assert reopened.get("p3") == fingerprints[3]
+    assert [key for key, _ in reopened.similar_to("p3", radius=3)] == ["p503"]
+
+def test_index_is_shared_and_tolerates_torn_log(tmp_path):
+    """Test that writers are seen by other instances and a torn log line is skipped."""
+    first, second = SimilarityIndex(str(tmp_path)), SimilarityIndex(str(tmp_path))
+    fingerprint = Fingerprint.from_note_store(_drums([0, 4, 8, 12]))
+    assert first.add("a", fingerprint)
+    assert not second.add("a", fingerprint)
+    with open(tmp_path / PENDING_FILENAME, "ab") as f:
+        f.write(b'{"key": "torn", "co')
+    assert second.add("b", Fingerprint.from_note_store(_drums([0, 4, 8])))
+    assert len(SimilarityIndex(str(tmp_path))) == 2
+    assert [key for key, _ in first.search(fingerprint, radius=1)] == ["a", "b"]
+    with pytest.raises(ValueError):
+        first.search(fingerprint, radius=N_CHUNKS)
+
+def test_previous_segment_outlives_one_compaction(tmp_path):
+    """Test that a reader still opening the replaced segment finds its files."""
+    index = SimilarityIndex(str(tmp_path))
+    segments = []
+    for key in ("a", "b", "c"):
+        index.add(key, Fingerprint.from_note_store(_drums([0, 4])))
+        index.compact()
+        segments.append((tmp_path / CURRENT_FILENAME).read_text())
+    assert sorted(p.name for p in tmp_path.glob("segment-*")) == segments[1:]
+
+def test_duplicated_codes_are_expanded_lazily(tmp_path):
+    """Test that shared codes yield at most k entries without losing nearer or better-ranked ones."""
+    query = Fingerprint(np.array([0b1111, 0], dtype=np.uint64), np.zeros(12))
+    near_loud = Fingerprint(np.array([0b0111, 0], dtype=np.uint64), np.full(12, 255))
+    index = SimilarityIndex(str(tmp_path), max_pending=10_000)
+    index.add("exact", query)
+    index.add_many((f"dup{i:03d}", near_loud) for i in range(200))
+    index.add("near", Fingerprint(np.array([0b1111 | 1 << 40, 0], dtype=np.uint64), np.zeros(12)))
+    index.compact()
+    # One exact entry, then ties at distance 1 ranked by histogram across codes
+    assert index.search(query, radius=2, k=2) == [("exact", 0), ("near", 1)]
+    assert index.search(query, radius=2, k=3) == [("exact", 0), ("near", 1), ("dup000", 1)]
+    assert index.search(near_loud, radius=0, k=1, exclude="dup000") == [("dup001", 0)]
+    assert len(index.search(query, radius=2, k=1000)) == 202
+    assert index.search(query, radius=2, k=0) == []
+
+def test_ties_within_a_code_are_ranked_by_histogram(tmp_path):
+    """Test that entries sharing a code rank by histogram the same before and after compaction."""
+    code = np.array([0b1111, 0], dtype=np.uint64)
+    query = Fingerprint(code, np.full(12, 200))
+    index = SimilarityIndex(str(tmp_path), max_pending=10_000)
+    index.add_many((f"p{i:02d}", Fingerprint(code, np.zeros(12))) for i in range(19))
+    index.add("p19", query)
+    expected = [("p19", 0), ("p00", 0), ("p01", 0)]
+    assert index.search(query, radius=0, k=1) == expected[:1]
+    assert index.search(query, radius=0, k=3) == expected
+    index.compact()
+    assert index.search(query, radius=0, k=1) == expected[:1]
+    assert index.search(query, radius=0, k=3) == expected
+
+def test_generate_pattern_dedup(storage, tmp_path, monkeypatch):
+    """Test that dedup-on-generate links a near-identical export under the new key."""
+    first, second = Project("a"), Project("b")
+    # Without drums, melody or variations the seed does not change the notes
+    first.genre = second.genre = "reggae"
+    second.seed = first.seed + 1
+    path = first.generate_pattern()
+    linked = second.generate_pattern(dedup=True)
+    assert linked != path and os.path.basename(linked) == f"{second.render_key()}.mid"
+    with open(linked, "rb") as f, open(path, "rb") as g:
+        assert f.read() == g.read()
+    assert second.similar_patterns()[0] == {"key": first.render_key(), "distance": 0}
+    # The link is found directly, without rendering or searching again
+    monkeypatch.setattr(Project, "_render", lambda self: pytest.fail("rendered again"))
+    assert second.generate_pattern(dedup=True) == linked
+    assert second.generate_pattern() == linked
+
+def test_generate_pattern_dedup_requires_same_tempo_and_length(storage, tmp_path):
+    """Test that exports differing only outside the fingerprint are not reused."""
+    first = Project("a")
+    first.genre = "reggae"
+    path = first.generate_pattern()
+    for field, value in [("tempo", 140), ("scenario", "live_performance")]:
+        other = Project.from_dict(first.to_dict())
+        other.seed = first.seed + 1
+        setattr(other, field, value)
+        assert other.similar_patterns()[0]["distance"] == 0
+        rendered = other.generate_pattern(dedup=True)
+        with open(rendered, "rb") as f, open(path, "rb") as g:
+            assert f.read() != g.read()
+
+def test_search_within_group(tmp_path):
+    """Test that a group limits results in both the log and the segment."""
+    fingerprint = Fingerprint.from_note_store(_drums([0, 4, 8, 12]))
+    index = SimilarityIndex(str(tmp_path), max_pending=10_000)
+    index.add_many(((f"a{i}", fingerprint) for i in range(5)), group="a")
+    index.add_many(((f"b{i}", fingerprint) for i in range(5)), group="b")
+    index.add("plain", fingerprint)
+    for _ in range(2):
+        assert index.search(fingerprint, radius=0, k=2, group="b") == [("b0", 0), ("b1", 0)]
+        assert index.search(fingerprint, radius=0, k=20, group="") == [("plain", 0)]
+        assert index.search(fingerprint, radius=0, k=20, group="c") == []
+        assert len(index.search(fingerprint, radius=0, k=20)) == 11
+        index.compact()
+
+def test_compaction_is_left_to_the_caller(tmp_path):
+    """Test that adding entries never compacts, but reports when it is due."""
+    index = SimilarityIndex(str(tmp_path), max_pending=2)
+    index.add("a", Fingerprint.from_note_store(_drums([0])))
+    assert not index.needs_compaction
+    index.add("b", Fingerprint.from_note_store(_drums([4])))
+    assert index.needs_compaction and not (tmp_path / CURRENT_FILENAME).exists()
+    index.compact()
+    assert not index.needs_compaction and len(index) == 2
+
+def test_existing_exports_are_indexed_for_dedup(storage, tmp_path):
+    """Test that exports indexed afterwards join their project's dedup group."""
+    manager = ProjectManager()
+    first = manager.create_project("a")
+    first.genre = "reggae"
+    manager.update_project(first)
+    path = get_render_cache().put(first.render_key(), first.render())
+    index = get_similarity_index()
+    assert index_exports(index, get_render_cache().directory, manager.dedup_groups()) == 1
+    second = Project.from_dict(first.to_dict())
+    second.seed = first.seed + 1
+    # Linked to the indexed export rather than stored anew
+    assert os.path.samefile(second.generate_pattern(dedup=True), path)
+
+def test_index_templates(tmp_path):
+    """Test that templates are indexed once under prefixed keys."""
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "groove.json").write_text(json.dumps(
+        {"name": "groove", "genre": "house", "drums": {"kick": [[0, 1], [8, 1]]}}
+    ))
+    templates = TemplateLibrary(str(tmp_path / "templates")).templates
+    index = SimilarityIndex(str(tmp_path / "index"))
+    assert index_templates(index, templates) == 1
+    assert index_templates(index, templates) == 0
+    assert index.search(Fingerprint.from_note_store(_drums([0, 8])), radius=0) == [("template:groove", 0)]
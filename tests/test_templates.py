@@ -0,0 +1,96 @@
+import json
+import os
+import pytest
+from src.core.config import settings
+from src.core.midi_generator import MIDIGenerator
+from src.core.templates import CACHE_FILENAME, TemplateError, TemplateLibrary, get_template_library, load_template_file
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+def _groove(name, genre="house", bpm=(120, 126), tags=("classic",)):
+    return {
+        "name": name, "genre": genre, "tags": list(tags), "bpm": list(bpm),
+        "drums": {"kick": [[0, 1], [4, 1], [8, 1], [12, 1]], "hihat": [[2, 0.5, 90, 0.1]]}
+    }
+
+@pytest.fixture
+def library_dir(tmp_path):
+    directory = tmp_path / "templates"
+    _write(str(directory / "house" / "a.json"), _groove("house-a"))
+    _write(str(directory / "house" / "b.json"), {"templates": [
+        _groove("house-b", bpm=(124, 128), tags=("deep",)),
+        _groove("garage-a", genre="garage", bpm=(130, 134))
+    ]})
+    (directory / "c.yaml").write_text(
+        "name: techno-a\ngenre: techno\nbpm: 135\ndrums:\n  kick: [[0, 1], [8, 1]]\n"
+        "chords: [[C2, E2, G2], [F2, A2, C3]]\n"
+    )
+    return directory
+
+def test_library_indexes_templates(library_dir):
+    """Test lookup by name, genre, tag and BPM."""
+    library = TemplateLibrary(str(library_dir))
+    assert len(library) == 4 and library.errors == {}
+    assert library.genres() == ["garage", "house", "techno"]
+    assert [t.name for t in library.find(genre="house")] == ["house-a", "house-b"]
+    assert [t.name for t in library.find(genre="house", bpm=125)] == ["house-a", "house-b"]
+    assert [t.name for t in library.find(genre="house", tag="deep", bpm=127)] == ["house-b"]
+    assert library.find(genre="house", bpm=200) == []
+    techno = library.get("techno-a")
+    assert techno.bpm_range == (135, 135)
+    assert techno.chord_pitches.tolist() == [[36, 40, 43], [41, 45, 48]]
+    assert library.get("house-a").drum_offset.tolist() == [0.0, 0.1, 0.0, 0.0, 0.0]
+
+def test_cache_skips_parsing_unchanged_sources(library_dir):
+    """Test that a reload only parses sources changed since the cache was written."""
+    assert TemplateLibrary(str(library_dir)).parsed_files == 3
+    assert os.path.exists(library_dir / CACHE_FILENAME)
+    library = TemplateLibrary(str(library_dir))
+    assert library.parsed_files == 0
+    assert library.get("house-a").drum_step.tolist() == [0, 2, 4, 8, 12]
+    assert not library.get("house-a").drum_step.flags.writeable
+    
+    _write(str(library_dir / "house" / "a.json"), _groove("house-a2"))
+    os.remove(library_dir / "c.yaml")
+    assert library.refresh()
+    assert library.parsed_files == 1
+    assert sorted(t.name for t in library.templates) == ["garage-a", "house-a2", "house-b"]
+    assert not library.refresh()
+    assert TemplateLibrary(str(library_dir)).parsed_files == 0
+
+def test_corrupt_cache_is_rebuilt(library_dir):
+    """Test that an unreadable cache falls back to parsing the sources."""
+    TemplateLibrary(str(library_dir))
+    (library_dir / CACHE_FILENAME).write_bytes(b"not a cache")
+    library = TemplateLibrary(str(library_dir))
+    assert library.parsed_files == 3 and len(library) == 4
+
+@pytest.mark.parametrize("change", [
+    {"genre": ""},
+    {"bpm": [130, 120]},
+    {"steps": 12},
+    {"drums": {"kick": [[0, 1, 200]]}},
+    {"drums": {"kick": [[0, 1, 100, 0.75]]}},
+    {"tempo": 120},
+])
+def test_invalid_templates_are_reported(tmp_path, change):
+    """Test that schema violations are rejected and skipped by the library."""
+    path = str(tmp_path / "bad.json")
+    _write(path, dict(_groove("bad"), **change))
+    with pytest.raises(TemplateError):
+        load_template_file(path)
+    library = TemplateLibrary(str(tmp_path))
+    assert len(library) == 0 and "bad.json" in library.errors
+
+def test_generator_plays_template(library_dir, monkeypatch):
+    """Test that create_drum_pattern plays a named template's hits."""
+    monkeypatch.setattr(settings, "TEMPLATES_DIR", str(library_dir))
+    assert get_template_library().get("house-a") is not None
+    track = MIDIGenerator(seed=1).create_drum_pattern("house", template="house-a").tracks[0]
+    assert track.start.tolist() == [0.0, 0.525, 1.0, 2.0, 3.0]
+    assert track.velocity[1] == 90
+    with pytest.raises(ValueError):
+        MIDIGenerator().create_drum_pattern("house", template="missing")